@@ -0,0 +1,132 @@
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+# memberships are invalidated by UserLeagueStatus signals, the timeout only bounds bulk updates that skip them
+MEMBERSHIP_CACHE_TIMEOUT = 300
+MEMBERSHIP_CACHE_PREFIX = 'membership'
+MEMBERSHIP_STATS_KEYS = {
+    'hits': 'membership-stats:hits',
+    'misses': 'membership-stats:misses',
+}
+
+
+class Membership(object):
+    """
+    League ids of a user grouped by request status, and the role/division ids the user has visibility to
+    """
+
+    def __init__(self, accepted=(), pending=(), rejected=(), roles=(), divisions=()):
+        self.accepted = frozenset(accepted)
+        self.pending = frozenset(pending)
+        self.rejected = frozenset(rejected)
+        self.roles = frozenset(roles)
+        self.divisions = frozenset(divisions)
+
+    @classmethod
+    def load(cls, user):
+        from users.models import UserLeagueStatus  # users.models invalidates through this module
+
+        sets = defaultdict(set)
+        for league_id, request_status, role_id, division_id in UserLeagueStatus.objects.filter(
+                user=user).values_list('league_id', 'request_status', 'visibilities', 'visibilities__division'):
+            sets[request_status].add(league_id)
+            if role_id is not None:
+                sets['roles'].add(role_id)
+                sets['divisions'].add(division_id)
+        return cls(**sets)
+
+    @classmethod
+    def get(cls, user):
+        """
+        Membership of a user from the cache, loaded on a miss.
+
+        The cache is not shared between processes, so entries are stored with the user's membership_version
+        and only used while it matches the version of the user, loaded from the database with every request
+        """
+        if not user.is_authenticated:
+            return cls()
+        key = get_membership_cache_key(user.pk)
+        cached = cache.get(key)
+        if cached is not None and cached[0] == user.membership_version:
+            count_membership_stat('hits')
+            return cached[1]
+        count_membership_stat('misses')
+        membership = cls.load(user)
+        cache.set(key, (user.membership_version, membership), MEMBERSHIP_CACHE_TIMEOUT)
+        return membership
+
+    @staticmethod
+    def get_league_id(league):
+        """
+        Accept a League, a pk or a query param string. Returns None when it is not a valid pk
+        """
+        if league is None or isinstance(league, int):
+            return league
+        if hasattr(league, 'pk'):
+            return league.pk
+        league = str(league)
+        return int(league) if league.isdigit() else None
+
+    def is_accepted(self, league):
+        return self.get_league_id(league) in self.accepted
+
+    def is_pending(self, league):
+        return self.get_league_id(league) in self.pending
+
+    def is_rejected(self, league):
+        return self.get_league_id(league) in self.rejected
+
+
+def get_membership_cache_key(user_pk):
+    return ':'.join([MEMBERSHIP_CACHE_PREFIX, str(user_pk)])
+
+
+def invalidate_memberships(user_pks):
+    """
+    Bump the membership_version of the users, which invalidates their memberships cached by every process.
+    The cache of this process is also dropped now and again on commit, so a request reading before the
+    commit cannot keep stale sets
+    """
+    from users.models import User
+
+    user_pks = set(user_pks)
+    if not user_pks:
+        return
+    User.objects.filter(pk__in=user_pks).update(membership_version=F('membership_version') + 1)
+    keys = [get_membership_cache_key(user_pk) for user_pk in user_pks]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def count_membership_stat(stat):
+    key = MEMBERSHIP_STATS_KEYS[stat]
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:  # evicted between add and incr
+        cache.set(key, 1, None)
+
+
+def get_membership_stats():
+    stats = {stat: cache.get(key, 0) for stat, key in MEMBERSHIP_STATS_KEYS.items()}
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / total if total else 0.0
+    return stats
+
+
+def reset_membership_stats():
+    cache.delete_many(list(MEMBERSHIP_STATS_KEYS.values()))
+
+
+def get_membership(request):
+    """
+    Membership of the request user, read once per request and shared by permissions and serializers
+    """
+    membership = getattr(request, '_membership', None)
+    if membership is None:
+        membership = Membership.get(request.user)
+        request._membership = membership
+    return membership
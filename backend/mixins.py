@@ -1,15 +1,81 @@
 from rest_framework import status
+from django.db import transaction
+from django.db.models import Q
 from django.urls import reverse
+from ordered_model.models import OrderedModelBase
 from rest_framework.test import APIClient
 from model_bakery import baker
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
 
-class OrderedModelUpdateMixin(object):
+class GapOrderedModelMixin(object):
+    """
+    Sparse ordering for OrderedModel subclasses. Siblings are spaced order_gap apart starting at order_base,
+    so moving an object only rewrites its own row: it takes a value between its new neighbours. order_base
+    leaves room for repeated moves to the top (casting). When neighbours have no room left between them the
+    siblings are respaced with rebalance().
+
+    to/top/bottom/above/below keep the ordered_model semantics: to(order) moves the object to the place
+    currently held by the sibling with that order value.
+    """
+    order_gap = 1024
+    order_base = 1048576
+    order_max = 2147483647
+
+    def save(self, *args, **kwargs):
+        order_field_name = self.order_field_name
+        if getattr(self, order_field_name) is None:
+            max_order = self.get_ordering_queryset().get_max_order()
+            setattr(self, order_field_name, self.order_base if max_order is None else max_order + self.order_gap)
+        return super().save(*args, **kwargs)
+
+    def delete(self, *args, extra_update=None, **kwargs):
+        # gaps are allowed, siblings are not shifted down
+        return super(OrderedModelBase, self).delete(*args, **kwargs)
+
+    def rebalance(self, exclude_self=False):
+        """
+        Respace the siblings of this object order_gap apart, keeping their relative order
+        """
+        order_field_name = self.order_field_name
+        qs = self.get_ordering_queryset()
+        if exclude_self:
+            qs = qs.exclude(pk=self.pk)
+        siblings = list(qs.order_by(order_field_name, 'pk'))
+        for index, sibling in enumerate(siblings):
+            setattr(sibling, order_field_name, self.order_base + index * self.order_gap)
+            if sibling.pk == self.pk:
+                setattr(self, order_field_name, self.order_base + index * self.order_gap)
+        self._meta.default_manager.bulk_update(siblings, [order_field_name], batch_size=500)
+        self.orders_updated(siblings)
+        return siblings
+
+    @classmethod
+    def orders_updated(cls, objs):
+        """
+        Called after orders are rewritten in bulk, which sends no post_save
+        """
+        pass
+
+    def get_order_between(self, lower, upper):
+        """
+        Return a free order value strictly between lower and upper (either may be None), or None if there is no room
+        """
+        if lower is None and upper is not None and upper - self.order_gap >= 0:
+            return upper - self.order_gap  # moving to the top, step by order_gap instead of halving
+        lower = -1 if lower is None else lower
+        if upper is None:
+            order = lower + self.order_gap
+            return order if order <= self.order_max else None
+        if upper - lower > 1:
+            return lower + (upper - lower) // 2
+        return None
+
     def to(self, order, extra_update=None):
         """
-        Move object to a certain position, updating all affected objects to move accordingly up or down.
+        Move object to a certain position, only updating the object itself unless siblings need respacing.
         """
         if not isinstance(order, int):
             raise TypeError(
@@ -19,21 +85,24 @@ class OrderedModelUpdateMixin(object):
             )
 
         order_field_name = self.order_field_name
-        if order is None or getattr(self, order_field_name) == order:
+        current = getattr(self, order_field_name)
+        if order is None or current == order:
             # object is already at desired position
             return
-        qs = self.get_ordering_queryset()
-        extra_update = {} if extra_update is None else extra_update
-        if getattr(self, order_field_name) > order:
-            qs.below_instance(self).above(order, inclusive=True).increase_order(
-                **extra_update
-            )
-        else:
-            qs.above_instance(self).below(order, inclusive=True).decrease_order(
-                **extra_update
-            )
-        setattr(self, order_field_name, order)
-        self.save(update_fields=['order'])
+        qs = self.get_ordering_queryset().exclude(pk=self.pk)
+        if current > order:  # moving up, take the place before the sibling at order
+            below, above = Q(**{order_field_name + '__lt': order}), Q(**{order_field_name + '__gte': order})
+        else:  # moving down, take the place after the sibling at order
+            below, above = Q(**{order_field_name + '__lte': order}), Q(**{order_field_name + '__gt': order})
+        # plain min/max per side can be answered from an (order_with_respect_to, order) index
+        lower, upper = qs.filter(below).get_max_order(), qs.filter(above).get_min_order()
+        new_order = self.get_order_between(lower, upper)
+        if new_order is None:
+            rank = 0 if lower is None else qs.filter(below).count()
+            self.rebalance(exclude_self=True)
+            new_order = self.order_base + rank * self.order_gap - self.order_gap // 2
+        setattr(self, order_field_name, new_order)
+        self.save(update_fields=[order_field_name])
 
 
 class MoveOrderedModelMixin(object):
@@ -53,16 +122,88 @@ class MoveOrderedModelMixin(object):
         }
 
         obj_set = self.get_queryset().filter(**filter_dict)
-        order = int(request.data.get('order', None))
+        order = request.data.get('order', None)
 
         if order is None:
             return Response({"error": "missing parameters"}, status=status.HTTP_400_BAD_REQUEST)
-        if order < obj_set.get_min_order() or order > obj_set.get_max_order():
+        order = int(order)
+        # order is a 0 indexed position, translated to the order value of the sibling currently there
+        target = list(obj_set.order_by(obj.order_field_name).values_list(
+            obj.order_field_name, flat=True)[order:order + 1]) if order >= 0 else []
+        if not target:
             return Response({"order": ["order value out of range"]}, status=status.HTTP_400_BAD_REQUEST)
-        obj.to(order)
+        obj.to(target[0])
         return Response(status=status.HTTP_200_OK)
 
 
+class ReorderOrderedModelMixin(object):
+    """
+    Replace the whole ordering of an object and its siblings in one transaction with a single bulk update
+    """
+
+    @action(detail=True, methods=['patch'])
+    def reorder(self, request, pk):
+        assert hasattr(self, 'move_filter_variable'), (
+            'move_filter_variable required'
+        )
+        assert hasattr(self, 'move_filter_value'), (
+            'move_filter_value required'
+        )
+
+        obj = self.get_object()
+        filter_dict = {
+            self.move_filter_variable: obj.serializable_value(self.move_filter_value)
+        }
+
+        if hasattr(request.data, 'getlist'):
+            order = request.data.getlist('order')
+        else:
+            order = request.data.get('order', None)
+        if not isinstance(order, list) or not order:
+            return Response({"error": "missing parameters"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            pks = [int(pk) for pk in order]
+        except (TypeError, ValueError):
+            return Response({"order": ["order must be a list of pks"]}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            siblings = self.get_queryset().filter(**filter_dict).select_for_update().in_bulk()
+            if len(pks) != len(set(pks)) or set(pks) != set(siblings):
+                return Response({"order": ["order must contain every object being ordered exactly once"]},
+                                status=status.HTTP_400_BAD_REQUEST)
+            self.perform_reorder([siblings[pk] for pk in pks])
+        return Response(status=status.HTTP_200_OK)
+
+    def perform_reorder(self, objs):
+        model = type(objs[0])
+        for index, obj in enumerate(objs):
+            setattr(obj, model.order_field_name, model.order_base + index * model.order_gap)
+        model._meta.default_manager.bulk_update(objs, [model.order_field_name], batch_size=500)
+        model.orders_updated(objs)
+
+
+class SharedObjectMixin(object):
+    """
+    Load the detail object once per request, with object_select_related, and share it between permission
+    classes (see backend.permissions.get_view_object) and get_object
+    """
+    object_select_related = ()
+
+    def get_shared_object(self):
+        if getattr(self, '_shared_object', None) is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            if self.object_select_related:
+                queryset = queryset.select_related(*self.object_select_related)
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            self._shared_object = get_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return self._shared_object
+
+    def get_object(self):
+        obj = self.get_shared_object()
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+
 class ObjectMixin(object):
     """
     Handle object create/returns for detail views
@@ -1,10 +1,283 @@
+import base64
+import hashlib
+import json
+from functools import partial
+
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured, ValidationError
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class CountingPaginator(Paginator):
+    """
+    Paginator with a count strategy
+    * exact: COUNT(*) of the whole queryset
+    * capped: exact up to count_cap rows, beyond that count_cap is reported and count_exact is False
+    * estimate: exact up to count_cap rows, beyond that the query planner's row estimate is reported
+    Counts are cached per query for count_cache_timeout seconds when set
+    """
+    cache_prefix = 'pagination-count'
+
+    def __init__(self, object_list, per_page, count_strategy='exact', count_cap=1000, count_cache_timeout=0,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_strategy = count_strategy
+        self.count_cap = count_cap
+        self.count_cache_timeout = count_cache_timeout
+        self.count_exact = True
+
+    @cached_property
+    def count(self):
+        if not self.count_cache_timeout:
+            count, self.count_exact = self.get_count()
+            return count
+        key = self.get_cache_key()
+        cached = cache.get(key)
+        if cached is None:
+            cached = self.get_count()
+            cache.set(key, cached, self.count_cache_timeout)
+        count, self.count_exact = cached
+        return count
+
+    def get_cache_key(self):
+        sql, params = self.object_list.query.sql_with_params()
+        digest = hashlib.md5(repr((self.count_strategy, self.count_cap, sql, params)).encode()).hexdigest()
+        return ':'.join([self.cache_prefix, digest])
+
+    def get_count(self):
+        """
+        Returns (count, exact)
+        """
+        if self.count_strategy == 'exact':
+            return super().count, True
+        count = self.object_list[:self.count_cap + 1].count()
+        if count <= self.count_cap:
+            return count, True
+        if self.count_strategy == 'estimate':
+            return max(self.get_estimate(), count), False
+        return self.count_cap, False
+
+    def get_estimate(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return 0
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def validate_number(self, number):
+        self.count  # resolves count_exact
+        if self.count_exact:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if self.count_exact:
+            return super().page(number)
+        # the count is a lower bound, pages past it exist until a slice comes back empty
+        bottom = (number - 1) * self.per_page
+        object_list = list(self.object_list[bottom:bottom + self.per_page])
+        if not object_list and number > 1:
+            raise EmptyPage('That page contains no results')
+        return self._get_page(object_list, number, self)
+
+
+class KeysetPagination(pagination.BasePagination):
+    """
+    Forward-only keyset pagination. The cursor holds the ordering values of the last row of a page, so every
+    page is a range query on the ordering instead of an offset scan, without a count.
+    The ordering is the view's keyset_ordering, else the queryset's order_by, else the model's Meta.ordering,
+    with pk appended as a tie breaker when missing. It must be made of non null model fields, a NULL has no
+    place in the range comparison. Views paginating a union can define filter_keyset_queryset(position_filter)
+    to apply the position to every combined queryset
+    """
+    ordering = ('pk',)
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset, view)
+        if self.ordering is None:
+            raise ImproperlyConfigured('keyset ordering must be non null model fields')
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            try:
+                position_filter = self.get_position_filter(position)
+                if hasattr(view, 'filter_keyset_queryset'):
+                    queryset = view.filter_keyset_queryset(position_filter)
+                else:
+                    queryset = queryset.filter(position_filter)
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        queryset = queryset.order_by(*self.ordering)
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            return pagination._positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_ordering(self, queryset, view):
+        """
+        Returns the ordering, or None when it cannot be used by keyset pagination
+        """
+        ordering = getattr(view, 'keyset_ordering', None)
+        if ordering is None:
+            ordering = queryset.query.order_by or queryset.model._meta.ordering or self.ordering
+        ordering = tuple(ordering)
+        if not all(isinstance(field, str) and self.is_keyset_field(queryset.model, field) for field in ordering):
+            return None
+        if not {'pk', '-pk', 'id', '-id'} & set(ordering):
+            ordering += ('-pk' if ordering[-1].startswith('-') else 'pk', )
+        return ordering
+
+    @staticmethod
+    def is_keyset_field(model, field):
+        """
+        Whether the ordering field is a concrete, non null column reached through non null relations
+        """
+        path = field[1:] if field.startswith('-') else field
+        for name in path.split('__'):
+            if model is None:  # past a column
+                return False
+            try:
+                model_field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return False
+            if not model_field.concrete or model_field.null:
+                return False
+            # pk and foreign key attnames are columns, ordering by a relation follows the related model's ordering
+            model = None if name in ('pk', model_field.attname) else model_field.related_model
+        return model is None
+
+    def get_position_filter(self, position):
+        """
+        (a, b) > (x, y) expanded to a > x OR (a = x AND b > y)
+        """
+        position_filter, equal = Q(), Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = '__lt' if field.startswith('-') else '__gt'
+            position_filter |= equal & Q(**{name + lookup: value})
+            equal &= Q(**{name: value})
+        return position_filter
+
+    @staticmethod
+    def get_value(obj, field):
+        field = field.lstrip('-')
+        if isinstance(obj, dict):  # values querysets
+            return obj[field]
+        for attr in field.split('__'):
+            obj = getattr(obj, attr)
+        return obj
+
+    def encode_cursor(self, obj):
+        # numbers and booleans keep their type, dates and decimals are strings the field lookups parse back
+        position = [self.get_value(obj, field) for field in self.ordering]
+        return base64.urlsafe_b64encode(json.dumps(position, cls=DjangoJSONEncoder).encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param, None)
+        if encoded is None:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'page_size': self.page_size,
+            'max_page_size': self.max_page_size,
+            'next': self.get_next_link(),
+            'results': data
+        })
 
 
 class CustomPagination(pagination.PageNumberPagination):
+    """
+    Page number pagination by default. Views opt in to keyset pagination with pagination_mode:
+    * page: page number pagination only (default), cursor parameters are ignored
+    * cursor: keyset pagination only
+    * either: page number pagination unless the request asks for keyset with ?pagination=cursor or a cursor
+    Keyset pagination falls back to page number pagination when the ordering cannot be used by it.
+    Views can set count_strategy ('exact', 'capped' or 'estimate'), count_cap and count_cache_timeout,
+    see CountingPaginator
+    """
     page_size_query_param = 'page_size'
     max_page_size = 100
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+    count_strategy = 'exact'
+    count_cap = 1000
+    count_cache_timeout = 0
+
+    def use_keyset(self, queryset, request, view):
+        mode = getattr(view, 'pagination_mode', 'page')
+        if mode == 'either':
+            requested = (request.query_params.get(self.mode_query_param, None) == 'cursor' or
+                         self.keyset_class.cursor_query_param in request.query_params)
+            if not requested:
+                return False
+        elif mode != 'cursor':
+            return False
+        return self.keyset_class().get_ordering(queryset, view) is not None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(queryset, request, view):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        self.django_paginator_class = partial(CountingPaginator, **{
+            option: getattr(view, option, getattr(self, option))
+            for option in ('count_strategy', 'count_cap', 'count_cache_timeout')
+        })
+        return super().paginate_queryset(queryset, request, view)
 
     def get_page_size(self, request):
         if self.page_size_query_param:
@@ -21,10 +294,13 @@ class CustomPagination(pagination.PageNumberPagination):
         return self.page_size
 
     def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
         return Response({
             'page_size': self.page_size,
             'max_page_size': self.max_page_size,
             'page_number': self.page.number,
             'count': self.page.paginator.count,
+            'count_exact': self.page.paginator.count_exact,
             'results': data
         })
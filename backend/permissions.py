@@ -1,15 +1,102 @@
+from django.core.exceptions import ImproperlyConfigured
 from rest_framework import permissions
 
 
+def get_view_object(view, model):
+    """
+    The object of a detail request. Views using SharedObjectMixin load it once for every permission and get_object
+    """
+    if hasattr(view, 'get_shared_object') and view.get_queryset().model is model:
+        return view.get_shared_object()
+    return model.objects.get(pk=view.kwargs['pk'])
+
+
+STANDARD_ACTIONS = ('list', 'create', 'retrieve', 'update', 'partial_update', 'destroy')
+
+_action_permission_tables = {}
+
+
+def get_viewset_actions(viewset):
+    """
+    Names of the standard actions provided by the viewset's mixins, and of its @action methods
+    """
+    actions = {action for action in STANDARD_ACTIONS if hasattr(viewset, action)}
+    return actions | {action.__name__ for action in viewset.get_extra_actions()}
+
+
+def uses_permission(permission_classes, permission):
+    """
+    Whether permission appears in permission_classes, including inside & | ~ compositions
+    """
+    stack = list(permission_classes)
+    while stack:
+        klass = stack.pop()
+        if klass is permission:
+            return True
+        stack.extend(getattr(klass, attr) for attr in ('op1_class', 'op2_class') if hasattr(klass, attr))
+    return False
+
+
+def compile_action_permissions(view_class):
+    """
+    Build the action -> permission instance table of a view class. The first mapping of an action wins
+    """
+    table = {}
+    for klass, actions in getattr(view_class, 'action_permissions', {}).items():
+        permission = klass()
+        for action in actions:
+            table.setdefault(action, permission)
+    return table
+
+
+def get_action_permission_table(view_class):
+    table = _action_permission_tables.get(view_class, None)
+    if table is None:
+        table = _action_permission_tables[view_class] = compile_action_permissions(view_class)
+    return table
+
+
+def check_action_permissions(viewset):
+    """
+    Validate the action_permissions of a viewset using ActionBasedPermission. Returns a list of errors
+    """
+    if not uses_permission(viewset.permission_classes, ActionBasedPermission):
+        return []
+    errors = []
+    actions = get_viewset_actions(viewset)
+    mapped = set()
+    for klass, klass_actions in getattr(viewset, 'action_permissions', {}).items():
+        for action in klass_actions:
+            if action not in actions:
+                errors.append(f"{viewset.__name__}: unknown action '{action}' in action_permissions")
+            elif action in mapped:
+                errors.append(f"{viewset.__name__}: action '{action}' is mapped more than once")
+            mapped.add(action)
+    for action in sorted(actions - mapped):
+        errors.append(f"{viewset.__name__}: action '{action}' has no mapping in action_permissions")
+    return errors
+
+
+def compile_router_permissions(router):
+    """
+    Validate and compile the action permissions of every viewset registered on the router, at url loading
+    """
+    viewsets = [viewset for prefix, viewset, basename in router.registry]
+    errors = [error for viewset in viewsets for error in check_action_permissions(viewset)]
+    if errors:
+        raise ImproperlyConfigured('\n'.join(errors))
+    for viewset in viewsets:
+        get_action_permission_table(viewset)
+
+
 class ActionBasedPermission(permissions.AllowAny):
     """
-    Grant or deny access to a view, based on a mapping in view.action_permissions
+    Grant or deny access to a view, based on a mapping in view.action_permissions.
+    The mapping is compiled once per view class into an action -> permission instance table
     """
     def has_permission(self, request, view):
-        for klass, actions in getattr(view, 'action_permissions', {}).items():
-            if view.action in actions:
-                return klass().has_permission(request, view)
-        return False
+        permission = get_action_permission_table(type(view)).get(view.action, None)
+        return permission is not None and permission.has_permission(request, view)
 
 
 class IsSuperUser(permissions.BasePermission):
@@ -5,6 +5,8 @@ from notifications.api.viewsets import UmpCastNotificationViewSet, LeagueNotific
 from teamsnap.api.viewsets import TeamSnapNoteViewSet
 from rest_framework import routers
 
+from backend.permissions import compile_router_permissions
+
 router = routers.DefaultRouter()
 router.register('users', UserViewSet, basename='user')
 router.register('user-league-status', UserLeagueStatusViewSet,
@@ -27,5 +29,7 @@ router.register('application-notifications',
 router.register('teamsnap-notes', TeamSnapNoteViewSet,
                 basename='teamsnap-note')
 
+compile_router_permissions(router)
+
 for url in router.urls:
     print(url)
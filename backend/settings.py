@@ -45,6 +45,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'oauth2_provider',
@@ -184,6 +185,9 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10
 }
 
+# seconds league search results are cached for, 0 disables the cache (leagues.search)
+LEAGUE_SEARCH_CACHE_TIMEOUT = config('LEAGUE_SEARCH_CACHE_TIMEOUT', default=30, cast=int)
+
 AUTHENTICATION_BACKENDS = (
     # Facebook OAuth2
     'social_core.backends.facebook.FacebookAppOAuth2',
@@ -281,5 +285,9 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_USE_SSL = False
+DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+
+# no sms is sent unless a backend is configured, the console backend is only a default in development
+SMS_BACKEND = config('SMS_BACKEND', default='notifications.sms.ConsoleBackend' if DEBUG else '')
 
 django_heroku.settings(locals())
@@ -16,6 +16,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from .router import router
+from .views import MembershipCacheStatsView
 # Testing Purposes, AWS
 from django.conf.urls.static import static
 from django.conf import settings
@@ -39,6 +40,7 @@ urlpatterns = [
     path('api/notifications/', include('notifications.urls')),
     path('api/auth/', include('rest_framework_social_oauth2.urls')),
     path('api/teamsnap/', include('teamsnap.urls')),
+    path('api/membership-cache-stats/', MembershipCacheStatsView.as_view(), name='membership-cache-stats'),
     path('api/', include(router.urls)),
     path('', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui')
 ]
@@ -0,0 +1,26 @@
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .membership import get_membership_stats, reset_membership_stats
+from .permissions import IsSuperUser
+
+
+class MembershipCacheStatsView(APIView):
+    """
+    Hit/miss counters of the membership cache
+
+    get: Retrieve Counters \n
+    * Permissions: IsSuperUser
+
+    delete: Reset Counters \n
+    * Permissions: IsSuperUser
+    """
+    permission_classes = (IsSuperUser, )
+
+    def get(self, request):
+        return Response(get_membership_stats(), status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        reset_membership_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
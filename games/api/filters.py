@@ -36,8 +36,4 @@ class ApplicationFilter(filters.FilterSet):
         fields = ['user', 'date_time']
 
     def get_casted(self, queryset, name, value):
-        app_ids = []
-        for app in Application.objects.all().iterator():
-            if app.is_casted() == value:
-                app_ids.append(app.id)
-        return Application.objects.filter(id__in=app_ids)
+        return queryset.annotate_casted().filter(casted=value)
@@ -1,7 +1,9 @@
 from ..models import Application, Post, Game
 from rest_framework import permissions
-from leagues.models import Division, League
+from leagues.models import Division
 from users.models import User
+from backend.membership import get_membership
+from backend.permissions import get_view_object
 
 
 class IsApplicationLeague(permissions.BasePermission):
@@ -10,7 +12,8 @@ class IsApplicationLeague(permissions.BasePermission):
     """
 
     def has_permission(self, request, view):
-        return Application.objects.get(pk=view.kwargs['pk']).post.game.division.league in request.user.leagues.accepted()
+        return get_membership(request).is_accepted(
+            get_view_object(view, Application).post.game.division.league_id)
 
 
 class ApplicationFilterPermission(permissions.BasePermission):
@@ -31,7 +34,34 @@ class IsPostLeague(permissions.BasePermission):
     """
 
     def has_permission(self, request, view):
-        return Post.objects.get(pk=view.kwargs['pk']).game.division.league in request.user.leagues.accepted()
+        return get_membership(request).is_accepted(get_view_object(view, Post).game.division.league_id)
+
+class IsCastingLeague(permissions.BasePermission):
+    """
+    Checks to see if a manager is in the league being casted
+    """
+
+    def has_permission(self, request, view):
+        return get_membership(request).is_accepted(request.data.get('league', None))
+
+class ConflictReportPermission(permissions.BasePermission):
+    """
+    Conflicts must be reported for a league. The request user must be accepted in the league
+    """
+
+    def has_permission(self, request, view):
+        return get_membership(request).is_accepted(request.query_params.get('league', None))
+
+class PostEligibilityPermission(permissions.BasePermission):
+    """
+    Eligibility must be checked using user_pk. The user_pk must belong to the request user
+    """
+
+    def has_permission(self, request, view):
+        user_pk = request.query_params.get('user', None)
+        if user_pk is None:
+            return False
+        return str(request.user.pk) == user_pk
 
 # class IsUserFilter(permissions.BasePermission):
     # def has_permission(self, request, view):
@@ -43,16 +73,14 @@ class IsGameLeague(permissions.BasePermission):
     """
 
     def has_permission(self, request, view):
-        return Game.objects.get(pk=view.kwargs['pk']).division.league in request.user.leagues.accepted()
+        return get_membership(request).is_accepted(get_view_object(view, Game).division.league_id)
 
 
 class GameFilterDivision(permissions.BasePermission):
     def has_permission(self, request, view):
         division_pk = request.query_params.get('division', None)
-        division_visibilities = request.user.leagues.values_list(
-            'userleaguestatus__visibilities__division', flat=True)
         if division_pk:
-            return int(division_pk) in division_visibilities
+            return int(division_pk) in get_membership(request).divisions
         return False
 
 
@@ -60,16 +88,15 @@ class GameFilterDivisionManager(permissions.BasePermission):
     def has_permission(self, request, view):
         division_pk = request.query_params.get('division', None)
         if division_pk:
-            return Division.objects.get(pk=division_pk).league in request.user.leagues.accepted()
+            return get_membership(request).is_accepted(Division.objects.get(pk=division_pk).league_id)
         return False
 
 
 class GameFilterDivisionIn(permissions.BasePermission):
     def has_permission(self, request, view):
         division__in = request.query_params.get('division__in', None)
-        division_visibilities = request.user.leagues.values_list(
-            'userleaguestatus__visibilities__division', flat=True)
         if division__in:
+            division_visibilities = get_membership(request).divisions
             for division in division__in.split(','):
                 if int(division) not in division_visibilities:
                     return False
@@ -81,10 +108,9 @@ class GameFilterDivisionInManager(permissions.BasePermission):
     def has_permission(self, request, view):
         division__in = request.query_params.get('division__in', None)
         if division__in:
-            for division in division__in.split(','):
-                if Division.objects.get(pk=int(division)).league not in request.user.leagues.accepted():
-                    return False
-            return True
+            division_pks = [int(division) for division in division__in.split(',')]
+            leagues = Division.objects.filter(pk__in=division_pks).values_list('league', flat=True)
+            return len(leagues) == len(set(division_pks)) and get_membership(request).accepted.issuperset(leagues)
         return False
 
 
@@ -1,10 +1,11 @@
-from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.serializers import ValidationError
 
+from backend.membership import get_membership
+from games.eligibility import get_eligibility
 from games.models import Application
 from users.api.serializers.user import UserProfilePublicSerializer
-from users.models import User, UserLeagueStatus
+from users.models import User
 
 
 class ApplicationBaseSerializer(serializers.ModelSerializer):
@@ -22,7 +23,7 @@ class ApplicationCreateSerializer(ApplicationBaseSerializer):
         return user
 
     def validate_post(self, post):
-        if post.game.division.league not in self.context['request'].user.leagues.accepted():
+        if not get_membership(self.context['request']).is_accepted(post.game.division.league_id):
             raise ValidationError(
                 "can only create application for a post in a league you are a manager for")
         return post
@@ -30,24 +31,23 @@ class ApplicationCreateSerializer(ApplicationBaseSerializer):
     def validate(self, validated_data):
         post = validated_data.get('post', None)
         user = validated_data.get('user', None)
-        adv_scheduling = post.game.division.league.adv_scheduling_limit
-        if (post.game.date_time - timezone.now()).days > adv_scheduling:
+        eligibility = get_eligibility(user, [post])[post.pk]
+        if eligibility['type'] == 'over_scheduling_limit':
             raise ValidationError(
-                ' '.join(['cannot apply', str(adv_scheduling), 'days before game']))
-        if post.game.division.league not in user.leagues.accepted():
+                ' '.join(['cannot apply', eligibility['adv_scheduling_limit'], 'days before game']))
+        if eligibility['type'] == 'league':
             raise ValidationError(
                 "cannot add this user to this post due to league restrictions")
-        if not UserLeagueStatus.objects.filter(user=user, league=post.role.division.league).exists():
-            raise ValidationError(
-                "this error should not occur: user not in relevant league to apply for this game")
-        if not user.is_manager() and post.role not in UserLeagueStatus.objects.get(user=user, league=post.role.division.league).visibilities.all():
+        if eligibility['type'] == 'visibility':
             raise ValidationError(
                 "this error should not occur: user does not have visibility to apply for this post")
         # user can only create
-        if Application.objects.filter(post=post, user=user).exists():
+        if eligibility['type'] == 'duplicate_post':
             raise ValidationError("already applied to this post!")
-        if Application.objects.filter(post__game=post.game, user=user).exists():
+        if eligibility['type'] == 'duplicate_game':
             raise ValidationError("already applied to this game!")
+        if eligibility['type'] == 'conflict':
+            raise ValidationError("already applied to a game at the same time!")
         return super().validate(validated_data)
 
     def to_representation(self, instance):
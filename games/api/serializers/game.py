@@ -1,5 +1,6 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
-from games.models import Game
+from games.models import Application, Game, Post
 from .post import PostSerializer
 
 
@@ -13,4 +14,25 @@ class GameSerializer(serializers.ModelSerializer):
         read_only_fields = ('pk', 'league')
 
     def get_league(self, instance):
-        return instance.division.league.pk
+        return instance.division.league_id
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Select/prefetch everything the serializer reads: posts, their applications and applicant profiles
+        """
+        applications = Application.objects.select_related('user')
+        posts = Post.objects.order_by('role__order', 'pk').prefetch_related(
+            Prefetch('application_set', queryset=applications))
+        return queryset.select_related('division').prefetch_related(Prefetch('post_set', queryset=posts))
+
+
+class GameBulkRowSerializer(serializers.ModelSerializer):
+    """
+    A single row of a bulk game import. Divisions are resolved for every row at once by the viewset
+    """
+    division = serializers.IntegerField()
+
+    class Meta:
+        model = Game
+        fields = ('title', 'division', 'date_time', 'is_active', 'location', 'description')
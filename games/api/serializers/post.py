@@ -2,6 +2,7 @@ from games.models import Post
 from rest_framework import serializers
 from rest_framework.serializers import ValidationError
 from .application import ApplicationRetrieveSerializer
+from backend.membership import get_membership
 
 
 class PostSerializer(serializers.ModelSerializer):
@@ -9,10 +10,25 @@ class PostSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Post
-        fields = ('pk', 'role', 'game', 'notes', 'applications')
-        read_only_fields = ('pk', )
+        fields = ('pk', 'role', 'game', 'notes', 'is_vacant', 'applications')
+        read_only_fields = ('pk', 'is_vacant')
 
     def validate_game(self, game):
-        if game.division.league not in self.context['request'].user.leagues.accepted():
+        if not get_membership(self.context['request']).is_accepted(game.division.league_id):
             raise ValidationError("can only create post for a game in a league you are a manager for")
         return game
+
+
+class OpenPostSerializer(serializers.ModelSerializer):
+    title = serializers.CharField(source='game.title', read_only=True)
+    date_time = serializers.DateTimeField(source='game.date_time', read_only=True)
+    location = serializers.CharField(source='game.location', read_only=True)
+    division = serializers.IntegerField(source='game.division_id', read_only=True)
+    league = serializers.IntegerField(source='game.division.league_id', read_only=True)
+    role_title = serializers.CharField(source='role.title', read_only=True)
+
+    class Meta:
+        model = Post
+        fields = ('pk', 'role', 'role_title', 'game', 'title', 'date_time', 'location', 'division', 'league',
+                  'notes')
+        read_only_fields = fields
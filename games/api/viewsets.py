@@ -3,7 +3,7 @@ from .serializers.application import (
 )
 
 from .serializers.game import (
-    GameSerializer
+    GameSerializer, GameBulkRowSerializer
 )
 
 from .serializers.post import (
@@ -11,8 +11,8 @@ from .serializers.post import (
 )
 
 from .permissions import (
-    IsApplicationLeague, IsPostLeague, IsGameLeague, ApplicationFilterPermission,
-    GameFilterDivision, GameFilterDivisionIn, GameFilterUser,
+    IsApplicationLeague, IsPostLeague, IsGameLeague, IsCastingLeague, ApplicationFilterPermission, ConflictReportPermission,
+    GameFilterDivision, GameFilterDivisionIn, GameFilterUser, PostEligibilityPermission,
     GameFilterDivisionManager, GameFilterDivisionInManager
 )
 
@@ -25,21 +25,52 @@ from backend.permissions import (
     IsSuperUser
 )
 
+from backend.membership import get_membership
+
 from backend.mixins import (
-    MoveOrderedModelMixin
+    MoveOrderedModelMixin, ReorderOrderedModelMixin, SharedObjectMixin
 )
 
+import csv
+import io
+
 from rest_framework import viewsets, permissions, mixins, status
-from ..models import Application, Post, Game
+from ..casting import CastingEngine
+from ..conflicts import get_league_conflicts
+from ..eligibility import get_eligibility
+from ..models import Application, Post, Game, create_posts_for_games
+from leagues.models import Division, League
+from users.models import User
+from notifications.models import (ApplicationNotification, build_application_notification,
+                                  bulk_create_notifications, create_game_reminders, notify_application)
 from rest_framework.decorators import action
 from .filters import GameFilter, ApplicationFilter
 from drf_multiple_serializer import ActionBaseSerializerMixin
+from django.db import transaction
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework.response import Response
 
 
-class ApplicationViewSet(ActionBaseSerializerMixin, mixins.CreateModelMixin, mixins.DestroyModelMixin,
-                         mixins.ListModelMixin, viewsets.GenericViewSet):
+def parse_date_time_window(data):
+    """
+    Parse optional date_time_after/date_time_before iso values, returns (window, errors)
+    """
+    window, errors = {}, {}
+    for field in ('date_time_after', 'date_time_before'):
+        value = data.get(field, None)
+        if value is not None:
+            window[field] = parse_datetime(str(value))
+            if window[field] is None:
+                errors[field] = ["invalid iso format date time"]
+            elif timezone.is_naive(window[field]):
+                window[field] = timezone.make_aware(window[field])
+    return window, errors
+
+
+class ApplicationViewSet(ActionBaseSerializerMixin, SharedObjectMixin, ReorderOrderedModelMixin, mixins.CreateModelMixin,
+                         mixins.DestroyModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
     """
     Provide Create, Destroy, Move functionality for ordered Application
 
@@ -66,8 +97,20 @@ class ApplicationViewSet(ActionBaseSerializerMixin, mixins.CreateModelMixin, mix
     * Permissions: IsManager & IsApplicationLeague
     * Extra Notes:
         * Patch Request
+        * A vacant post (left without a cast by auto_cast) is no longer vacant
+
+    reorder: Replace the Ordering of every Application in the post \n
+    * Permissions: IsManager & IsApplicationLeague
+    * Extra Validations:
+        * "order" field is required, a list of pks
+        * "order" must contain every application of the post exactly once
+    * Extra Notes:
+        * Patch Request
+        * The first pk in "order" is casted, the previously casted and newly casted applications are notified
+        * A vacant post (left without a cast by auto_cast) is no longer vacant
     """
     queryset = Application.objects.all()
+    object_select_related = ('post__game__division', )
     serializer_classes = {
         'default': ApplicationRetrieveSerializer,
         'create': ApplicationCreateSerializer
@@ -79,17 +122,39 @@ class ApplicationViewSet(ActionBaseSerializerMixin, mixins.CreateModelMixin, mix
         permissions.IsAuthenticated: ["create"],
         # additional validation in destroy method
         IsApplicationLeague: ["destroy"],
-        IsManager & IsApplicationLeague: ["cast"],
+        IsManager & IsApplicationLeague: ["cast", "reorder"],
         ApplicationFilterPermission: ["list"]
     }
     filterset_class = ApplicationFilter
 
+    # reorder
+    move_filter_variable = 'post'
+    move_filter_value = 'post'
+
     @action(detail=True, methods=['patch'])
     def cast(self, request, pk):  # replace move order. Can only move application to top
         application = self.get_object()
+        if application.post.is_vacant:
+            Post.objects.filter(pk=application.post_id).update(is_vacant=False)
+            application.post.is_vacant = False
+            if application.is_casted():  # already on top, only the vacancy is filled
+                notify_application(application)
+                return Response(status=status.HTTP_200_OK)
         application.top()
         return Response(status=status.HTTP_200_OK)
 
+    def perform_reorder(self, objs):
+        casted = min(objs, key=lambda application: application.order)
+        vacant = Post.objects.filter(pk=objs[0].post_id, is_vacant=True).update(is_vacant=False)
+        super().perform_reorder(objs)
+        if vacant:
+            bulk_create_notifications(ApplicationNotification, [build_application_notification(objs[0], True)])
+        elif casted is not objs[0]:
+            bulk_create_notifications(ApplicationNotification, [
+                build_application_notification(casted, False),
+                build_application_notification(objs[0], True)
+            ])
+
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         cancellation_period = instance.post.game.division.league.cancellation_period
@@ -100,7 +165,7 @@ class ApplicationViewSet(ActionBaseSerializerMixin, mixins.CreateModelMixin, mix
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class PostViewSet(mixins.CreateModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+class PostViewSet(SharedObjectMixin, mixins.CreateModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
     """
     Provide Create and Destroy functionality for Post Model
 
@@ -109,19 +174,77 @@ class PostViewSet(mixins.CreateModelMixin, mixins.DestroyModelMixin, viewsets.Ge
 
     destroy: Destroy Post \n
     * Permissions: IsManager (of league post is assigned to)
+
+    auto_cast: Automatically Cast Open Posts of a League (post request) \n
+    * Permissions: IsManager & IsCastingLeague
+    * Extra Notes:
+        * Ignore below. "league" is required. "date_time_after"/"date_time_before" (iso format) default to now until the league's advanced scheduling limit
+        * "commit" defaults to true. When false the result is computed but no application is reordered
+        * Fills as many posts as possible while keeping the largest number of casts per user as small as possible
+        * Respects role visibilities and max_casts/max_backups of each user (0 means no limit)
+
+    eligibility: Check if a User can Apply to the Posts of many Games (get request) \n
+    * Permissions: PostEligibilityPermission (user must be the request user)
+    * Query Params:
+        * User (required, superusers can check any user)
+        * Game__in (required, comma separated list of game pk's)
+    * Extra Notes:
+        * Returns one entry per post with "status" (valid/invalid) and "type" (success, over_scheduling_limit, league, visibility, duplicate_post, duplicate_game)
     """
     queryset = Post.objects.all()
+    object_select_related = ('game__division', )
     serializer_class = PostSerializer
     permission_classes = (IsSuperUser | (
         permissions.IsAuthenticated & ActionBasedPermission),)
     action_permissions = {
         # manager of league requirement enforced on serializer level
         IsManager: ["create"],
-        IsManager & IsPostLeague: ["destroy"]
+        IsManager & IsPostLeague: ["destroy"],
+        IsManager & IsCastingLeague: ["auto_cast"],
+        PostEligibilityPermission: ["eligibility"]
     }
+    eligibility_limit = 100
+
+    @action(detail=False, methods=['get'])
+    def eligibility(self, request):
+        user_pk = request.query_params.get('user', None)
+        game__in = request.query_params.get('game__in', None)
+        if not user_pk or not game__in:
+            return Response({"error": "missing parameters"}, status=status.HTTP_400_BAD_REQUEST)
+        if not user_pk.isdigit():
+            return Response({"user": ["invalid user pk"]}, status=status.HTTP_400_BAD_REQUEST)
+        user = request.user if str(request.user.pk) == user_pk else get_object_or_404(User, pk=user_pk)
+        try:
+            game_pks = {int(game) for game in game__in.split(',')}
+        except ValueError:
+            return Response({"game__in": ["invalid game pk"]}, status=status.HTTP_400_BAD_REQUEST)
+        if len(game_pks) > self.eligibility_limit:
+            return Response({"game__in": [f"cannot check more than {self.eligibility_limit} games at once"]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        posts = list(Post.objects.filter(game__in=game_pks).select_related(
+            'game__division__league').order_by('game__date_time', 'pk'))
+        eligibility = get_eligibility(user, posts)
+        return Response([
+            dict(eligibility[post.pk], post=post.pk, game=post.game_id) for post in posts
+        ], status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post'])
+    def auto_cast(self, request):
+        league_pk = request.data.get('league', None)
+        if league_pk is None:
+            return Response({"error": "missing parameters"}, status=status.HTTP_400_BAD_REQUEST)
+        league = League.objects.filter(pk=league_pk).first()
+        if league is None:
+            return Response({"league": ["invalid league pk"]}, status=status.HTTP_400_BAD_REQUEST)
+        window, errors = parse_date_time_window(request.data)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        commit = str(request.data.get('commit', True)).lower() not in ('false', '0')
+        engine = CastingEngine(league, **window)
+        return Response(engine.run(commit=commit), status=status.HTTP_200_OK)
 
-class GameViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+
+class GameViewSet(SharedObjectMixin, mixins.CreateModelMixin, mixins.RetrieveModelMixin,
                   mixins.DestroyModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
     """
     Provide Create, Retrieve, Destroy, List, List-Filter functionality for Game Model
@@ -145,13 +268,35 @@ class GameViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
         * Division__in (list of division pk's, queried using OR)
         * Date_time_before (iso format)
         * Date_time_after (iso format)
+    * Extra Notes:
+        * Posts, applications and applicant profiles are prefetched, a page costs a fixed number of queries
+        * Paged by cursor on date_time with ?pagination=cursor
+
+    bulk: Bulk Create Games (post request) \n
+    * Permissions: IsManager (of every league the games are assigned to, superusers can use any league)
+    * Extra Notes:
+        * Ignore below. Send either "games", a list of game objects, or "file", a utf-8 csv upload with a header row
+        * Row fields: title, division, date_time, location, is_active (optional), description (optional)
+        * All rows are validated first. If any row is invalid nothing is created and the per-row errors are returned
+        * Posts and reminder notifications for the created games are inserted in bulk
+
+    conflicts: Report Double Booked Applications of a League (get request) \n
+    * Permissions: IsManager & ConflictReportPermission (accepted in the league)
+    * Query Params:
+        * League (required)
+        * Date_time_after (iso format, defaults to now)
+        * Date_time_before (iso format)
+    * Extra Notes:
+        * Lists pairs of overlapping applications by the same user where the first game is in the league
+        * Games last the league's game_duration. The conflicting game can be in any league
     """
     serializer_class = GameSerializer
     permission_classes = (IsSuperUser | (
         permissions.IsAuthenticated & ActionBasedPermission),)
     action_permissions = {
         # manager of league requirement enforced on serializer level
-        IsManager: ["create"],
+        IsManager: ["create", "bulk"],
+        IsManager & ConflictReportPermission: ["conflicts"],
         IsGameLeague: ["retrieve"],
         IsManager & IsGameLeague: ["destroy"],
         (IsManager & (GameFilterDivisionManager | GameFilterDivisionInManager)) |
@@ -160,3 +305,82 @@ class GameViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
 
     queryset = Game.objects.all()
     filterset_class = GameFilter
+    pagination_mode = 'either'
+    bulk_limit = 1000
+
+    def get_queryset(self):
+        return GameSerializer.setup_eager_loading(super().get_queryset())
+
+    @action(detail=False, methods=['get'])
+    def conflicts(self, request):
+        league_pk = request.query_params.get('league', None)
+        if league_pk is None:
+            return Response({"error": "missing parameters"}, status=status.HTTP_400_BAD_REQUEST)
+        league = League.objects.filter(pk=league_pk).first()
+        if league is None:
+            return Response({"league": ["invalid league pk"]}, status=status.HTTP_400_BAD_REQUEST)
+        window, errors = parse_date_time_window(request.query_params)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        conflicts = get_league_conflicts(league, window.get('date_time_after', timezone.now()),
+                                         window.get('date_time_before', None))
+        return Response(conflicts, status=status.HTTP_200_OK)
+
+    def get_bulk_rows(self, request):
+        """
+        Rows of the csv upload or of the games list. Raises ValueError when the upload cannot be read
+        """
+        upload = request.FILES.get('file', None)
+        if upload is not None:
+            reader = csv.DictReader(io.TextIOWrapper(upload, encoding='utf-8-sig'))
+            try:
+                # empty csv cells are treated as missing so model defaults apply
+                return [{key: value for key, value in row.items() if value not in ('', None)} for row in reader]
+            except UnicodeDecodeError:
+                raise ValueError("file must be utf-8 encoded")
+            except csv.Error as error:
+                raise ValueError(f"invalid csv file: {error}")
+        return request.data.get('games', None)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        try:
+            rows = self.get_bulk_rows(request)
+        except ValueError as error:
+            return Response({"file": [str(error)]}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(rows, list) or not rows:
+            return Response({"error": "missing parameters"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > self.bulk_limit:
+            return Response({"error": f"cannot create more than {self.bulk_limit} games at once"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        errors = {}
+        row_serializers = [GameBulkRowSerializer(data=row) for row in rows]
+        for index, serializer in enumerate(row_serializers):
+            if not serializer.is_valid():
+                errors[index] = serializer.errors
+
+        # league ownership is checked once for every division referenced in the upload
+        division_pks = {serializer.validated_data['division']
+                        for index, serializer in enumerate(row_serializers) if index not in errors}
+        divisions = Division.objects.filter(pk__in=division_pks)
+        if not request.user.is_superuser:
+            divisions = divisions.filter(league__in=get_membership(request).accepted)
+        divisions = divisions.in_bulk()
+        for index, serializer in enumerate(row_serializers):
+            if index not in errors and serializer.validated_data['division'] not in divisions:
+                errors[index] = {"division": [
+                    "can only create game for a division in a league you are a manager for"]}
+
+        if errors:
+            return Response({"errors": [{"row": index, "errors": errors[index]} for index in sorted(errors)]},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            games = Game.objects.bulk_create([
+                Game(**dict(serializer.validated_data, division=divisions[serializer.validated_data['division']]))
+                for serializer in row_serializers
+            ])
+            create_posts_for_games(games)
+            create_game_reminders(games)
+        return Response({"created": len(games), "games": [game.pk for game in games]}, status=status.HTTP_201_CREATED)
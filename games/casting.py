@@ -0,0 +1,289 @@
+from collections import defaultdict, deque
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from notifications.models import (ApplicationNotification, build_application_notification,
+                                  bulk_create_notifications)
+from users.models import UserLeagueStatus
+
+from .models import Application, Post
+
+
+class FlowNetwork(object):
+    """
+    Dinic max-flow. Edges are stored in parallel lists so that edge ^ 1 is always the reverse edge
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.adjacency = [[] for _ in range(size)]
+        self.to = []
+        self.capacity = []
+
+    def add_edge(self, source, target, capacity):
+        edge = len(self.to)
+        self.adjacency[source].append(edge)
+        self.to.append(target)
+        self.capacity.append(capacity)
+        self.adjacency[target].append(edge + 1)
+        self.to.append(source)
+        self.capacity.append(0)
+        return edge
+
+    def get_flow(self, edge):
+        return self.capacity[edge ^ 1]
+
+    def get_levels(self, source, sink):
+        levels = [-1] * self.size
+        levels[source] = 0
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            for edge in self.adjacency[node]:
+                target = self.to[edge]
+                if self.capacity[edge] > 0 and levels[target] < 0:
+                    levels[target] = levels[node] + 1
+                    queue.append(target)
+        return levels if levels[sink] >= 0 else None
+
+    def augment(self, source, sink, levels):
+        """
+        Push blocking flow along the level graph. Iterative so long alternating paths cannot hit the recursion limit
+        """
+        pointers = [0] * self.size
+        flow = 0
+        while True:
+            path = []
+            node = source
+            while node != sink:
+                edges = self.adjacency[node]
+                while pointers[node] < len(edges):
+                    edge = edges[pointers[node]]
+                    if self.capacity[edge] > 0 and levels[self.to[edge]] == levels[node] + 1:
+                        break
+                    pointers[node] += 1
+                else:
+                    if node == source:
+                        return flow
+                    levels[node] = -1  # dead end, prune from the level graph
+                    node = self.to[path.pop() ^ 1]
+                    pointers[node] += 1
+                    continue
+                path.append(edge)
+                node = self.to[edge]
+            bottleneck = min(self.capacity[edge] for edge in path)
+            for edge in path:
+                self.capacity[edge] -= bottleneck
+                self.capacity[edge ^ 1] += bottleneck
+            flow += bottleneck
+
+    def max_flow(self, source, sink):
+        flow = 0
+        levels = self.get_levels(source, sink)
+        while levels is not None:
+            flow += self.augment(source, sink, levels)
+            levels = self.get_levels(source, sink)
+        return flow
+
+
+def solve_casting(candidates, limits):
+    """
+    Assign at most one user to every post, maximising filled posts and then minimising the largest
+    number of casts given to a single user.
+
+    candidates: {post: [user, ...]} eligible users in preference order
+    limits: {user: max casts} a limit of None means no limit
+    returns {post: user}
+
+    Users are connected to the sink with a load cap that is raised one step at a time while the
+    flow keeps growing. The flow is a concave function of the cap, so the first step without growth
+    has reached the maximum, and the cap at that point is the smallest possible maximum load.
+    """
+    posts = list(candidates)
+    users = list({user for post in posts for user in candidates[post]})
+    user_nodes = {user: index for index, user in enumerate(users, len(posts) + 1)}
+    source, sink = 0, len(posts) + len(users) + 1
+    network = FlowNetwork(sink + 1)
+
+    assignment_edges = []
+    for index, post in enumerate(posts, 1):
+        network.add_edge(source, index, 1)
+        for user in candidates[post]:
+            assignment_edges.append((post, user, network.add_edge(index, user_nodes[user], 1)))
+
+    demand = defaultdict(int)
+    for post in posts:
+        for user in candidates[post]:
+            demand[user] += 1
+    caps = {}
+    for user in users:
+        limit = limits.get(user, None)
+        caps[user] = demand[user] if limit is None else min(limit, demand[user])
+    sink_edges = {user: network.add_edge(user_nodes[user], sink, 0) for user in users}
+
+    load, flow = 0, 0
+    while True:
+        load += 1
+        raised = False
+        for user in users:
+            if caps[user] >= load:
+                network.capacity[sink_edges[user]] += 1
+                raised = True
+        if not raised:
+            break
+        added = network.max_flow(source, sink)
+        if not added:
+            break
+        flow += added
+
+    return {post: user for post, user, edge in assignment_edges if network.get_flow(edge)}
+
+
+class CastingEngine(object):
+    """
+    Cast every open post of a league within a date window.
+
+    Open posts belong to active games in the window (default: from now until the league's advanced
+    scheduling limit). Applicants are eligible when accepted in the league and either a manager or
+    able to see the post's role. UserLeagueStatus.max_casts/max_backups limit the casts/backups a
+    user gets within the window, 0 meaning no limit. Backups over their limit are ordered after the
+    eligible backups and ineligible applicants last. Posts no eligible applicant can be cast on within
+    the limits are marked vacant, their first application is then a backup.
+    """
+
+    def __init__(self, league, date_time_after=None, date_time_before=None):
+        self.league = league
+        self.date_time_after = date_time_after or timezone.now()
+        self.date_time_before = date_time_before or (
+            self.date_time_after + timedelta(days=league.adv_scheduling_limit))
+
+    def get_post_queryset(self):
+        return Post.objects.filter(
+            game__division__league=self.league, game__is_active=True,
+            game__date_time__gte=self.date_time_after, game__date_time__lte=self.date_time_before)
+
+    def lock_posts(self):
+        """
+        Lock the open posts and their applications until the casting commits. Locking a post also blocks new
+        applications to it, their foreign key check needs a share lock on the post
+        """
+        posts = self.get_post_queryset()
+        list(posts.select_for_update(of=('self', )).order_by('pk').values_list('pk', flat=True))
+        list(Application.objects.select_for_update().filter(post__in=posts.values('pk')).order_by('pk').values_list(
+            'pk', flat=True))
+
+    def get_posts(self):
+        applications = Application.objects.order_by('order')
+        return list(self.get_post_queryset().select_related('game').prefetch_related(
+            Prefetch('application_set', queryset=applications)
+        ).order_by('game__date_time', 'pk'))
+
+    def get_statuses(self):
+        statuses = UserLeagueStatus.objects.filter(
+            league=self.league, request_status='accepted'
+        ).select_related('user').prefetch_related('visibilities')
+        return {status.user_id: status for status in statuses}
+
+    @staticmethod
+    def is_eligible(post, status):
+        if status is None:
+            return False
+        if status.user.is_manager():
+            return True
+        return post.role_id in {role.pk for role in status.visibilities.all()}
+
+    def solve(self, posts, statuses):
+        candidates = {}
+        for post in posts:
+            candidates[post.pk] = [
+                application.user_id for application in post.application_set.all()
+                if self.is_eligible(post, statuses.get(application.user_id, None))
+            ]
+        limits = {user: status.max_casts or None for user, status in statuses.items()}
+        return solve_casting(candidates, limits)
+
+    def get_orderings(self, posts, statuses, assignment):
+        """
+        Return {post: [applications]} with the casted application first and backups after it.
+        Backups keep their applied order, except users over max_backups are moved after the eligible
+        backups and ineligible users are moved to the end
+        """
+        backups = defaultdict(int)
+        orderings = {}
+        for post in posts:
+            applications = list(post.application_set.all())
+            casted = [app for app in applications if app.user_id == assignment.get(post.pk, None)]
+            rest = [app for app in applications if app not in casted]
+
+            def backup_rank(application):
+                status = statuses.get(application.user_id, None)
+                if not self.is_eligible(post, status):
+                    return 2
+                return int(bool(status.max_backups) and backups[application.user_id] >= status.max_backups)
+
+            rest.sort(key=backup_rank)  # stable, applied order is kept within each group
+            for application in rest:
+                backups[application.user_id] += 1
+            orderings[post.pk] = casted + rest
+        return orderings
+
+    def run(self, commit=True):
+        # read and written in one transaction, so concurrent applications, cancellations and reorders either
+        # wait for the casting or are read by it
+        with transaction.atomic():
+            if commit:
+                self.lock_posts()
+            return self.cast(commit)
+
+    def cast(self, commit):
+        posts = self.get_posts()
+        statuses = self.get_statuses()
+        assignment = self.solve(posts, statuses)
+        orderings = self.get_orderings(posts, statuses, assignment)
+        # posts the solver could not fill are left vacant rather than casting an ineligible or over limit user
+        vacant = {post.pk for post in posts if post.pk not in assignment and orderings[post.pk]}
+
+        changed, notifications, vacated, unvacated = [], [], [], []
+        for post in posts:
+            applications = orderings[post.pk]
+            is_vacant = post.pk in vacant
+            if is_vacant != post.is_vacant:
+                (vacated if is_vacant else unvacated).append(post.pk)
+            elif applications == list(post.application_set.all()):
+                continue
+            if not applications:
+                continue
+            base = min(application.order for application in applications)
+            for index, application in enumerate(applications):
+                was_casted = application.order == base and not post.is_vacant
+                is_casted = index == 0 and not is_vacant
+                if application.order != base + index * Application.order_gap:
+                    application.order = base + index * Application.order_gap
+                    changed.append(application)
+                if was_casted != is_casted:
+                    application.post = post
+                    notifications.append(build_application_notification(application, is_casted))
+
+        if commit:
+            Application.objects.bulk_update(changed, ['order'], batch_size=500)
+            Post.objects.filter(pk__in=vacated).update(is_vacant=True)
+            Post.objects.filter(pk__in=unvacated).update(is_vacant=False)
+            bulk_create_notifications(ApplicationNotification, notifications)
+
+        # reported from the committed orderings, the first application of a post that is not vacant is casted
+        casts = {post: applications[0].user_id for post, applications in orderings.items()
+                 if applications and post not in vacant}
+        loads = defaultdict(int)
+        for user in casts.values():
+            loads[user] += 1
+        return {
+            'posts': len(posts),
+            'filled': len(casts),
+            'unfilled': [post.pk for post in posts if post.pk not in casts],
+            'changed': len(changed),
+            'max_load': max(loads.values(), default=0),
+            'committed': commit
+        }
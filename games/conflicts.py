@@ -0,0 +1,88 @@
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+
+from .models import ApplicationInterval, get_game_interval
+
+# League.game_duration is capped at a day, so a booking starting earlier than this cannot reach a game.
+# Bounding the start on both sides keeps every lookup a range scan on the (user, start) index
+MAX_GAME_DURATION = timedelta(minutes=1440)
+
+
+def get_conflicts(user, games):
+    """
+    Resolve the user's application to another game overlapping each of the given games, in one query.
+    Games should have division__league selected.
+
+    Returns {game.pk: application.pk} for every game with a conflict
+    """
+    intervals = {game.pk: get_game_interval(game) for game in games}
+    if not intervals:
+        return {}
+    lower = min(start for start, end in intervals.values()) - MAX_GAME_DURATION
+    upper = max(end for start, end in intervals.values())
+    booked = list(ApplicationInterval.objects.filter(
+        user=user, start__gt=lower, start__lt=upper
+    ).order_by('start').values_list('start', 'end', 'game_id', 'application_id'))
+    starts = [row[0] for row in booked]
+
+    conflicts = {}
+    for game_pk, (start, end) in intervals.items():
+        # walk back from the last booking starting before this game ends
+        index = bisect_left(starts, end)
+        while index > 0 and starts[index - 1] > start - MAX_GAME_DURATION:
+            index -= 1
+            booked_start, booked_end, booked_game, application = booked[index]
+            if booked_end > start and booked_game != game_pk:
+                conflicts[game_pk] = application
+                break
+    return conflicts
+
+
+def get_league_conflicts(league, date_time_after, date_time_before=None):
+    """
+    Report every pair of overlapping applications by the same user where at least one game is in the league
+    and starts within the window. The other game may belong to any league.
+
+    Returns a list of {user, application, game, start, conflicting_application, conflicting_game,
+    conflicting_start} ordered by start, where application is always in the league
+    """
+    in_league = ApplicationInterval.objects.filter(game__division__league=league, start__gte=date_time_after)
+    bookings = ApplicationInterval.objects.filter(start__gt=date_time_after - MAX_GAME_DURATION)
+    if date_time_before is not None:
+        in_league = in_league.filter(start__lte=date_time_before)
+        bookings = bookings.filter(start__lt=date_time_before + MAX_GAME_DURATION)
+    bookings = bookings.filter(user__in=in_league.values('user')).order_by('user', 'start').values_list(
+        'user_id', 'application_id', 'game_id', 'start', 'end', 'game__division__league_id')
+
+    def reportable(row):
+        start = row[3]
+        return (row[5] == league.pk and start >= date_time_after and
+                (date_time_before is None or start <= date_time_before))
+
+    user_bookings = defaultdict(list)
+    for row in bookings:
+        user_bookings[row[0]].append(row)
+
+    report = []
+    for rows in user_bookings.values():
+        active = []  # sweep line over bookings sorted by start
+        for row in rows:
+            active = [other for other in active if other[4] > row[3]]
+            for other in active:
+                if other[2] == row[2]:
+                    continue
+                first, second = (other, row) if reportable(other) else (row, other)
+                if reportable(first):
+                    report.append({
+                        'user': first[0],
+                        'application': first[1],
+                        'game': first[2],
+                        'start': first[3],
+                        'conflicting_application': second[1],
+                        'conflicting_game': second[2],
+                        'conflicting_start': second[3]
+                    })
+            active.append(row)
+    report.sort(key=lambda conflict: (conflict['start'], conflict['application']))
+    return report
@@ -0,0 +1,97 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from users.models import UserLeagueStatus, UserRoleVisibility
+
+from .conflicts import get_conflicts
+from .models import Application, Post
+
+
+def valid():
+    return {
+        'status': 'valid',
+        'type': 'success'
+    }
+
+
+def invalid(invalid_type, **extra):
+    return dict({
+        'status': 'invalid',
+        'type': invalid_type
+    }, **extra)
+
+
+def get_eligibility(user, posts):
+    """
+    Resolve whether a user can apply to each of the given posts, in three queries regardless of the
+    number of posts. Posts should have game__division__league selected.
+
+    Returns {post.pk: {'status': 'valid' | 'invalid', 'type': ...}} where invalid types are
+    over_scheduling_limit, league, visibility, duplicate_post, duplicate_game and conflict
+    """
+    posts = list(posts)
+    now = timezone.now()
+    league_ids = {post.game.division.league_id for post in posts}
+    game_ids = {post.game_id for post in posts}
+
+    accepted, visibilities = set(), defaultdict(set)
+    statuses = UserLeagueStatus.objects.filter(user=user, league__in=league_ids).values_list(
+        'league_id', 'request_status', 'visibilities')
+    for league_id, request_status, role_id in statuses:
+        if request_status == 'accepted':
+            accepted.add(league_id)
+        if role_id is not None:
+            visibilities[league_id].add(role_id)
+
+    applied_posts, applied_games = {}, {}
+    for application_pk, post_pk, game_pk in Application.objects.filter(
+            user=user, post__game__in=game_ids).values_list('pk', 'post_id', 'post__game_id'):
+        applied_posts[post_pk] = application_pk
+        applied_games[game_pk] = application_pk
+    conflicts = get_conflicts(user, {post.game_id: post.game for post in posts}.values())
+
+    eligibility = {}
+    for post in posts:
+        league = post.game.division.league
+        if (post.game.date_time - now).days > league.adv_scheduling_limit:
+            eligibility[post.pk] = invalid(
+                'over_scheduling_limit', adv_scheduling_limit=str(league.adv_scheduling_limit))
+        elif league.pk not in accepted:
+            eligibility[post.pk] = invalid('league')
+        elif not user.is_manager() and post.role_id not in visibilities[league.pk]:
+            eligibility[post.pk] = invalid('visibility')
+        elif post.pk in applied_posts:
+            eligibility[post.pk] = invalid('duplicate_post', application=str(applied_posts[post.pk]))
+        elif post.game_id in applied_games:
+            eligibility[post.pk] = invalid('duplicate_game', application=str(applied_games[post.game_id]))
+        elif post.game_id in conflicts:
+            eligibility[post.pk] = invalid('conflict', application=str(conflicts[post.game_id]))
+        else:
+            eligibility[post.pk] = valid()
+    return eligibility
+
+
+def get_open_posts(user):
+    """
+    Unfilled posts (no applications, or left vacant by auto casting) of upcoming active games that the user can
+    apply to: accepted in the league, within the league's advanced scheduling limit, role visible to the user
+    (managers see every role) and no application to the same game. Visibility is read from the UserRoleVisibility
+    index
+    """
+    now = timezone.now()
+    windows = Q(pk__in=[])
+    for league in user.leagues.accepted():
+        windows |= Q(game__division__league=league,
+                     game__date_time__lt=now + timedelta(days=league.adv_scheduling_limit + 1))
+
+    posts = Post.objects.annotate(has_applications=Exists(Application.objects.filter(post=OuterRef('pk')))).filter(
+        windows, Q(is_vacant=True) | Q(has_applications=False),
+        ~Exists(Application.objects.filter(user=user, post__game=OuterRef('game'))),
+        game__is_active=True, game__date_time__gte=now
+    )
+    if not user.is_manager():
+        posts = posts.filter(role__in=UserRoleVisibility.objects.filter(user=user).values('role'))
+    return posts.select_related('game__division', 'role').order_by('game__date_time', 'pk')
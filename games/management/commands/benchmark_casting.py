@@ -0,0 +1,46 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from games.casting import solve_casting
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the casting solver on synthetic posts and umpires (no database access)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=3000)
+        parser.add_argument('--umpires', type=int, default=1000)
+        parser.add_argument('--applicants', type=int, default=5,
+                            help='average number of applicants per post')
+        parser.add_argument('--max-casts', type=int, default=0,
+                            help='casts allowed per umpire, 0 for no limit')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        umpires = range(options['umpires'])
+        candidates = {
+            post: rng.sample(umpires, min(len(umpires), rng.randint(0, 2 * options['applicants'])))
+            for post in range(options['posts'])
+        }
+        limits = {umpire: options['max_casts'] or None for umpire in umpires}
+
+        start = time.perf_counter()
+        assignment = solve_casting(candidates, limits)
+        elapsed = time.perf_counter() - start
+
+        loads = {}
+        for umpire in assignment.values():
+            loads[umpire] = loads.get(umpire, 0) + 1
+        fillable = sum(1 for users in candidates.values() if users)
+        self.stdout.write(
+            f"posts: {options['posts']}, umpires: {options['umpires']}, "
+            f"applications: {sum(len(users) for users in candidates.values())}"
+        )
+        self.stdout.write(
+            f"filled: {len(assignment)}/{fillable} posts with applicants, "
+            f"max casts per umpire: {max(loads.values(), default=0)}"
+        )
+        self.stdout.write(f"solved in {elapsed:.3f}s")
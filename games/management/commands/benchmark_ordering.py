@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from model_bakery import baker
+
+from games.models import Application
+from notifications.models import application_notification_receiver
+
+
+class Command(BaseCommand):
+    help = ('Compare application move latency of gap ordering against contiguous renumbering for growing post sizes. '
+            'Data is created inside a transaction that is rolled back. Application notifications are disconnected '
+            'so only the ordering cost is measured')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 5000])
+        parser.add_argument('--moves', type=int, default=50)
+
+    def analyze(self):
+        # planner statistics for the rewritten rows, as autovacuum would provide
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Application._meta.db_table}")
+
+    @staticmethod
+    def contiguous_top(application):
+        """
+        The contiguous renumbering move gap ordering replaced: every sibling above the object is shifted down
+        """
+        order = application.get_ordering_queryset().get_min_order()
+        if application.order == order:
+            return
+        application.get_ordering_queryset().below_instance(application).above(order, inclusive=True).increase_order()
+        application.order = order
+        application.save(update_fields=['order'])
+
+    def time_moves(self, applications, move, moves):
+        start = time.perf_counter()
+        for index in range(moves):
+            application = applications[-1 - index % len(applications)]
+            application.refresh_from_db(fields=['order'])
+            move(application)
+        return (time.perf_counter() - start) / moves * 1000
+
+    def handle(self, *args, **options):
+        post_save.disconnect(application_notification_receiver, sender=Application)
+        try:
+            self.run(options)
+        finally:
+            post_save.connect(application_notification_receiver, sender=Application)
+
+    def make_applications(self, size):
+        post = baker.make('games.Post')
+        Application.objects.bulk_create([
+            Application(post=post, user=baker.make('users.User')) for _ in range(size)
+        ])  # contiguous orders
+        return list(Application.objects.filter(post=post))
+
+    def run(self, options):
+        with transaction.atomic():
+            for size in options['sizes']:
+                # gap ordering first, contiguous moves leave many dead rows behind inside the transaction
+                applications = self.make_applications(size)
+                applications[0].rebalance()
+                self.analyze()
+                gap = self.time_moves(applications, Application.top, options['moves'])
+
+                applications = self.make_applications(size)
+                self.analyze()
+                contiguous = self.time_moves(applications, self.contiguous_top, options['moves'])
+                self.stdout.write(
+                    f"post size {size}: contiguous {contiguous:.2f}ms per move, gap {gap:.2f}ms per move")
+            transaction.set_rollback(True)
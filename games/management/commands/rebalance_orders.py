@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from games.models import Application
+from leagues.models import Division, Level, Role
+
+
+class Command(BaseCommand):
+    help = 'Respace gap ordered siblings whose smallest gap fell below a threshold. Meant to run periodically'
+    models = (Application, Division, Role, Level)
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-gap', type=int, default=8,
+                            help='rebalance a group when two neighbours are closer than this')
+
+    def handle(self, *args, **options):
+        for model in self.models:
+            group_field = model.order_with_respect_to + '_id'
+            order_field = model.order_field_name
+            rows = model.objects.order_by(group_field, order_field).values_list(group_field, order_field, 'pk')
+
+            crowded, previous = {}, (None, None)
+            for group, order, pk in rows.iterator():
+                if group == previous[0] and order - previous[1] < options['min_gap']:
+                    crowded.setdefault(group, pk)
+                previous = (group, order)
+
+            for pk in crowded.values():
+                model.objects.get(pk=pk).rebalance()
+            self.stdout.write(f"{model.__name__}: rebalanced {len(crowded)} groups")
@@ -0,0 +1,21 @@
+# Generated by Django 3.0.7 on 2026-10-18 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0004_auto_20200819_1939'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='game',
+            options={'ordering': ['date_time']},
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['post', 'order'], name='games_appli_post_id_f71869_idx'),
+        ),
+    ]
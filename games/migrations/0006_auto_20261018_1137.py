@@ -0,0 +1,45 @@
+# Generated by Django 3.0.7 on 2026-10-18 11:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from datetime import timedelta
+
+
+def build_application_intervals(apps, schema_editor):
+    Application = apps.get_model('games', 'Application')
+    ApplicationInterval = apps.get_model('games', 'ApplicationInterval')
+    applications = Application.objects.values_list(
+        'pk', 'user_id', 'post__game_id', 'post__game__date_time', 'post__game__division__league__game_duration')
+    ApplicationInterval.objects.bulk_create([
+        ApplicationInterval(application_id=pk, user_id=user, game_id=game, start=date_time,
+                            end=date_time + timedelta(minutes=duration))
+        for pk, user, game, date_time, duration in applications.iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('games', '0005_auto_20261018_1132'),
+        ('leagues', '0016_league_game_duration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicationInterval',
+            fields=[
+                ('application', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='games.Application')),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='games.Game')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='applicationinterval',
+            index=models.Index(fields=['user', 'start'], name='games_appli_user_id_f2ad43_idx'),
+        ),
+        migrations.RunPython(build_application_intervals, migrations.RunPython.noop),
+    ]
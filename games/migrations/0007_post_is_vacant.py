@@ -0,0 +1,18 @@
+# Generated by Django 3.0.7 on 2026-10-18 12:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0006_auto_20261018_1137'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='is_vacant',
+            field=models.BooleanField(default=False),
+        ),
+    ]
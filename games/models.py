@@ -1,10 +1,15 @@
+from collections import defaultdict
+from datetime import timedelta
+
 from django.db import models
+from django.db.models import BooleanField, Case, Exists, F, Min, OuterRef, Q, Subquery, Value, When
 from django.db.models.signals import post_save
-from ordered_model.models import OrderedModel
+from ordered_model.models import OrderedModel, OrderedModelQuerySet
 from django.utils import timezone
-from users.models import UserLeagueStatus
+from users.models import UserLeagueStatus, UserRoleVisibility
+from leagues.models import League, Role
 
-from backend.mixins import OrderedModelUpdateMixin
+from backend.mixins import GapOrderedModelMixin
 
 
 class Game(models.Model):
@@ -59,6 +64,21 @@ class Post(models.Model):
     game = models.ForeignKey(Game, on_delete=models.CASCADE)
     role = models.ForeignKey('leagues.Role', on_delete=models.CASCADE)
     notes = models.TextField(blank=True, max_length=1028, null=True)
+    # set by auto casting when no applicant can be cast, the lowest ordered application is then a backup
+    # until a manager casts or reorders the post, or its applications change (see refresh_vacancy)
+    is_vacant = models.BooleanField(default=False)
+
+    def get_eligible_applications(self):
+        """
+        Applications of users who can be cast on the post: accepted in its league and either a manager
+        or able to see its role
+        """
+        return Application.objects.filter(post=self).annotate(
+            can_see=Exists(UserRoleVisibility.objects.filter(user=OuterRef('user'), role=self.role_id)),
+            league_manager=Exists(UserLeagueStatus.objects.filter(
+                user=OuterRef('user'), league__division__game__post=self.pk, request_status='accepted',
+                user__account_type='manager'))
+        ).filter(Q(can_see=True) | Q(league_manager=True)).order_by('order')
 
     # def over_scheduling_limit(self, adv_scheduling):
     #     return (self.game.date_time - timezone.now()).days > adv_scheduling
@@ -102,20 +122,106 @@ class Post(models.Model):
     #     }
 
 
+def create_posts_for_games(games):
+    """
+    Create a post for every role in each game's division using a single bulk insert.
+    Used when many games are created together (Game.objects.bulk_create does not send post_save)
+    """
+    games = list(games)
+    division_roles = defaultdict(list)
+    for role in Role.objects.filter(division__in={game.division_id for game in games}):
+        division_roles[role.division_id].append(role)
+    return Post.objects.bulk_create([
+        Post(game=game, role=role) for game in games for role in division_roles[game.division_id]
+    ])
+
+
 def create_posts_from_game(sender, instance, *args, **kwargs):
     if kwargs['created']:
-        for role in instance.division.role_set.all():
-            Post.objects.create(game=instance, role=role)
+        Post.objects.bulk_create([
+            Post(game=instance, role=role) for role in instance.division.role_set.all()
+        ])
 
 
 post_save.connect(create_posts_from_game, sender=Game)
 
 
-class Application(OrderedModelUpdateMixin, OrderedModel):
+class ApplicationQuerySet(OrderedModelQuerySet):
+
+    def annotate_casted(self):
+        """
+        Annotate each application with `casted`, True when it holds the lowest order of its post
+        and the post is not vacant
+        """
+        min_order = Application.objects.filter(post=OuterRef('post')).order_by().values(
+            'post').annotate(min_order=Min('order')).values('min_order')
+        return self.annotate(casted=Case(
+            When(order=Subquery(min_order), post__is_vacant=False, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField()
+        ))
+
+
+class ApplicationManager(models.Manager.from_queryset(ApplicationQuerySet)):
+    pass
+
+
+class Application(GapOrderedModelMixin, OrderedModel):
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
     user = models.ForeignKey('users.User', on_delete=models.CASCADE)
     comments = models.TextField(blank=True, max_length=1028, null=True)
     order_with_respect_to = 'post'
 
+    objects = ApplicationManager()
+
+    class Meta(OrderedModel.Meta):
+        indexes = [
+            models.Index(fields=['post', 'order'])
+        ]
+
     def is_casted(self):
-        return self.get_ordering_queryset().get_min_order() == self.order
\ No newline at end of file
+        return Application.objects.annotate_casted().filter(pk=self.pk, casted=True).exists()
+
+
+class ApplicationInterval(models.Model):
+    """
+    Time [start, end) a user is booked by an application. Indexed per user so overlap checks are a range scan
+    """
+    application = models.OneToOneField(Application, on_delete=models.CASCADE, primary_key=True)
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE)
+    game = models.ForeignKey(Game, on_delete=models.CASCADE)
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'start'])
+        ]
+
+
+def get_game_interval(game):
+    return game.date_time, game.date_time + timedelta(minutes=game.division.league.game_duration)
+
+
+def create_application_interval(sender, instance, *args, **kwargs):
+    if kwargs['created']:
+        start, end = get_game_interval(instance.post.game)
+        ApplicationInterval.objects.create(application=instance, user_id=instance.user_id,
+                                           game_id=instance.post.game_id, start=start, end=end)
+
+
+def update_game_intervals(sender, instance, *args, **kwargs):
+    if not kwargs['created']:
+        start, end = get_game_interval(instance)
+        ApplicationInterval.objects.filter(game=instance).update(start=start, end=end)
+
+
+def update_league_intervals(sender, instance, *args, **kwargs):
+    if not kwargs['created']:
+        ApplicationInterval.objects.filter(game__division__league=instance).update(
+            end=F('start') + timedelta(minutes=instance.game_duration))
+
+
+post_save.connect(create_application_interval, sender=Application)
+post_save.connect(update_game_intervals, sender=Game)
+post_save.connect(update_league_intervals, sender=League)
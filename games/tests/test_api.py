@@ -1,13 +1,26 @@
+import base64
+import csv
+import io
+import json
 from datetime import timedelta
 
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import F
 from django.shortcuts import reverse
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from model_bakery import baker
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from backend import mixins
+from backend.pagination import KeysetPagination
+from games.api.filters import ApplicationFilter
+from games.eligibility import get_eligibility
+from games.models import Application, Game, Post, create_posts_for_games
 from leagues.models import Division, League
+from notifications.models import ApplicationNotification, GameNotification
 from users.models import UserLeagueStatus
 
 
@@ -51,6 +64,20 @@ class TestApplicationAPI(mixins.TestCreateMixin, mixins.TestDeleteMixin, mixins.
         response = self.client.patch(cast_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_cast_loads_application_once(self):
+        self.user.is_superuser = False
+        self.user.account_type = 'manager'
+        self.user.save()
+        application = baker.make('games.Application')
+        self.user.leagues.add(application.post.game.division.league, through_defaults={'request_status': 'accepted'})
+        cast_url = reverse('application-cast', kwargs={'pk': application.pk})
+        self.client.patch(cast_url)  # warm the membership cache
+        with self.assertNumQueries(2):  # application with its game chain, then the top order of the post
+            response = self.client.patch(cast_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        missing_url = reverse('application-cast', kwargs={'pk': application.pk + 1})
+        self.assertEqual(self.client.patch(missing_url).status_code, status.HTTP_404_NOT_FOUND)
+
 
 class TestPostAPI(mixins.TestCreateMixin, mixins.TestDeleteMixin,
                   mixins.TestSetupMixin, APITestCase):
@@ -107,3 +134,511 @@ class TestGameAPI(mixins.TestCreateMixin, mixins.TestRetrieveMixin,
             'date_time_after': ['2020-07-31T02:29:28.982442Z'],
             'division__in': [', '.join([str(division.pk) for division in Division.objects.all()])]
         }
+
+
+class TestApplicationCastedFilter(mixins.TestSetupMixin, APITestCase):
+    """
+    Test casted filter is resolved in SQL with a constant number of queries
+    """
+
+    def make_posts(self, quantity):
+        for post in baker.make('games.Post', _quantity=quantity):
+            baker.make('games.Application', post=post, _quantity=3)
+
+    def test_casted_filter(self):
+        self.make_posts(2)
+        casted = ApplicationFilter({'casted': 'true'}, queryset=Application.objects.all()).qs
+        backups = ApplicationFilter({'casted': 'false'}, queryset=Application.objects.all()).qs
+        self.assertEqual(casted.count(), 2)
+        self.assertEqual(backups.count(), 4)
+        for application in casted:
+            self.assertTrue(application.is_casted())
+
+    def test_casted_filter_keeps_queryset(self):
+        self.make_posts(2)
+        application = Application.objects.first()
+        qs = Application.objects.filter(user=application.user)
+        casted = ApplicationFilter({'casted': str(application.is_casted())}, queryset=qs).qs
+        self.assertEqual(list(casted), [application])
+
+    def test_casted_filter_query_count(self):
+        for quantity in (1, 20):
+            self.make_posts(quantity)
+            with self.assertNumQueries(1):
+                list(ApplicationFilter({'casted': 'true'}, queryset=Application.objects.all()).qs)
+
+
+class TestGameQueryBudget(mixins.TestSetupMixin, APITestCase):
+    """
+    Test game list/retrieve cost a fixed number of queries
+    """
+
+    def make_games(self, quantity):
+        division = baker.make('leagues.Division')
+        baker.make('leagues.Role', division=division, _quantity=3)
+        games = baker.make('games.Game', division=division, _quantity=quantity)
+        for post in Post.objects.filter(game__in=games):
+            baker.make('games.Application', post=post, _quantity=2)
+        return games
+
+    def test_list_query_budget(self):
+        list_url = ''.join([reverse('game-list'), '?page_size=100'])
+        for quantity in (1, 25):
+            self.make_games(quantity)
+            # count, games, posts, applications with users
+            with self.assertNumQueries(4):
+                response = self.client.get(list_url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_query_budget(self):
+        game = self.make_games(1)[0]
+        retrieve_url = reverse('game-detail', kwargs={'pk': game.pk})
+        with self.assertNumQueries(3):
+            response = self.client.get(retrieve_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['posts']), 3)
+
+
+class TestCreatePosts(APITestCase):
+    """
+    Test posts are fanned out from games with bulk inserts
+    """
+
+    def test_create_posts_from_game(self):
+        division = baker.make('leagues.Division')
+        baker.make('leagues.Role', division=division, _quantity=5)
+        game = baker.make('games.Game', division=division)
+        self.assertEqual(game.post_set.count(), 5)
+
+    def test_create_posts_for_games(self):
+        divisions = baker.make('leagues.Division', _quantity=2)
+        for division in divisions:
+            baker.make('leagues.Role', division=division, _quantity=3)
+        Game.objects.bulk_create([
+            Game(division=division, title='bulk game', date_time=timezone.now(), location='field')
+            for division in divisions for _ in range(10)
+        ])
+        games = list(Game.objects.filter(title='bulk game'))
+        with self.assertNumQueries(2):
+            create_posts_for_games(games)
+        self.assertEqual(Post.objects.filter(game__in=games).count(), 60)
+
+
+class TestGameBulkAPI(mixins.TestSetupMixin, APITestCase):
+    """
+    Test bulk game import from json and csv
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.division = baker.make('leagues.Division')
+        baker.make('leagues.Role', division=self.division, _quantity=2)
+        self.user.leagues.add(self.division.league, through_defaults={
+                              'request_status': 'accepted'})
+        self.bulk_url = reverse('game-bulk')
+
+    def get_rows(self, quantity):
+        return [{
+            'title': f'bulk game {index}',
+            'division': self.division.pk,
+            'date_time': (timezone.now() + timedelta(days=index)).isoformat(),
+            'location': 'field'
+        } for index in range(quantity)]
+
+    def test_bulk_create_json(self):
+        response = self.client.post(self.bulk_url, data={'games': self.get_rows(20)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 20)
+        self.assertEqual(Game.objects.filter(division=self.division).count(), 20)
+
+    def test_bulk_create_csv(self):
+        rows = self.get_rows(5)
+        content = io.StringIO()
+        writer = csv.DictWriter(content, fieldnames=rows[0].keys())
+        writer.writeheader()
+        writer.writerows(rows)
+        upload = SimpleUploadedFile('games.csv', content.getvalue().encode('utf-8'), content_type='text/csv')
+        response = self.client.post(self.bulk_url, data={'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Game.objects.filter(division=self.division).count(), 5)
+
+    def test_bulk_create_fan_out(self):
+        response = self.client.post(self.bulk_url, data={'games': self.get_rows(10)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Post.objects.filter(game__division=self.division).count(), 20)
+        self.assertEqual(GameNotification.objects.filter(game__division=self.division).count(), 10)
+
+    def test_bulk_create_row_errors(self):
+        self.user.is_superuser = False
+        self.user.account_type = 'manager'
+        self.user.save()
+        rows = self.get_rows(3)
+        rows[1]['division'] = baker.make('leagues.Division').pk
+        del rows[2]['title']
+        response = self.client.post(self.bulk_url, data={'games': rows}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['row'] for error in response.data['errors']], [1, 2])
+        self.assertFalse(Game.objects.filter(division=self.division).exists())
+
+    def test_bulk_create_unreadable_csv(self):
+        for content in ('title\n'.encode('utf-16'), b'title\n' + b'a' * 200000 + b'\n'):
+            upload = SimpleUploadedFile('games.csv', content, content_type='text/csv')
+            response = self.client.post(self.bulk_url, data={'file': upload}, format='multipart')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('file', response.data)
+
+    def test_bulk_create_superuser_any_league(self):
+        rows = self.get_rows(2)
+        division = baker.make('leagues.Division')
+        rows[1]['division'] = division.pk
+        response = self.client.post(self.bulk_url, data={'games': rows}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Game.objects.filter(division=division).exists())
+
+
+class TestAutoCastAPI(mixins.TestSetupMixin, APITestCase):
+    """
+    Test automatic casting of a league's open posts
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.league = baker.make('leagues.League')
+        division = baker.make('leagues.Division', league=self.league)
+        self.role = baker.make('leagues.Role', division=division)
+        self.games = baker.make('games.Game', division=division,
+                                date_time=timezone.now() + timedelta(days=5), _quantity=2)
+        self.umpires = baker.make('users.User', account_type='umpire', _quantity=2)
+        for umpire in self.umpires:
+            uls = baker.make('users.UserLeagueStatus', user=umpire, league=self.league,
+                             request_status='accepted')
+            uls.visibilities.add(self.role)
+        # every umpire applies to every post in the same order
+        for post in Post.objects.filter(game__in=self.games):
+            for order, umpire in enumerate(self.umpires):
+                baker.make('games.Application', post=post, user=umpire, order=order)
+        self.auto_cast_url = reverse('post-auto-cast')
+
+    def get_casted_users(self):
+        casted = Application.objects.filter(post__game__in=self.games).annotate_casted().filter(casted=True)
+        return sorted(application.user_id for application in casted)
+
+    def test_auto_cast_balances_load(self):
+        response = self.client.post(self.auto_cast_url, data={'league': self.league.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['filled'], 2)
+        self.assertEqual(response.data['max_load'], 1)
+        self.assertEqual(self.get_casted_users(), sorted(umpire.pk for umpire in self.umpires))
+        self.assertEqual(ApplicationNotification.objects.count(), 4 + 2)
+
+    def test_auto_cast_visibility(self):
+        UserLeagueStatus.objects.get(user=self.umpires[1]).visibilities.clear()
+        response = self.client.post(self.auto_cast_url, data={'league': self.league.pk}, format='json')
+        self.assertEqual(response.data['filled'], 2)
+        self.assertEqual(self.get_casted_users(), [self.umpires[0].pk] * 2)
+
+    def test_auto_cast_max_casts(self):
+        UserLeagueStatus.objects.filter(user__in=self.umpires).update(max_casts=1)
+        UserLeagueStatus.objects.get(user=self.umpires[1]).visibilities.clear()
+        response = self.client.post(self.auto_cast_url, data={'league': self.league.pk}, format='json')
+        self.assertEqual(response.data['filled'], 1)
+        self.assertEqual(len(response.data['unfilled']), 1)
+        self.assertEqual(response.data['max_load'], 1)
+        # the post left unfilled is vacant instead of casting umpires[0] over max_casts or umpires[1] without visibility
+        self.assertEqual(self.get_casted_users(), [self.umpires[0].pk])
+        vacant = Post.objects.get(pk=response.data['unfilled'][0])
+        self.assertTrue(vacant.is_vacant)
+        self.assertEqual([application.user_id for application in vacant.application_set.order_by('order')],
+                         [umpire.pk for umpire in self.umpires])
+
+    def test_auto_cast_no_visibility(self):
+        for uls in UserLeagueStatus.objects.filter(user__in=self.umpires):
+            uls.visibilities.clear()
+        response = self.client.post(self.auto_cast_url, data={'league': self.league.pk}, format='json')
+        self.assertEqual((response.data['filled'], response.data['max_load']), (0, 0))
+        self.assertEqual(len(response.data['unfilled']), 2)
+        self.assertEqual(self.get_casted_users(), [])
+        # casting by hand fills the vacancy
+        application = Application.objects.get(post__game=self.games[0], user=self.umpires[1])
+        response = self.client.patch(reverse('application-cast', kwargs={'pk': application.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Post.objects.get(pk=application.post_id).is_vacant)
+        self.assertEqual(self.get_casted_users(), [self.umpires[1].pk])
+
+    def test_vacancy_refreshed(self):
+        for uls in UserLeagueStatus.objects.filter(user__in=self.umpires):
+            uls.visibilities.clear()
+        self.client.post(self.auto_cast_url, data={'league': self.league.pk}, format='json')
+        posts = [Post.objects.get(game=game) for game in self.games]
+        self.assertTrue(all(post.is_vacant for post in posts))
+        # an ineligible applicant keeps the post vacant, an eligible one is cast
+        baker.make('games.Application', post=posts[0], user=baker.make('users.User'))
+        self.assertTrue(Post.objects.get(pk=posts[0].pk).is_vacant)
+        umpire = baker.make('users.User', account_type='umpire')
+        uls = baker.make('users.UserLeagueStatus', user=umpire, league=self.league, request_status='accepted')
+        uls.visibilities.add(self.role)
+        baker.make('games.Application', post=posts[0], user=umpire)
+        self.assertFalse(Post.objects.get(pk=posts[0].pk).is_vacant)
+        self.assertEqual(self.get_casted_users(), [umpire.pk])
+        self.assertTrue(ApplicationNotification.objects.filter(application__user=umpire,
+                                                               subject__startswith='Casted').exists())
+        # a post without applications is open again
+        posts[1].application_set.all().delete()
+        self.assertFalse(Post.objects.get(pk=posts[1].pk).is_vacant)
+
+    def test_auto_cast_locks_applications(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.auto_cast_url, data={'league': self.league.pk}, format='json')
+        locks = [query['sql'] for query in queries if 'FOR UPDATE' in query['sql']]
+        self.assertEqual(len(locks), 2)
+        self.assertIn('FOR UPDATE OF "games_post"', locks[0])
+        self.assertIn('"games_application"', locks[1])
+
+    def test_auto_cast_dry_run(self):
+        response = self.client.post(self.auto_cast_url, data={'league': self.league.pk, 'commit': False},
+                                    format='json')
+        self.assertEqual(response.data['changed'], 2)
+        self.assertEqual(self.get_casted_users(), [self.umpires[0].pk] * 2)
+
+    def test_auto_cast_missing_league(self):
+        response = self.client.post(self.auto_cast_url, data={}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestPostEligibilityAPI(mixins.TestSetupMixin, APITestCase):
+    """
+    Test eligibility of a user for the posts of many games
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user.account_type = 'umpire'
+        self.user.save()
+        league = baker.make('leagues.League', adv_scheduling_limit=30)
+        division = baker.make('leagues.Division', league=league)
+        self.roles = baker.make('leagues.Role', division=division, _quantity=2)
+        self.games = [baker.make('games.Game', division=division,
+                                 date_time=timezone.now() + timedelta(days=10 + index)) for index in range(3)]
+        self.late_game = baker.make('games.Game', division=division,
+                                    date_time=timezone.now() + timedelta(days=60))
+        self.user.leagues.add(league, through_defaults={'request_status': 'accepted'})
+        UserLeagueStatus.objects.get(user=self.user, league=league).visibilities.add(self.roles[0])
+        self.applied = Post.objects.get(game=self.games[0], role=self.roles[0])
+        baker.make('games.Application', post=self.applied, user=self.user)
+
+    def get_eligibility(self, games):
+        eligibility_url = reverse('post-eligibility')
+        game__in = ','.join(str(game.pk) for game in games)
+        return self.client.get(f"{eligibility_url}?user={self.user.pk}&game__in={game__in}")
+
+    def test_eligibility(self):
+        response = self.get_eligibility(self.games + [self.late_game])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        types = {(entry['game'], Post.objects.get(pk=entry['post']).role_id): entry['type']
+                 for entry in response.data}
+        self.assertEqual(types[(self.games[0].pk, self.roles[0].pk)], 'duplicate_post')
+        self.assertEqual(types[(self.games[0].pk, self.roles[1].pk)], 'visibility')
+        self.assertEqual(types[(self.games[1].pk, self.roles[0].pk)], 'success')
+        self.assertEqual(types[(self.late_game.pk, self.roles[0].pk)], 'over_scheduling_limit')
+
+    def test_eligibility_query_count(self):
+        # posts, league statuses, applications, booked intervals
+        with self.assertNumQueries(4):
+            get_eligibility(self.user, Post.objects.select_related('game__division__league'))
+
+    def test_eligibility_other_user(self):
+        eligibility_url = reverse('post-eligibility')
+        self.user.is_superuser = False
+        self.user.save()
+        other = baker.make('users.User')
+        response = self.client.get(f"{eligibility_url}?user={other.pk}&game__in={self.games[0].pk}")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_eligibility_superuser_other_user(self):
+        eligibility_url = reverse('post-eligibility')
+        other = baker.make('users.User', account_type='umpire')
+        self.client.force_authenticate(user=baker.make('users.User', is_superuser=True))
+        response = self.client.get(f"{eligibility_url}?user={self.user.pk}&game__in={self.games[0].pk}")
+        types = {Post.objects.get(pk=entry['post']).role_id: entry['type'] for entry in response.data}
+        self.assertEqual(types, {self.roles[0].pk: 'duplicate_post', self.roles[1].pk: 'visibility'})
+        response = self.client.get(f"{eligibility_url}?user={other.pk}&game__in={self.games[0].pk}")
+        self.assertEqual({entry['type'] for entry in response.data}, {'league'})
+        missing = baker.make('users.User')
+        missing_pk = missing.pk
+        missing.delete()
+        response = self.client.get(f"{eligibility_url}?user={missing_pk}&game__in={self.games[0].pk}")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(f"{eligibility_url}?game__in={self.games[0].pk}")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestGapOrdering(APITestCase):
+    """
+    Test applications are ordered with gaps and only rewrite the moved row
+    """
+
+    def setUp(self):
+        self.post = baker.make('games.Post')
+        self.applications = [Application.objects.create(post=self.post, user=baker.make('users.User'))
+                             for _ in range(4)]
+
+    def get_users(self):
+        return list(self.post.application_set.values_list('user', flat=True))
+
+    def test_create_with_gaps(self):
+        orders = [application.order for application in self.applications]
+        self.assertEqual(orders, [Application.order_base + index * Application.order_gap for index in range(4)])
+
+    def test_top(self):
+        last = self.applications[-1]
+        last.top()
+        self.assertTrue(last.is_casted())
+        self.assertFalse(Application.objects.get(pk=self.applications[0].pk).is_casted())
+        self.assertEqual(self.get_users()[0], last.user_id)
+        # siblings keep their order values
+        self.assertEqual(list(Application.objects.filter(pk__in=[app.pk for app in self.applications[:3]])
+                              .values_list('order', flat=True)),
+                         [application.order for application in self.applications[:3]])
+
+    def test_to_rebalances_without_room(self):
+        Application.objects.filter(post=self.post).update(order=F('order') - Application.order_base)
+        Application.objects.filter(pk=self.applications[1].pk).update(order=1)
+        Application.objects.filter(pk=self.applications[0].pk).update(order=0)
+        last = Application.objects.get(pk=self.applications[-1].pk)
+        last.to(1)
+        users = [application.user_id for application in self.applications]
+        self.assertEqual(self.get_users(), [users[0], users[3], users[1], users[2]])
+
+    def test_delete_keeps_orders(self):
+        self.applications[0].delete()
+        self.assertTrue(Application.objects.get(pk=self.applications[1].pk).is_casted())
+        self.assertEqual(Application.objects.get(pk=self.applications[1].pk).order, self.applications[1].order)
+
+
+class TestApplicationReorderAPI(mixins.TestSetupMixin, APITestCase):
+    """
+    Test replacing the ordering of a post's applications in one request
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.post = baker.make('games.Post')
+        self.applications = [Application.objects.create(post=self.post, user=baker.make('users.User'))
+                             for _ in range(3)]
+        self.reorder_url = reverse('application-reorder', kwargs={'pk': self.applications[0].pk})
+
+    def test_reorder(self):
+        pks = [self.applications[2].pk, self.applications[0].pk, self.applications[1].pk]
+        notifications = ApplicationNotification.objects.count()
+        response = self.client.patch(self.reorder_url, data={'order': pks}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(self.post.application_set.values_list('pk', flat=True)), pks)
+        self.assertTrue(Application.objects.get(pk=pks[0]).is_casted())
+        # previously casted and newly casted applications are notified
+        self.assertEqual(ApplicationNotification.objects.count(), notifications + 2)
+
+    def test_reorder_requires_every_application(self):
+        pks = [self.applications[1].pk, self.applications[0].pk]
+        response = self.client.patch(self.reorder_url, data={'order': pks}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(self.reorder_url, data={'order': pks + [pks[0]]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(self.reorder_url, data={}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Application.objects.get(pk=self.applications[0].pk).is_casted())
+
+
+class TestConflictsAPI(mixins.TestSetupMixin, APITestCase):
+    """
+    Test double booking detection across leagues
+    """
+
+    def setUp(self):
+        super().setUp()
+        start = timezone.now() + timedelta(days=2)
+        self.leagues = [baker.make('leagues.League', game_duration=duration) for duration in (120, 60)]
+        self.posts = []
+        for league, offset in zip(self.leagues, (timedelta(), timedelta(hours=1))):
+            role = baker.make('leagues.Role', division=baker.make('leagues.Division', league=league))
+            uls = baker.make('users.UserLeagueStatus', user=self.user, league=league, request_status='accepted')
+            uls.visibilities.add(role)
+            game = baker.make('games.Game', division=role.division, date_time=start + offset)
+            self.posts.append(Post.objects.get(game=game))
+        self.application = Application.objects.create(post=self.posts[0], user=self.user)
+
+    def get_eligibility_type(self):
+        post = Post.objects.select_related('game__division__league').get(pk=self.posts[1].pk)
+        return get_eligibility(self.user, [post])[post.pk]['type']
+
+    def test_create_conflict(self):
+        self.assertEqual(self.get_eligibility_type(), 'conflict')
+        response = self.client.post(reverse('application-list'), data={'post': self.posts[1].pk, 'user': self.user.pk})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_intervals_follow_games_and_leagues(self):
+        league = self.leagues[0]
+        league.game_duration = 30
+        league.save()
+        self.assertEqual(self.get_eligibility_type(), 'success')
+        league.game_duration = 120
+        league.save()
+        game = self.posts[1].game
+        game.date_time += timedelta(hours=2)
+        game.save()
+        self.assertEqual(self.get_eligibility_type(), 'success')
+
+    def test_conflict_report(self):
+        other = Application.objects.create(post=self.posts[1], user=self.user)
+        for league, (application, conflicting) in zip(self.leagues, ((self.application, other),
+                                                                     (other, self.application))):
+            response = self.client.get(reverse('game-conflicts'), data={'league': league.pk})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual([(conflict['application'], conflict['conflicting_application'])
+                              for conflict in response.data], [(application.pk, conflicting.pk)])
+        response = self.client.get(reverse('game-conflicts'), data={
+            'league': self.leagues[0].pk, 'date_time_after': (timezone.now() + timedelta(days=3)).isoformat()})
+        self.assertEqual(response.data, [])
+
+
+class TestGameCursorPagination(mixins.TestSetupMixin, APITestCase):
+    """
+    Test games can be paged by cursor on date_time
+    """
+
+    def test_cursor_pages(self):
+        division = baker.make('leagues.Division')
+        date_time = timezone.now()
+        # duplicate date times are ordered by pk
+        for days in (3, 1, 2, 1, 3):
+            baker.make('games.Game', division=division, date_time=date_time + timedelta(days=days))
+        expected = list(Game.objects.filter(division=division).order_by('date_time', 'pk')
+                        .values_list('pk', flat=True))
+        pks, url = [], reverse('game-list') + f'?division={division.pk}&pagination=cursor&page_size=2'
+        with self.assertNumQueries(3):  # games, divisions, posts
+            response = self.client.get(url)
+        self.assertNotIn('count', response.data)
+        while url is not None:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pks += [game['pk'] for game in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(pks, expected)
+
+    def test_cursor_opt_in(self):
+        # views without a pagination_mode stay on page numbers
+        response = self.client.get(reverse('league-list'), {'pagination': 'cursor', 'cursor': 'invalid'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('count', response.data)
+        # orderings with nullable fields or expressions cannot be paged by cursor
+        keyset = KeysetPagination()
+        self.assertEqual(keyset.get_ordering(Game.objects.order_by('-division__league', 'date_time'), None), None)
+        self.assertEqual(keyset.get_ordering(Game.objects.order_by('description'), None), None)
+        self.assertEqual(keyset.get_ordering(Game.objects.order_by(F('date_time').desc()), None), None)
+        self.assertEqual(keyset.get_ordering(Game.objects.order_by('division__title', 'date_time'), None),
+                         ('division__title', 'date_time', 'pk'))
+        division = baker.make('leagues.Division')
+        baker.make('games.Game', division=division, _quantity=3)
+        response = self.client.get(reverse('game-list'), {'division': division.pk, 'pagination': 'cursor',
+                                                          'page_size': 2})
+        self.assertEqual(json.loads(base64.urlsafe_b64decode(response.data['next'].split('cursor=')[1].split('&')[0])),
+                         [response.data['results'][-1]['date_time'], response.data['results'][-1]['pk']])
@@ -1,7 +1,7 @@
 from django_filters import rest_framework as filters
 
 from leagues.models import League
-from django.contrib.postgres.search import TrigramSimilarity
+from leagues.search import filter_similar_leagues
 
 
 class LeagueFilter(filters.FilterSet):
@@ -12,6 +12,4 @@ class LeagueFilter(filters.FilterSet):
         fields = ['user']
 
     def title_trigram_search(self, queryset, name, value):
-        return queryset.annotate(
-            similarity=TrigramSimilarity('title', value)
-        ).filter(similarity__gt=0.15)
+        return filter_similar_leagues(queryset, value)
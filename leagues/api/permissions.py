@@ -1,6 +1,8 @@
 from rest_framework import permissions
-from ..models import League, Division, Role, Level
+from ..models import Division, Role, Level
 from users.models import User
+from backend.membership import get_membership
+from backend.permissions import get_view_object
 
 
 class InLevelLeague(permissions.BasePermission):
@@ -9,8 +11,8 @@ class InLevelLeague(permissions.BasePermission):
     """
 
     def has_permission(self, request, view):
-        level = Level.objects.get(pk=view.kwargs['pk'])
-        return level.league in request.user.leagues.accepted()
+        level = get_view_object(view, Level)
+        return get_membership(request).is_accepted(level.league_id)
 
 
 class LevelListQueryRequired(permissions.BasePermission):
@@ -22,11 +24,7 @@ class LevelListQueryRequired(permissions.BasePermission):
         league_pk = request.query_params.get('league', None)
         if league_pk is None:
             return False
-        if League.objects.filter(pk=league_pk).exists():
-            league = League.objects.get(pk=league_pk)
-            return league in request.user.leagues.accepted()
-        else:
-            return False
+        return get_membership(request).is_accepted(league_pk)
 
 
 class InRoleLeague(permissions.BasePermission):
@@ -35,8 +33,8 @@ class InRoleLeague(permissions.BasePermission):
     """
 
     def has_permission(self, request, view):
-        role = Role.objects.get(pk=view.kwargs['pk'])
-        return role.division.league in request.user.leagues.accepted()
+        role = get_view_object(view, Role)
+        return get_membership(request).is_accepted(role.division.league_id)
 
 
 class InDivisionLeague(permissions.BasePermission):
@@ -45,8 +43,8 @@ class InDivisionLeague(permissions.BasePermission):
     """
 
     def has_permission(self, request, view):
-        division = Division.objects.get(pk=view.kwargs['pk'])
-        return division.league in request.user.leagues.accepted()
+        division = get_view_object(view, Division)
+        return get_membership(request).is_accepted(division.league_id)
 
 
 class IsUmpireOwner(permissions.BasePermission):
@@ -67,5 +65,4 @@ class InLeague(permissions.BasePermission):
     """
 
     def has_permission(self, request, view):
-        league = League.objects.get(pk=view.kwargs['pk'])
-        return league in request.user.leagues.accepted()
+        return get_membership(request).is_accepted(view.kwargs['pk'])
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from rest_framework.serializers import ValidationError
 from .role import RoleRetrieveSerializer
 from leagues.models import Division
+from backend.membership import get_membership
 
 class DivisionBaseSerializer(serializers.ModelSerializer):
     roles = RoleRetrieveSerializer(source='role_set', many=True, read_only=True)
@@ -16,7 +17,7 @@ class DivisionBaseSerializer(serializers.ModelSerializer):
 class DivisionCreateSerializer(DivisionBaseSerializer):
 
     def validate_league(self, league):
-        if league in self.context['request'].user.leagues.accepted():
+        if get_membership(self.context['request']).is_accepted(league):
             return league
         else:
             raise ValidationError("Can only create divison for a league you own")
@@ -1,24 +1,41 @@
 from rest_framework import serializers
 
 from leagues.models import League
+from leagues.structure import get_league_structure, get_league_structures
 from users.models import UserLeagueStatus
 
-from .division import DivisionRetrieveSerializer
-from .level import LevelRetrieveSerializer
+
+class LeaguePrivateListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        leagues = list(data.all() if hasattr(data, 'all') else data)
+        self.child.structures = get_league_structures(leagues)  # one cache read for every league
+        return super().to_representation(leagues)
 
 
 class LeaguePrivateSerializer(serializers.ModelSerializer):
-    divisions = DivisionRetrieveSerializer(
-        source='division_set', many=True, read_only=True)
-    levels = LevelRetrieveSerializer(
-        source='level_set', many=True, read_only=True)
+    divisions = serializers.SerializerMethodField()
+    levels = serializers.SerializerMethodField()
 
     class Meta:
         model = League
+        list_serializer_class = LeaguePrivateListSerializer
         fields = ('pk', 'title', 'description', 'divisions', 'levels', 'league_picture', 'public_access',
                   'date_joined', 'expiration_date', 'adv_scheduling_limit',
-                  'can_apply', 'website_url', 'email', 'default_max_casts', 'default_max_backups', 'cancellation_period', 'api_key', 'is_synced')
-        read_only_fields = ('pk', 'date_joined')
+                  'can_apply', 'website_url', 'email', 'default_max_casts', 'default_max_backups', 'cancellation_period', 'game_duration', 'api_key', 'is_synced', 'structure_version')
+        read_only_fields = ('pk', 'date_joined', 'structure_version')
+
+    def get_structure(self, instance):
+        structures = getattr(self, 'structures', {})
+        if instance.pk not in structures:
+            return get_league_structure(instance)
+        return structures[instance.pk]
+
+    def get_divisions(self, instance):
+        return self.get_structure(instance)['divisions']
+
+    def get_levels(self, instance):
+        return self.get_structure(instance)['levels']
 
     def create(self, validated_data):
         assert self.context['request'].user.is_manager(), (
@@ -1,6 +1,7 @@
 from rest_framework.serializers import ValidationError
 from leagues.models import Level
 from rest_framework import serializers
+from backend.membership import get_membership
 
 
 class LevelBaseSerializer(serializers.ModelSerializer):
@@ -24,7 +25,7 @@ class LevelCreateSerializer(LevelBaseSerializer):
         return super().validate(data)
 
     def validate_league(self, league):
-        if league in self.context['request'].user.leagues.accepted():
+        if get_membership(self.context['request']).is_accepted(league):
             return league
         else:
             raise ValidationError(
@@ -1,6 +1,7 @@
 from leagues.models import Role
 from rest_framework.serializers import ValidationError
 from rest_framework import serializers
+from backend.membership import get_membership
 
 
 class RoleBaseSerializer(serializers.ModelSerializer):
@@ -20,7 +21,7 @@ class RoleBaseSerializer(serializers.ModelSerializer):
 class RoleCreateSerializer(RoleBaseSerializer):
 
     def validate_division(self, division):
-        if division.league in self.context['request'].user.leagues.accepted():
+        if get_membership(self.context['request']).is_accepted(division.league_id):
             return division
         else:
             raise ValidationError("Can only create role for a league you own")
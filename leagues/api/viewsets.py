@@ -24,17 +24,22 @@ from backend.permissions import (
     IsSuperUser, ActionBasedPermission, IsManager
 )
 
-from rest_framework import viewsets, mixins, status, permissions
+from rest_framework import viewsets, mixins, pagination, status, permissions
 from rest_framework.response import Response
 from drf_multiple_serializer import ActionBaseSerializerMixin
 from ..models import League, Division, Role, Level
 from django.urls import reverse
+from django.utils.http import parse_etags
 from rest_framework.decorators import action
-from backend.mixins import MoveOrderedModelMixin
+from backend.mixins import MoveOrderedModelMixin, ReorderOrderedModelMixin, SharedObjectMixin
 from .filters import LeagueFilter
+from ..search import (AUTOCOMPLETE_LIMIT, AUTOCOMPLETE_MAX_LIMIT, autocomplete_leagues, cached_search, search_leagues,
+                      similarity_threshold)
+from ..structure import get_league_structure, get_structure_etag
 
 
-class LevelViewSet(ActionBaseSerializerMixin, MoveOrderedModelMixin, mixins.CreateModelMixin,
+class LevelViewSet(ActionBaseSerializerMixin, SharedObjectMixin, MoveOrderedModelMixin, ReorderOrderedModelMixin,
+                   mixins.CreateModelMixin,
                    mixins.UpdateModelMixin, mixins.DestroyModelMixin, mixins.ListModelMixin,
                    viewsets.GenericViewSet):
     """
@@ -64,6 +69,14 @@ class LevelViewSet(ActionBaseSerializerMixin, MoveOrderedModelMixin, mixins.Crea
         * "order" value must be within valid range
     * Extra Notes:
         * Ignore below, order is only required field. "order" is 0 indexed, and the level will move to the specified order index
+
+    reorder: Replace the Ordering of every level in the league \n
+    * Permissions: IsManager & InLevelLeague
+    * Extra Validations:
+        * "order" field is required, a list of pks
+        * "order" must contain every level of the league exactly once
+    * Extra Notes:
+        * Ignore below, order is only required field. The first pk in "order" is moved to the top
     """
 
     queryset = Level.objects.all()
@@ -78,7 +91,7 @@ class LevelViewSet(ActionBaseSerializerMixin, MoveOrderedModelMixin, mixins.Crea
         permissions.IsAuthenticated & ActionBasedPermission),)
     action_permissions = {
         IsManager: ['create'],  # league/roles validated on serializer level
-        IsManager & InLevelLeague: ['move', 'update', 'partial_update', 'destroy'],
+        IsManager & InLevelLeague: ['move', 'reorder', 'update', 'partial_update', 'destroy'],
         LevelListQueryRequired: ['list']
     }
 
@@ -87,7 +100,7 @@ class LevelViewSet(ActionBaseSerializerMixin, MoveOrderedModelMixin, mixins.Crea
     move_filter_value = 'league'
 
 
-class RoleViewSet(ActionBaseSerializerMixin, MoveOrderedModelMixin,
+class RoleViewSet(ActionBaseSerializerMixin, SharedObjectMixin, MoveOrderedModelMixin, ReorderOrderedModelMixin,
                   mixins.CreateModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
     """
     Provide Create/Destroy functionality for Roles
@@ -107,9 +120,18 @@ class RoleViewSet(ActionBaseSerializerMixin, MoveOrderedModelMixin,
         * "order" value must be within valid range
     * Extra Notes:
         * Ignore below, order is only required field. "order" is 0 indexed, and the level will move to the specified order index
+
+    reorder: Replace the Ordering of every role in the division \n
+    * Permissions: IsManager & InRoleLeague
+    * Extra Validations:
+        * "order" field is required, a list of pks
+        * "order" must contain every role of the division exactly once
+    * Extra Notes:
+        * Ignore below, order is only required field. The first pk in "order" is moved to the top
     """
 
     queryset = Role.objects.all()
+    object_select_related = ('division', )
     serializer_classes = {
         'default': RoleRetrieveSerializer,
         'create': RoleCreateSerializer
@@ -118,7 +140,7 @@ class RoleViewSet(ActionBaseSerializerMixin, MoveOrderedModelMixin,
         permissions.IsAuthenticated & ActionBasedPermission), )
     action_permissions = {
         IsManager: ['create'],  # league validated on serializer level
-        IsManager & InRoleLeague: ['move', 'destroy']
+        IsManager & InRoleLeague: ['move', 'reorder', 'destroy']
     }
 
     # move orders
@@ -126,7 +148,7 @@ class RoleViewSet(ActionBaseSerializerMixin, MoveOrderedModelMixin,
     move_filter_value = 'division'
 
 
-class DivisionViewSet(ActionBaseSerializerMixin, MoveOrderedModelMixin,
+class DivisionViewSet(ActionBaseSerializerMixin, SharedObjectMixin, MoveOrderedModelMixin, ReorderOrderedModelMixin,
                       mixins.CreateModelMixin, mixins.RetrieveModelMixin,
                       mixins.DestroyModelMixin, viewsets.GenericViewSet):
     """
@@ -150,6 +172,14 @@ class DivisionViewSet(ActionBaseSerializerMixin, MoveOrderedModelMixin,
         * "order" value must be within valid range
     * Extra Notes:
         * Ignore below, order is only required field. "order" is 0 indexed, and the level will move to the specified order index
+
+    reorder: Replace the Ordering of every division in the league \n
+    * Permissions: IsManager & InDivisionLeague
+    * Extra Validations:
+        * "order" field is required, a list of pks
+        * "order" must contain every division of the league exactly once
+    * Extra Notes:
+        * Ignore below, order is only required field. The first pk in "order" is moved to the top
     """
 
     queryset = Division.objects.all()
@@ -161,7 +191,7 @@ class DivisionViewSet(ActionBaseSerializerMixin, MoveOrderedModelMixin,
         permissions.IsAuthenticated & ActionBasedPermission), )
     action_permissions = {
         IsManager: ['create'],  # league validated on serializer level
-        IsManager & InDivisionLeague: ['move', 'destroy'],
+        IsManager & InDivisionLeague: ['move', 'reorder', 'destroy'],
         InDivisionLeague: ['retrieve']
     }
 
@@ -197,10 +227,30 @@ class LeagueViewSet(ActionBaseSerializerMixin, viewsets.ModelViewSet):
 
     public: Retrieve Public League Info (get request) \n
     * Permissions: IsAuthenticated
+
+    public_search: Search Public League Info by Title \n
+    * Permissions: IsAuthenticated
+    * Query Params: title (required), page, page_size
+    * Extra Notes:
+        * Paginated, most similar titles first
+        * Results are cached for LEAGUE_SEARCH_CACHE_TIMEOUT seconds
+
+    public_autocomplete: Complete a League Title Prefix \n
+    * Permissions: IsAuthenticated
+    * Query Params: title (required), limit (default 10, at most 50)
+    * Extra Notes:
+        * Returns pk and title of leagues with a title starting with the prefix, alphabetically
+
+    structure: Retrieve the Division/Role and Level Tree of the League \n
+    * Permissions: InLeague
+    * Extra Notes:
+        * Served from a cache keyed by the league's structure_version, with an ETag
+        * Send the ETag back in If-None-Match to get a 304 when the structure has not changed
     """
 
     queryset = League.objects.all()
     filterset_class = LeagueFilter
+    count_strategy = 'exact'
     serializer_classes = {
         'default': LeaguePrivateSerializer,
     }
@@ -210,8 +260,8 @@ class LeagueViewSet(ActionBaseSerializerMixin, viewsets.ModelViewSet):
         IsManager: ['create'],
         IsUmpireOwner: ['list'],
         IsManager & InLeague: ['update', 'partial_update', 'destroy'],
-        InLeague: ['retrieve'],
-        permissions.IsAuthenticated: ['public', 'public_search']
+        InLeague: ['retrieve', 'structure'],
+        permissions.IsAuthenticated: ['public', 'public_search', 'public_autocomplete']
     }
 
     @action(detail=True, methods=['get'])
@@ -220,11 +270,40 @@ class LeagueViewSet(ActionBaseSerializerMixin, viewsets.ModelViewSet):
         serializer = LeaguePublicSerializer(league)
         return Response(serializer.data)
 
-    @action(detail=False, methods=['get'])
+    @action(detail=True, methods=['get'])
+    def structure(self, request, pk):
+        league = self.get_object()
+        etag = get_structure_etag(league)
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(get_league_structure(league))
+        response['ETag'] = etag
+        return response
+
+    @action(detail=False, methods=['get'], count_strategy='capped')
     def public_search(self, request):
-        query = request.query_params.get('title')
-        league_filter = LeagueFilter()
-        qs = league_filter.title_trigram_search(
-            League.objects.all(), 'title', query)
-        serializer = LeaguePublicSerializer(qs, many=True)
-        return Response(serializer.data)
+        query = request.query_params.get('title', '').strip()
+        if not query:
+            return Response({"error": "missing parameters"}, status=status.HTTP_400_BAD_REQUEST)
+
+        def search():
+            with similarity_threshold():
+                page = self.paginate_queryset(search_leagues(League.objects.all(), query))
+                return self.get_paginated_response(LeaguePublicSerializer(page, many=True).data).data
+        return Response(cached_search(request, search))
+
+    @action(detail=False, methods=['get'], url_path='public-autocomplete')
+    def public_autocomplete(self, request):
+        prefix = request.query_params.get('title', '').strip()
+        if not prefix:
+            return Response({"error": "missing parameters"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = pagination._positive_int(
+                request.query_params.get('limit', AUTOCOMPLETE_LIMIT), strict=True, cutoff=AUTOCOMPLETE_MAX_LIMIT)
+        except ValueError:
+            return Response({"limit": ["limit must be a positive integer"]}, status=status.HTTP_400_BAD_REQUEST)
+
+        def search():
+            return list(autocomplete_leagues(League.objects.all(), prefix, limit).values('pk', 'title'))
+        return Response(cached_search(request, search))
@@ -0,0 +1,72 @@
+import random
+import time
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from leagues.models import League
+from leagues.search import SEARCH_SIMILARITY_THRESHOLD, autocomplete_leagues, search_leagues, similarity_threshold
+
+WORDS = ('bay', 'area', 'little', 'league', 'youth', 'baseball', 'softball', 'north', 'south', 'east', 'west',
+         'valley', 'county', 'city', 'junior', 'senior', 'majors', 'minors', 'pony', 'district')
+
+
+class Command(BaseCommand):
+    help = ('Compare the unindexed similarity scan league search used to run against the trigram indexed, '
+            'paginated search, prefix autocomplete and a cached hot query, on synthetic leagues. '
+            'Leagues are created inside a transaction that is rolled back. Requires the leagues_league_title_trgm '
+            'index (leagues migration 0018)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--leagues', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def make_title(self, rng):
+        return ' '.join(rng.sample(WORDS, 3))[:28] + ' ' + str(rng.randint(0, 999))
+
+    def time_queries(self, queries, run):
+        start = time.perf_counter()
+        for query in queries:
+            run(query)
+        return (time.perf_counter() - start) / len(queries) * 1000
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        page_size = options['page_size']
+        with transaction.atomic():
+            League.objects.bulk_create([
+                League(title=self.make_title(rng)) for _ in range(options['leagues'])
+            ], batch_size=5000)
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {League._meta.db_table}")
+            queries = [self.make_title(rng) for _ in range(options['queries'])]
+            prefixes = [query[:rng.randint(3, 8)] for query in queries]
+
+            def scan(query):  # the previous public_search, every matching league without an order
+                return list(League.objects.annotate(similarity=TrigramSimilarity('title', query)).filter(
+                    similarity__gt=SEARCH_SIMILARITY_THRESHOLD).values_list('pk', flat=True))
+
+            def search(query):
+                with similarity_threshold():
+                    return list(search_leagues(League.objects.all(), query).values_list('pk', flat=True)[:page_size])
+
+            def autocomplete(prefix):
+                return list(autocomplete_leagues(League.objects.all(), prefix, page_size).values_list('pk', flat=True))
+
+            def cached(query):
+                key = 'benchmark-league-search:' + query
+                if cache.get(key) is None:
+                    cache.set(key, search(query), 60)
+
+            self.stdout.write(f"{options['leagues']} leagues, {len(queries)} queries")
+            self.stdout.write(f"similarity scan: {self.time_queries(queries, scan):.2f}ms per query")
+            self.stdout.write(f"indexed search, first page: {self.time_queries(queries, search):.2f}ms per query")
+            self.stdout.write(f"prefix autocomplete: {self.time_queries(prefixes, autocomplete):.2f}ms per query")
+            self.time_queries(queries, cached)
+            self.stdout.write(f"cached hot query: {self.time_queries(queries, cached):.3f}ms per query")
+            cache.delete_many(['benchmark-league-search:' + query for query in queries])
+            transaction.set_rollback(True)
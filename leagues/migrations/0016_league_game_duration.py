@@ -0,0 +1,19 @@
+# Generated by Django 3.0.7 on 2026-10-18 11:37
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leagues', '0015_auto_20201010_0518'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='league',
+            name='game_duration',
+            field=models.IntegerField(default=120, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(1440)]),
+        ),
+    ]
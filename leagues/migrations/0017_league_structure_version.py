@@ -0,0 +1,18 @@
+# Generated by Django 3.0.7 on 2026-10-18 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leagues', '0016_league_game_duration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='league',
+            name='structure_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# manually created
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leagues', '0017_league_structure_version')
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS leagues_league_title_trgm ON leagues_league USING gin (title gin_trgm_ops)',
+            'DROP INDEX IF EXISTS leagues_league_title_trgm'
+        )
+    ]
@@ -1,9 +1,12 @@
 from django.db import models
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.utils.timezone import now
 from datetime import datetime, timedelta
 from django.contrib.postgres.fields import JSONField
 from ordered_model.models import OrderedModel
-from django.core.validators import MinValueValidator
+from django.core.validators import MaxValueValidator, MinValueValidator
+
+from backend.mixins import GapOrderedModelMixin
 
 
 def set_league_expiration_date():
@@ -48,6 +51,10 @@ class League(models.Model):
     cancellation_period = models.IntegerField(
         default=2, validators=[MinValueValidator(0)])
 
+    # how many minutes a game lasts, used to detect double booking
+    game_duration = models.IntegerField(
+        default=120, validators=[MinValueValidator(1), MaxValueValidator(1440)])
+
     # defaults
     default_max_casts = models.IntegerField(
         default=0, validators=[MinValueValidator(0)])
@@ -62,6 +69,9 @@ class League(models.Model):
         default="", max_length=128, blank=True, null=True)
     is_synced = models.BooleanField(default=False)
 
+    # bumped whenever divisions, roles or levels change, versions the cached structure (leagues.structure)
+    structure_version = models.PositiveIntegerField(default=0)
+
     class Meta:
         ordering = ['-pk']
 
@@ -69,7 +79,7 @@ class League(models.Model):
         return self.title
 
 
-class Division(OrderedModel):
+class Division(GapOrderedModelMixin, OrderedModel):
     title = models.CharField(max_length=32)
     league = models.ForeignKey(League, on_delete=models.CASCADE)
     order_with_respect_to = 'league'
@@ -80,8 +90,12 @@ class Division(OrderedModel):
     def __str__(self):
         return self.title
 
+    @classmethod
+    def orders_updated(cls, objs):
+        bump_structure_versions(League.objects.filter(pk__in={obj.league_id for obj in objs}))
+
 
-class Role(OrderedModel):
+class Role(GapOrderedModelMixin, OrderedModel):
     title = models.CharField(max_length=32)
     division = models.ForeignKey(Division, on_delete=models.CASCADE)
     order_with_respect_to = 'division'
@@ -89,9 +103,50 @@ class Role(OrderedModel):
     def __str__(self):
         return ' '.join([self.division.title, self.title])
 
+    @classmethod
+    def orders_updated(cls, objs):
+        bump_structure_versions(League.objects.filter(division__in={obj.division_id for obj in objs}))
 
-class Level(OrderedModel):
+
+class Level(GapOrderedModelMixin, OrderedModel):
     title = models.CharField(max_length=32, null=False, blank=False)
     league = models.ForeignKey(League, on_delete=models.CASCADE)
     visibilities = models.ManyToManyField(Role, blank=True)
     order_with_respect_to = 'league'
+
+    @classmethod
+    def orders_updated(cls, objs):
+        bump_structure_versions(League.objects.filter(pk__in={obj.league_id for obj in objs}))
+
+
+def bump_structure_versions(leagues):
+    """
+    Invalidate the cached structure of the given leagues (a League queryset)
+    """
+    leagues.update(structure_version=models.F('structure_version') + 1)
+
+
+def division_structure_receiver(sender, instance, *args, **kwargs):
+    bump_structure_versions(League.objects.filter(pk=instance.league_id))
+
+
+def role_structure_receiver(sender, instance, *args, **kwargs):
+    bump_structure_versions(League.objects.filter(division=instance.division_id))
+
+
+def level_visibilities_structure_receiver(sender, instance, action, reverse, *args, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        division_structure_receiver(sender, instance)
+    else:  # levels of a role are in the league of its division
+        role_structure_receiver(sender, instance)
+
+
+post_save.connect(division_structure_receiver, sender=Division)
+post_delete.connect(division_structure_receiver, sender=Division)
+post_save.connect(role_structure_receiver, sender=Role)
+post_delete.connect(role_structure_receiver, sender=Role)
+post_save.connect(division_structure_receiver, sender=Level)
+post_delete.connect(division_structure_receiver, sender=Level)
+m2m_changed.connect(level_visibilities_structure_receiver, sender=Level.visibilities.through)
@@ -0,0 +1,74 @@
+import hashlib
+import re
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.core.cache import cache
+from django.db import connection, transaction
+
+SEARCH_SIMILARITY_THRESHOLD = 0.15
+SEARCH_CACHE_PREFIX = 'league-search'
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+
+@contextmanager
+def similarity_threshold(threshold=SEARCH_SIMILARITY_THRESHOLD):
+    """
+    Transaction with the threshold of the % operator set (SET LOCAL), the pooled connection keeps its default.
+    Querysets of search_leagues must be evaluated inside it
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL pg_trgm.similarity_threshold = %s', [threshold])
+        yield
+
+
+def search_leagues(queryset, query):
+    """
+    Leagues with a title similar to the query, most similar first. Evaluate inside similarity_threshold().
+    The % operator (trigram_similar) is answered from the trigram GIN index on title, the similarity
+    is only computed for the matches
+    """
+    return queryset.filter(title__trigram_similar=query).annotate(
+        similarity=TrigramSimilarity('title', query)
+    ).order_by('-similarity', 'pk')
+
+
+def filter_similar_leagues(queryset, query, threshold=SEARCH_SIMILARITY_THRESHOLD):
+    """
+    Leagues with a title similar to the query, most similar first, without the index or the % operator.
+    For querysets that are already narrowed down and evaluated lazily
+    """
+    return queryset.annotate(similarity=TrigramSimilarity('title', query)).filter(
+        similarity__gt=threshold).order_by('-similarity', 'pk')
+
+
+def autocomplete_leagues(queryset, prefix, limit=AUTOCOMPLETE_LIMIT):
+    """
+    Leagues with a title starting with the prefix (case insensitive), alphabetically.
+    The anchored regex is answered from the same trigram GIN index
+    """
+    return queryset.filter(title__iregex='^' + re.escape(prefix)).order_by('title', 'pk')[:limit]
+
+
+def get_search_cache_key(request):
+    digest = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return ':'.join([SEARCH_CACHE_PREFIX, digest])
+
+
+def cached_search(request, search):
+    """
+    Response data of search() for this request url, cached for LEAGUE_SEARCH_CACHE_TIMEOUT seconds
+    so hot queries skip the database. A timeout of 0 disables the cache
+    """
+    timeout = getattr(settings, 'LEAGUE_SEARCH_CACHE_TIMEOUT', 0)
+    if not timeout:
+        return search()
+    key = get_search_cache_key(request)
+    data = cache.get(key)
+    if data is None:
+        data = search()
+        cache.set(key, data, timeout)
+    return data
@@ -0,0 +1,56 @@
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+
+from .api.serializers.division import DivisionRetrieveSerializer
+from .api.serializers.level import LevelRetrieveSerializer
+
+# entries are keyed by League.structure_version, stale documents are never read again and only wait for eviction
+STRUCTURE_CACHE_TIMEOUT = 60 * 60 * 24
+STRUCTURE_CACHE_PREFIX = 'league-structure'
+
+
+def get_structure_cache_key(league):
+    return ':'.join([STRUCTURE_CACHE_PREFIX, str(league.pk), str(league.structure_version)])
+
+
+def get_structure_etag(league):
+    return '"{}-{}"'.format(league.pk, league.structure_version)
+
+
+def build_league_structures(leagues):
+    """
+    Serialize the division -> role and level trees of the leagues, prefetched together
+    """
+    prefetch_related_objects(leagues, 'division_set__role_set', 'level_set__visibilities')
+    return {
+        league.pk: {
+            'league': league.pk,
+            'version': league.structure_version,
+            'divisions': DivisionRetrieveSerializer(league.division_set.all(), many=True).data,
+            'levels': LevelRetrieveSerializer(league.level_set.all(), many=True).data
+        } for league in leagues
+    }
+
+
+def get_league_structures(leagues):
+    """
+    Structure documents of the leagues at their loaded structure_version, read with one cache lookup.
+    Missing documents are built together and cached.
+
+    Returns {league.pk: {league, version, divisions, levels}}
+    """
+    leagues = list(leagues)
+    keys = {get_structure_cache_key(league): league for league in leagues}
+    cached = cache.get_many(list(keys))
+    structures = {keys[key].pk: structure for key, structure in cached.items()}
+    missing = [league for key, league in keys.items() if key not in cached]
+    if missing:
+        built = build_league_structures(missing)
+        cache.set_many({get_structure_cache_key(league): built[league.pk] for league in missing},
+                       STRUCTURE_CACHE_TIMEOUT)
+        structures.update(built)
+    return structures
+
+
+def get_league_structure(league):
+    return get_league_structures([league])[league.pk]
@@ -1,3 +1,6 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from model_bakery import baker
 from rest_framework import status
@@ -6,7 +9,7 @@ from rest_framework.test import APITestCase
 from backend import mixins
 from users.models import User
 
-from ..models import League
+from ..models import League, Level
 
 
 class TestLeagueAPI(mixins.TestModelMixin, APITestCase):
@@ -50,6 +53,38 @@ class TestLeagueAPI(mixins.TestModelMixin, APITestCase):
         response = self.client.get(search_string)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_public_search_requires_title(self):
+        response = self.client.get(reverse('league-public-search'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'error': 'missing parameters'})
+        response = self.client.get(reverse('league-public-search'), {'title': '  '})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_public_search_ordered_pages(self):
+        cache.clear()
+        titles = ['Bay Area Umpires', 'Bay Area Umpires Guild', 'Bay Area Baseball Umpires', 'Chess Club']
+        leagues = [baker.make('leagues.League', title=title) for title in titles]
+        public_search_url = reverse('league-public-search')
+        response = self.client.get(public_search_url, {'title': 'bay area umpires', 'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['count'], response.data['count_exact']), (3, True))
+        self.assertEqual([league['pk'] for league in response.data['results']], [leagues[0].pk, leagues[1].pk])
+        self.assertIsNotNone(response.data['next'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([league['pk'] for league in response.data['results']], [leagues[2].pk])
+        self.assertIsNone(response.data['next'])
+
+    def test_public_autocomplete(self):
+        leagues = [baker.make('leagues.League', title=title) for title in ('Bay Area (U12)', 'bay area u14', 'Bayside')]
+        autocomplete_url = reverse('league-public-autocomplete')
+        response = self.client.get(autocomplete_url, {'title': 'bay area'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([league['pk'] for league in response.data], [leagues[0].pk, leagues[1].pk])
+        response = self.client.get(autocomplete_url, {'title': 'Bay Area (', 'limit': 1})
+        self.assertEqual([league['pk'] for league in response.data], [leagues[0].pk])
+        response = self.client.get(autocomplete_url, {'title': 'bay', 'limit': 'all'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class TestDivisionAPI(mixins.TestCreateMixin, mixins.TestRetrieveMixin, mixins.TestDeleteMixin,
                       mixins.TestSetupMixin, APITestCase):
@@ -79,6 +114,20 @@ class TestDivisionAPI(mixins.TestCreateMixin, mixins.TestRetrieveMixin, mixins.T
         response = self.client.patch(move_url, data={"order": 1})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_membership_loaded_once(self):
+        self.user.is_superuser = False
+        self.user.account_type = 'manager'
+        self.user.save()
+        division = baker.make('leagues.Division')
+        self.user.leagues.add(division.league, through_defaults={'request_status': 'accepted'})
+        role_url = reverse('role-list')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(role_url, data={'title': 'role', 'division': division.pk})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len([query for query in queries if 'users_userleaguestatus' in query['sql']]), 1)
+        response = self.client.post(role_url, data={'title': 'role', 'division': baker.make('leagues.Division').pk})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class TestLevelAPI(mixins.TestCreateMixin, mixins.TestUpdateMixin, mixins.TestDeleteMixin,
                    mixins.TestListMixin, mixins.TestFilterMixin, mixins.TestSetupMixin, APITestCase):
@@ -117,6 +166,30 @@ class TestLevelAPI(mixins.TestCreateMixin, mixins.TestUpdateMixin, mixins.TestDe
         response = self.client.patch(move_url, data={"order": 1})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_move_position(self):
+        league = baker.make('leagues.League')
+        levels = [Level.objects.create(league=league, title=f'level {index}') for index in range(4)]
+        move_url = reverse('level-move', kwargs={'pk': levels[3].pk})
+        response = self.client.patch(move_url, data={"order": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(league.level_set.values_list('pk', flat=True)),
+                         [levels[0].pk, levels[3].pk, levels[1].pk, levels[2].pk])
+        response = self.client.patch(move_url, data={"order": 4})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_reorder(self):
+        league = baker.make('leagues.League')
+        levels = [Level.objects.create(league=league, title=f'level {index}') for index in range(3)]
+        reorder_url = reverse('level-reorder', kwargs={'pk': levels[0].pk})
+        pks = [levels[1].pk, levels[2].pk, levels[0].pk]
+        # object, savepoint, select for update, bulk update, structure version, release
+        with self.assertNumQueries(6):
+            response = self.client.patch(reorder_url, data={"order": pks}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(league.level_set.values_list('pk', flat=True)), pks)
+        response = self.client.patch(reorder_url, data={"order": pks[:2]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class TestRoleAPI(mixins.TestCreateMixin, mixins.TestDeleteMixin,
                   mixins.TestSetupMixin, APITestCase):
@@ -144,3 +217,64 @@ class TestRoleAPI(mixins.TestCreateMixin, mixins.TestDeleteMixin,
         move_url = reverse('role-move', kwargs={'pk': role_1.pk})
         response = self.client.patch(move_url, data={"order": 1})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class TestLeagueStructureAPI(mixins.TestSetupMixin, APITestCase):
+    """
+    Test the cached, versioned league structure
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.league = baker.make('leagues.League')
+        self.division = baker.make('leagues.Division', league=self.league)
+        self.roles = baker.make('leagues.Role', division=self.division, _quantity=2)
+        self.level = baker.make('leagues.Level', league=self.league)
+        self.url = reverse('league-structure', kwargs={'pk': self.league.pk})
+
+    def get_version(self):
+        return League.objects.get(pk=self.league.pk).structure_version
+
+    def test_structure_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['divisions'][0]['roles']), 2)
+        etag = response['ETag']
+        with self.assertNumQueries(1):  # league, the structure is unchanged
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.level.visibilities.add(*self.roles)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(set(response.data['levels'][0]['visibilities']), {role.pk for role in self.roles})
+
+    def test_changes_bump_version(self):
+        version = self.get_version()
+        baker.make('leagues.Role', division=self.division)
+        self.assertEqual(self.get_version(), version + 1)
+        max(self.roles, key=lambda role: role.order).top()
+        self.assertEqual(self.get_version(), version + 2)
+        self.roles[0].delete()
+        self.assertEqual(self.get_version(), version + 3)
+        self.level.visibilities.set([self.roles[1]])
+        self.assertEqual(self.get_version(), version + 4)
+        self.roles[1].level_set.clear()
+        self.assertEqual(self.get_version(), version + 5)
+
+        reorder_url = reverse('division-reorder', kwargs={'pk': self.division.pk})
+        division = baker.make('leagues.Division', league=self.league)
+        version = self.get_version()
+        self.client.patch(reorder_url, data={'order': [division.pk, self.division.pk]}, format='json')
+        self.assertEqual(self.get_version(), version + 1)
+
+    def test_retrieve_reads_structure_cache(self):
+        retrieve_url = reverse('league-detail', kwargs={'pk': self.league.pk})
+        self.client.get(retrieve_url)
+        with self.assertNumQueries(1):  # league
+            response = self.client.get(retrieve_url)
+        self.assertEqual(response.data['divisions'][0]['pk'], self.division.pk)
+        baker.make('leagues.Level', league=self.league)
+        response = self.client.get(retrieve_url)
+        self.assertEqual(len(response.data['levels']), 2)
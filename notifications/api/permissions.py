@@ -1,7 +1,8 @@
 from rest_framework import permissions
-from ..models import LeagueNotification, GameNotification
+from ..models import LeagueNotification, GameNotification, ApplicationNotification
 from users.models import User
-from leagues.models import League
+from backend.membership import get_membership
+from backend.permissions import get_view_object
 
 
 class InLeague(permissions.BasePermission):
@@ -10,9 +11,8 @@ class InLeague(permissions.BasePermission):
     """
 
     def has_permission(self, request, view):
-        league_notification = LeagueNotification.objects.get(
-            pk=view.kwargs['pk'])
-        return league_notification.league in request.user.leagues.accepted()
+        league_notification = get_view_object(view, LeagueNotification)
+        return get_membership(request).is_accepted(league_notification.league_id)
 
 
 class FilterUserOwner(permissions.BasePermission):
@@ -28,17 +28,16 @@ class InFilterLeague(permissions.BasePermission):
         league_pk = request.query_params.get('league', None)
         if league_pk is None:
             return False
-        return League.objects.get(pk=league_pk) in request.user.leagues.accepted()
+        return get_membership(request).is_accepted(league_pk)
 
 
 class InGameLeague(permissions.BasePermission):
     def has_permission(self, request, view):
-        game_notification = GameNotification.objects.get(pk=view.kwargs['pk'])
-        return game_notification.game.division.league in request.user.leagues.accepted()
+        game_notification = get_view_object(view, GameNotification)
+        return get_membership(request).is_accepted(game_notification.game.division.league_id)
 
 
 class IsApplicationNotificationOwner(permissions.BasePermission):
     def has_permission(self, request, view):
-        application_notification = ApplicationNotification.objects.get(
-            pk=view.kwargs['pk'])
-        return application_notification.application.user.pk == request.user.pk
+        application_notification = get_view_object(view, ApplicationNotification)
+        return application_notification.application.user_id == request.user.pk
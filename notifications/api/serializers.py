@@ -4,6 +4,7 @@ from ..models import (
 
 from rest_framework import serializers
 from rest_framework.serializers import ValidationError
+from backend.membership import get_membership
 
 
 class UmpCastNotificationSerializer(serializers.ModelSerializer):
@@ -23,7 +24,7 @@ class LeagueNotificationSerializer(serializers.ModelSerializer):
         read_only_fields = ('pk', 'notification_date_time')
 
     def validate_league(self, league):
-        if league in self.context['request'].user.leagues.accepted():
+        if get_membership(self.context['request']).is_accepted(league):
             return league
         else:
             raise ValidationError(
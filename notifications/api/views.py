@@ -1,6 +1,9 @@
-from django.db.models import CharField, F, Value
+from collections import defaultdict
+
+from django.db.models import F
 from rest_framework import permissions, serializers
-from rest_framework.generics import ListAPIView
+from rest_framework.generics import GenericAPIView, ListAPIView
+from rest_framework.response import Response
 
 from backend.permissions import IsSuperUser
 from games.api.serializers.application import ApplicationPublicSerializer
@@ -10,31 +13,78 @@ from leagues.api.serializers.league import LeaguePublicSerializer
 from leagues.models import League
 from users.models import User
 
-from ..models import (ApplicationNotification, GameNotification,
-                      LeagueNotification, UmpCastNotification)
+from ..models import InboxEntry, get_unread_count, mark_inbox_read
+
+
+def get_related_querysets():
+    """
+    Related object queryset and serializer of every scope, loading everything the serializer reads
+    """
+    return {
+        'league': (League.objects.all(), LeaguePublicSerializer),
+        'game': (GameSerializer.setup_eager_loading(Game.objects.all()), GameSerializer),
+        'application': (Application.objects.select_related('post__game'), ApplicationPublicSerializer),
+    }
+
+
+def get_related_objects(rows):
+    """
+    Serialized related objects of notification rows, with one query (plus prefetches) per scope.
+
+    Returns {(scope, related_pk): data}, objects that no longer exist are left out
+    """
+    related_pks = defaultdict(set)
+    for row in rows:
+        related_pks[row['scope']].add(row['related_pk'])
+    querysets = get_related_querysets()
+    related = {}
+    for scope, pks in related_pks.items():
+        if scope not in querysets:
+            continue
+        queryset, serializer_class = querysets[scope]
+        objects = list(queryset.in_bulk(pks).values())
+        for obj, data in zip(objects, serializer_class(objects, many=True).data):
+            related[(scope, obj.pk)] = data
+    return related
+
+
+class NotificationObjectListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        rows = list(data)
+        self.child.related_objects = get_related_objects(rows)  # hydrate the page once, grouped by scope
+        return super().to_representation(rows)
 
 
 class NotificationObjectSerializer(serializers.Serializer):
-    pk = serializers.IntegerField()
+    pk = serializers.IntegerField(source='notification_id')
     subject = serializers.CharField()
     message = serializers.CharField()
     scope = serializers.CharField()
     notification_date_time = serializers.DateTimeField()
     related_pk = serializers.IntegerField()
+    is_read = serializers.BooleanField()
     related_object = serializers.SerializerMethodField()
 
+    class Meta:
+        list_serializer_class = NotificationObjectListSerializer
+
     def get_related_object(self, obj):
-        scope = obj.get('scope')
-        related_pk = obj.get('related_pk')
-        if scope == 'ump-cast':
-            return {}
-        if scope == 'league':
-            return LeaguePublicSerializer(League.objects.get(pk=related_pk)).data
-        if scope == 'game':
-            return GameSerializer(Game.objects.get(pk=related_pk)).data
-        if scope == 'application':
-            return ApplicationPublicSerializer(Application.objects.get(pk=related_pk)).data
-        return {}
+        key = (obj.get('scope'), obj.get('related_pk'))
+        related_objects = getattr(self, 'related_objects', None)
+        if related_objects is None:
+            related_objects = get_related_objects([obj])
+        return related_objects.get(key, {})
+
+
+class NotificationReadSerializer(serializers.Serializer):
+    notifications = serializers.ListField(child=serializers.IntegerField(), required=False)
+    before = serializers.DateTimeField(required=False)
+
+    def validate(self, data):
+        if 'notifications' not in data and 'before' not in data:
+            raise serializers.ValidationError('notifications or before is required')
+        return data
 
 
 class IsUserOwner(permissions.BasePermission):
@@ -43,42 +93,49 @@ class IsUserOwner(permissions.BasePermission):
 
 
 class NotificationListView(ListAPIView):
+    """
+    Feed of the user's notifications, newest first, read from the user's inbox entries
+    """
     serializer_class = NotificationObjectSerializer
     permission_classes = (IsSuperUser | (
         permissions.IsAuthenticated & IsUserOwner), )
-    value_fields = ('pk', 'subject', 'message', 'notification_date_time')
-
-    def get_umpcast_qs(self):
-        return UmpCastNotification.objects.all().values(
-            *self.value_fields, scope=Value('ump-cast', output_field=CharField()), related_pk=F('pk')
-        )
-
-    def get_league_qs(self):
-        pk = self.kwargs.get('pk')
-        return LeagueNotification.objects.filter(league__user__pk=pk).values(
-            *self.value_fields, scope=Value('league', output_field=CharField()), related_pk=F('league__pk')
-        )
-
-    def get_game_qs(self):
-        pk = self.kwargs.get('pk')
-        game_ids = Application.objects.filter(
-            user__pk=pk).values_list('post__game__pk', flat=True)
-        return GameNotification.objects.filter(game__pk__in=game_ids).values(
-            *self.value_fields, scope=Value('game', output_field=CharField()), related_pk=F('game__pk')
-        )
-
-    def get_application_qs(self):
-        pk = self.kwargs.get('pk')
-        return ApplicationNotification.objects.filter(application__user__pk=pk).values(
-            *self.value_fields, scope=Value('application', output_field=CharField()), related_pk=F('application__pk')
-        )
+    pagination_mode = 'either'
+    keyset_ordering = ('-notification_date_time', '-pk')
+    count_cache_timeout = 30
 
     def get_queryset(self):
-        qs = self.get_umpcast_qs().union(
-            self.get_league_qs()
-        ).union(
-            self.get_game_qs()
-        ).union(
-            self.get_application_qs()
-        ).order_by('-notification_date_time')
-        return qs
+        # one range scan of the (user, notification_date_time, id) index, joined to the page's notifications
+        return InboxEntry.objects.filter(user=self.kwargs.get('pk')).order_by(*self.keyset_ordering).values(
+            'pk', 'notification_id', 'notification_date_time', 'scope', 'related_pk', 'is_read',
+            subject=F('notification__subject'), message=F('notification__message'))
+
+
+class NotificationUnreadCountView(GenericAPIView):
+    """
+    Number of unread notifications of the user, read from the maintained counter (no notification tables)
+    """
+    permission_classes = NotificationListView.permission_classes
+
+    def get(self, request, *args, **kwargs):
+        return Response({'unread': get_unread_count(self.kwargs.get('pk'))})
+
+
+class NotificationReadView(GenericAPIView):
+    """
+    Mark notifications of the user read, by pk (notifications) and/or up to a timestamp (before, inclusive).
+    Returns the number of entries marked read and the remaining unread count
+    """
+    serializer_class = NotificationReadSerializer
+    permission_classes = NotificationListView.permission_classes
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        entries = InboxEntry.objects.all()
+        if 'notifications' in serializer.validated_data:
+            entries = entries.filter(notification__in=serializer.validated_data['notifications'])
+        if 'before' in serializer.validated_data:
+            entries = entries.filter(notification_date_time__lte=serializer.validated_data['before'])
+        user = self.kwargs.get('pk')
+        marked = mark_inbox_read(user, entries)
+        return Response({'marked': marked, 'unread': get_unread_count(user)})
@@ -19,6 +19,8 @@ from .permissions import (
     InLeague, InGameLeague, FilterUserOwner, InFilterLeague, IsApplicationNotificationOwner
 )
 
+from backend.mixins import SharedObjectMixin
+
 from rest_framework import viewsets, permissions, mixins
 
 
@@ -29,7 +31,7 @@ class UmpCastNotificationViewSet(mixins.RetrieveModelMixin, mixins.ListModelMixi
     permission_classes = (permissions.IsAuthenticated, )
 
 
-class LeagueNotificationViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+class LeagueNotificationViewSet(SharedObjectMixin, mixins.CreateModelMixin, mixins.RetrieveModelMixin,
                                 mixins.UpdateModelMixin, mixins.DestroyModelMixin,
                                 mixins.ListModelMixin, viewsets.GenericViewSet):
     queryset = LeagueNotification.objects.all()
@@ -38,15 +40,16 @@ class LeagueNotificationViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMix
     permission_classes = (IsSuperUser | (
         permissions.IsAuthenticated & ActionBasedPermission),)
     action_permissions = {
-        IsManager & InLeague: ['update', 'destroy'],
+        IsManager & InLeague: ['update', 'partial_update', 'destroy'],
         IsManager: ['create'],  # handle league validation on serializer
         InLeague: ['retrieve'],
         InFilterLeague | FilterUserOwner: ['list']
     }
 
 
-class GameNotificationViewSet(mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+class GameNotificationViewSet(SharedObjectMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
     queryset = GameNotification.objects.all()
+    object_select_related = ('game__division', )
     serializer_class = GameNotificationSerializer
     filterset_class = GameNotificationFilter
     permission_classes = (IsSuperUser | (
@@ -57,8 +60,9 @@ class GameNotificationViewSet(mixins.RetrieveModelMixin, mixins.ListModelMixin,
     }
 
 
-class ApplicationNotificationViewSet(mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+class ApplicationNotificationViewSet(SharedObjectMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
     queryset = ApplicationNotification.objects.all()
+    object_select_related = ('application', )
     serializer_class = ApplicationNotificationSerializer
     filterset_class = ApplicationNotificationFilter
     permission_classes = (IsSuperUser | (
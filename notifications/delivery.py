@@ -0,0 +1,156 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.core import mail
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import sms
+from .models import Delivery, wants_delivery
+
+DELIVERY_BATCH_SIZE = 100
+MAX_DELIVERY_ATTEMPTS = 5
+# seconds before the first retry, doubled after every failed attempt
+DELIVERY_RETRY_DELAY = 60
+DELIVERY_MAX_RETRY_DELAY = 60 * 60
+# a claimed batch is sent again by another worker when it is not recorded within the lease
+DELIVERY_LEASE = timedelta(minutes=5)
+
+
+def get_retry_delay(attempts):
+    return timedelta(seconds=min(DELIVERY_RETRY_DELAY * 2 ** (attempts - 1), DELIVERY_MAX_RETRY_DELAY))
+
+
+def build_email(delivery):
+    notification = delivery.notification
+    return mail.EmailMessage(subject=notification.subject or '', body=notification.message, to=[delivery.user.email])
+
+
+def build_sms(delivery):
+    notification = delivery.notification
+    body = f"{notification.subject}: {notification.message}" if notification.subject else notification.message
+    return sms.SMSMessage(delivery.user.phone_number, body)
+
+
+def send_messages(connection, messages):
+    """
+    Send (pk, message) pairs one at a time over one open connection, so a failure only fails its own message.
+
+    Returns {pk: error}, None for the messages that were sent
+    """
+    try:
+        connection.open()
+    except Exception as error:
+        return {pk: repr(error) for pk, message in messages}
+    results = {}
+    try:
+        for pk, message in messages:
+            try:
+                results[pk] = None if connection.send_messages([message]) else 'message was not sent'
+            except Exception as error:
+                results[pk] = repr(error)
+    finally:
+        connection.close()
+    return results
+
+
+def send_deliveries(deliveries):
+    """
+    Send the deliveries with one email and one sms connection. Returns {delivery.pk: error or None}
+    """
+    messages = defaultdict(list)
+    for delivery in deliveries:
+        if delivery.channel == Delivery.EMAIL:
+            messages[Delivery.EMAIL].append((delivery.pk, build_email(delivery)))
+        else:
+            messages[Delivery.SMS].append((delivery.pk, build_sms(delivery)))
+    results = {}
+    if messages[Delivery.EMAIL]:
+        results.update(send_messages(mail.get_connection(), messages[Delivery.EMAIL]))
+    if messages[Delivery.SMS]:
+        results.update(send_messages(sms.get_connection(), messages[Delivery.SMS]))
+    return results
+
+
+def claim_deliveries(batch_size=DELIVERY_BATCH_SIZE, now=None):
+    """
+    Lease a batch of due deliveries to this worker in a short transaction. The rows are locked with SKIP LOCKED,
+    so workers running together take different batches, and sending rows whose lease ran out (the worker died)
+    are taken again. Users who opted out since the delivery was written are skipped.
+
+    Returns (deliveries to send, lease, number skipped). The deliveries keep the lease in next_attempt_at
+    """
+    now = now or timezone.now()
+    lease = now + DELIVERY_LEASE
+    with transaction.atomic():
+        deliveries = list(Delivery.objects.select_for_update(skip_locked=True, of=('self', )).filter(
+            status__in=[Delivery.PENDING, Delivery.SENDING], next_attempt_at__lte=now
+        ).select_related('notification', 'user').order_by('next_attempt_at')[:batch_size])
+        wanted = [delivery for delivery in deliveries
+                  if wants_delivery(delivery.user, delivery.channel, delivery.preference_field)]
+        skipped = {delivery.pk for delivery in deliveries} - {delivery.pk for delivery in wanted}
+        Delivery.objects.filter(pk__in=skipped).update(status=Delivery.SKIPPED)
+        Delivery.objects.filter(pk__in=[delivery.pk for delivery in wanted]).update(
+            status=Delivery.SENDING, next_attempt_at=lease, attempts=F('attempts') + 1)
+    for delivery in wanted:
+        delivery.status, delivery.next_attempt_at = Delivery.SENDING, lease
+        delivery.attempts += 1
+    return wanted, lease, len(skipped)
+
+
+def record_deliveries(deliveries, lease, results, now=None):
+    """
+    Store the results of sending leased deliveries. Rows this worker lost the lease of are left to the worker
+    holding them. Failed sends are retried with exponential backoff up to MAX_DELIVERY_ATTEMPTS.
+
+    Returns a Counter of the recorded outcomes (sent, retried, failed)
+    """
+    now = now or timezone.now()
+    outcomes = Counter()
+    with transaction.atomic():
+        leased = set(Delivery.objects.select_for_update().filter(
+            pk__in=[delivery.pk for delivery in deliveries], status=Delivery.SENDING, next_attempt_at=lease
+        ).values_list('pk', flat=True))
+        sent = [delivery.pk for delivery in deliveries if delivery.pk in leased and results[delivery.pk] is None]
+        failed = [delivery for delivery in deliveries if delivery.pk in leased and results[delivery.pk] is not None]
+        for delivery in failed:
+            delivery.last_error = results[delivery.pk]
+            if delivery.attempts >= MAX_DELIVERY_ATTEMPTS:
+                delivery.status = Delivery.FAILED
+                outcomes['failed'] += 1
+            else:
+                delivery.status = Delivery.PENDING
+                delivery.next_attempt_at = now + get_retry_delay(delivery.attempts)
+                outcomes['retried'] += 1
+        Delivery.objects.filter(pk__in=sent).update(status=Delivery.SENT, sent_at=timezone.now())
+        Delivery.objects.bulk_update(failed, ['last_error', 'next_attempt_at', 'status'])
+    outcomes['sent'] += len(sent)
+    return +outcomes
+
+
+def deliver_batch(batch_size=DELIVERY_BATCH_SIZE, now=None):
+    """
+    Send a batch of due deliveries. The batch is leased in one short transaction, sent with no transaction
+    or row lock held, and the results are recorded in a second one. A worker dying before recording its
+    results leaves the rows to be sent again when the lease runs out (at least once).
+
+    Returns a Counter of the batch's outcomes (sent, skipped, retried, failed)
+    """
+    now = now or timezone.now()
+    deliveries, lease, skipped = claim_deliveries(batch_size, now)
+    outcomes = record_deliveries(deliveries, lease, send_deliveries(deliveries), now)
+    outcomes['skipped'] += skipped
+    return +outcomes  # drop the outcomes that did not happen
+
+
+def drain_deliveries(batch_size=DELIVERY_BATCH_SIZE, now=None):
+    """
+    Send batches until no due delivery is left. Returns a Counter of the outcomes
+    """
+    outcomes = Counter()
+    while True:
+        batch = deliver_batch(batch_size, now)
+        if not sum(batch.values()):
+            return outcomes
+        outcomes.update(batch)
@@ -0,0 +1,56 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from notifications.models import (ApplicationNotification, GameNotification, InboxEntry, LeagueNotification,
+                                  UmpCastNotification, refresh_unread_counts)
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Write the inbox entries of every existing notification, for the users the feed used to compute at '
+            'read time, and recount the unread counters. Existing entries are kept, so the command can be rerun')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--clear', action='store_true', help='delete every inbox entry first')
+
+    def get_rows(self):
+        """
+        (scope, notification, notification_date_time, related_pk, user) of every delivery
+        """
+        users = list(User.objects.values_list('pk', flat=True))
+        for notification, date_time in UmpCastNotification.objects.values_list('pk', 'notification_date_time').iterator():
+            for user in users:
+                yield UmpCastNotification.scope, notification, date_time, notification, user
+        sources = (
+            (LeagueNotification, LeagueNotification.objects.filter(league__userleaguestatus__isnull=False).values_list(
+                'pk', 'notification_date_time', 'league', 'league__userleaguestatus__user')),
+            (GameNotification, GameNotification.objects.filter(game__post__application__isnull=False).values_list(
+                'pk', 'notification_date_time', 'game', 'game__post__application__user').distinct()),
+            (ApplicationNotification, ApplicationNotification.objects.values_list(
+                'pk', 'notification_date_time', 'application', 'application__user')),
+        )
+        for model, rows in sources:
+            for row in rows.iterator():
+                yield (model.scope, ) + row
+
+    def handle(self, *args, **options):
+        rows = self.get_rows()
+        written = 0
+        with transaction.atomic():
+            if options['clear']:
+                InboxEntry.objects.all().delete()
+            while True:
+                batch = [
+                    InboxEntry(scope=scope, notification_id=notification, notification_date_time=date_time,
+                               related_pk=related_pk, user_id=user)
+                    for scope, notification, date_time, related_pk, user in islice(rows, options['batch_size'])
+                ]
+                if not batch:
+                    break
+                InboxEntry.objects.bulk_create(batch, ignore_conflicts=True)
+                written += len(batch)
+            refresh_unread_counts()
+        self.stdout.write(f"{written} deliveries written, {InboxEntry.objects.count()} inbox entries")
@@ -0,0 +1,50 @@
+import time
+
+from django.core import mail
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from model_bakery import baker
+
+from notifications import sms
+from notifications.delivery import DELIVERY_BATCH_SIZE, drain_deliveries
+from notifications.models import Delivery, LeagueNotification, bulk_create_notifications
+
+
+class Command(BaseCommand):
+    help = ('Measure the throughput of writing notification deliveries to the outbox and of draining them, '
+            'with the locmem email and sms backends unless other backends are given. '
+            'Data is created inside a transaction that is rolled back')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--notifications', type=int, default=10)
+        parser.add_argument('--batch-sizes', type=int, nargs='+', default=[10, DELIVERY_BATCH_SIZE, 500])
+        parser.add_argument('--email-backend', default='django.core.mail.backends.locmem.EmailBackend')
+        parser.add_argument('--sms-backend', default='notifications.sms.LocmemBackend')
+
+    def run(self, options, batch_size):
+        league = baker.make('leagues.League')
+        users = baker.make('users.User', phone_number='5555555555', _quantity=options['users'])
+        league.user_set.add(*users, through_defaults={'request_status': 'accepted'})
+        start = time.perf_counter()
+        bulk_create_notifications(LeagueNotification, [
+            LeagueNotification(league=league, subject='benchmark', message='benchmark')
+            for _ in range(options['notifications'])])
+        enqueued = time.perf_counter() - start
+        deliveries = Delivery.objects.filter(notification__leaguenotification__league=league).count()
+        start = time.perf_counter()
+        outcomes = drain_deliveries(batch_size)
+        drained = time.perf_counter() - start
+        self.stdout.write(
+            f"batch size {batch_size}: {deliveries} deliveries, enqueued {deliveries / enqueued:.0f}/s, "
+            f"sent {outcomes['sent'] / drained:.0f}/s ({dict(outcomes)})")
+
+    def handle(self, *args, **options):
+        with override_settings(EMAIL_BACKEND=options['email_backend'], SMS_BACKEND=options['sms_backend']):
+            for batch_size in options['batch_sizes']:
+                with transaction.atomic():
+                    self.run(options, batch_size)
+                    transaction.set_rollback(True)
+                mail.outbox = []
+                sms.outbox.clear()
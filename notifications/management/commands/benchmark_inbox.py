@@ -0,0 +1,92 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import CharField, F, Value
+from model_bakery import baker
+
+from games.models import Application, Post
+from notifications.api.views import NotificationListView
+from notifications.models import (ApplicationNotification, BaseNotification, GameNotification, InboxEntry,
+                                  LeagueNotification, UmpCastNotification, bulk_create_notifications)
+from users.models import User
+
+
+def get_union_feed(user_pk):
+    """
+    The feed as it was computed at read time before the inbox: a union of every notification type
+    """
+    value_fields = ('pk', 'subject', 'message', 'notification_date_time')
+    game_ids = Application.objects.filter(user__pk=user_pk).values_list('post__game__pk', flat=True)
+    return UmpCastNotification.objects.values(
+        *value_fields, scope=Value('ump-cast', output_field=CharField()), related_pk=F('pk'), notification_id=F('id')
+    ).union(LeagueNotification.objects.filter(league__user__pk=user_pk).values(
+        *value_fields, scope=Value('league', output_field=CharField()), related_pk=F('league__pk'), notification_id=F('id')
+    )).union(GameNotification.objects.filter(game__pk__in=game_ids).values(
+        *value_fields, scope=Value('game', output_field=CharField()), related_pk=F('game__pk'), notification_id=F('id')
+    )).union(ApplicationNotification.objects.filter(application__user__pk=user_pk).values(
+        *value_fields, scope=Value('application', output_field=CharField()), related_pk=F('application__pk'), notification_id=F('id')
+    )).order_by('-notification_date_time')
+
+
+class Command(BaseCommand):
+    help = ('Compare reading a page of the notification feed from the per-user inbox against the union the feed '
+            'used to compute at read time. Data is created inside a transaction that is rolled back')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--leagues', type=int, default=20)
+        parser.add_argument('--games', type=int, default=2000)
+        parser.add_argument('--notifications', type=int, default=20, help='notifications per game and league')
+        parser.add_argument('--reads', type=int, default=50)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def make_data(self, options, rng):
+        users = baker.make('users.User', _quantity=options['users'])
+        leagues = baker.make('leagues.League', _quantity=options['leagues'])
+        for user in users:
+            user.leagues.add(*rng.sample(leagues, 2), through_defaults={'request_status': 'accepted'})
+        divisions = [baker.make('leagues.Division', league=league) for league in leagues]
+        roles = {division.pk: baker.make('leagues.Role', division=division) for division in divisions}
+        games = [baker.make('games.Game', division=rng.choice(divisions)) for _ in range(options['games'])]
+        posts = Post.objects.bulk_create([Post(game=game, role=roles[game.division_id]) for game in games])
+        for post in posts:
+            for user in rng.sample(users, 3):
+                Application.objects.create(post=post, user=user)
+        count = options['notifications']
+        bulk_create_notifications(LeagueNotification, [
+            LeagueNotification(league=league, message='league') for league in leagues for _ in range(count)])
+        bulk_create_notifications(GameNotification, [
+            GameNotification(game=game, message='game') for game in games for _ in range(count)])
+        bulk_create_notifications(UmpCastNotification, [UmpCastNotification(message='umpcast') for _ in range(count)])
+        return users
+
+    def time_reads(self, users, read):
+        start = time.perf_counter()
+        for user in users:
+            read(user)
+        return (time.perf_counter() - start) / len(users) * 1000
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        page_size = options['page_size']
+        with transaction.atomic():
+            users = self.make_data(options, rng)
+            with connection.cursor() as cursor:
+                for model in (BaseNotification, GameNotification, Application, InboxEntry):
+                    cursor.execute(f"ANALYZE {model._meta.db_table}")
+            readers = [rng.choice(users) for _ in range(options['reads'])]
+
+            def union(user):
+                return list(get_union_feed(user.pk)[:page_size])
+
+            def inbox(user):
+                return list(NotificationListView(kwargs={'pk': user.pk}).get_queryset()[:page_size])
+
+            self.stdout.write(f"{User.objects.count()} users, {BaseNotification.objects.count()} notifications, "
+                              f"{InboxEntry.objects.count()} inbox entries")
+            self.stdout.write(f"union: {self.time_reads(readers, union):.2f}ms per page")
+            self.stdout.write(f"inbox: {self.time_reads(readers, inbox):.2f}ms per page")
+            transaction.set_rollback(True)
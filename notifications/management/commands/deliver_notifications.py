@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.delivery import DELIVERY_BATCH_SIZE, drain_deliveries
+
+
+class Command(BaseCommand):
+    help = ('Send the pending email and sms deliveries of notifications in batches. Several workers can run '
+            'together, each takes different deliveries')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DELIVERY_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='keep polling for deliveries')
+        parser.add_argument('--interval', type=float, default=5, help='seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            outcomes = drain_deliveries(options['batch_size'])
+            if outcomes or not options['loop']:
+                self.stdout.write(', '.join(f"{count} {outcome}" for outcome, count in sorted(outcomes.items()))
+                                  or 'no pending deliveries')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.delivery import drain_deliveries
+from notifications.reminders import REMINDER_BATCH_SIZE, send_due_reminders
+
+
+class Command(BaseCommand):
+    help = ('Write the deliveries of the game reminders that are due and mark them reminded, in batches. Several '
+            'schedulers can run together, each claims different reminders')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=REMINDER_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='keep polling for due reminders')
+        parser.add_argument('--interval', type=float, default=60, help='seconds between polls with --loop')
+        parser.add_argument('--deliver', action='store_true',
+                            help='also send the pending deliveries, instead of leaving them to deliver_notifications')
+
+    def handle(self, *args, **options):
+        while True:
+            outcomes = send_due_reminders(options['batch_size'])
+            if options['deliver']:
+                outcomes.update(drain_deliveries())
+            if outcomes or not options['loop']:
+                self.stdout.write(', '.join(f"{count} {outcome}" for outcome, count in sorted(outcomes.items()))
+                                  or 'no due reminders')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
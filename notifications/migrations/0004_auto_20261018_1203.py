@@ -0,0 +1,35 @@
+# Generated by Django 3.0.7 on 2026-10-18 12:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notifications', '0003_auto_20200821_1850'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboxEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_date_time', models.DateTimeField()),
+                ('scope', models.CharField(max_length=16)),
+                ('related_pk', models.IntegerField()),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='notifications.BaseNotification')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='inboxentry',
+            index=models.Index(fields=['user', 'notification_date_time', 'id'], name='notificatio_user_id_2f8891_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='inboxentry',
+            unique_together={('user', 'notification')},
+        ),
+    ]
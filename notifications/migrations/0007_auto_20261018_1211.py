@@ -0,0 +1,32 @@
+# Generated by Django 3.0.7 on 2026-10-18 12:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0006_auto_20261018_1209'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamenotification',
+            name='reminder_date_time',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunSQL(
+            sql=(
+                'UPDATE notifications_gamenotification AS game_notification '
+                'SET reminder_date_time = notification.notification_date_time '
+                'FROM notifications_basenotification AS notification '
+                'WHERE notification.id = game_notification.basenotification_ptr_id '
+                'AND NOT game_notification.was_reminded'
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='gamenotification',
+            index=models.Index(condition=models.Q(was_reminded=False), fields=['reminder_date_time'], name='gamenotification_due_idx'),
+        ),
+    ]
@@ -1,10 +1,16 @@
+from collections import Counter, defaultdict
 from datetime import timedelta
 
-from django.db import models
-from django.db.models.signals import post_save
+from django.core.exceptions import ValidationError
+from django.db import connection, models, transaction
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.utils import timezone
+from django.utils.text import Truncator
 
-from games.models import Application, Game
+from games.models import Application, Game, Post
+from notifications import sms
+from users.models import User, UserLeagueStatus
 
 
 class BaseNotification(models.Model):
@@ -16,19 +22,102 @@ class BaseNotification(models.Model):
     message = models.CharField(max_length=256)
 
     def save(self, *args, **kwargs):
-        if self.subject:
-            self.subject = self.subject[:64]
-        self.message = self.message[:256]
-        return super().save(*args, **kwargs)
+        validate_notification_text(self)
+        # post_save fans the notification out after save_base's own transaction, inbox entries and deliveries
+        # must commit with it
+        with transaction.atomic():
+            return super().save(*args, **kwargs)
+
+    def is_due(self):
+        """
+        Whether the notification is sent by email and sms as soon as it is created
+        """
+        return True
 
     class Meta:
         ordering = ['-notification_date_time']
 
 
+def validate_notification_text(notification):
+    """
+    Raise ValidationError when the subject or message is longer than its column
+    """
+    errors = {}
+    for name in ('subject', 'message'):
+        try:
+            BaseNotification._meta.get_field(name).run_validators(getattr(notification, name))
+        except ValidationError as error:
+            errors[name] = error.messages
+    if errors:
+        raise ValidationError(errors)
+
+
+def fit_notification_text(subject, message):
+    """
+    Shorten generated text (game titles, locations and details) to the subject and message columns,
+    ending it with an ellipsis
+    """
+    return (Truncator(subject).chars(BaseNotification._meta.get_field('subject').max_length),
+            Truncator(message).chars(BaseNotification._meta.get_field('message').max_length))
+
+
+def insert_child_rows(model, notifications, batch_size):
+    """
+    Insert the child table rows of notifications whose BaseNotification rows exist
+    """
+    fields = model._meta.local_concrete_fields
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        for start in range(0, len(notifications), batch_size):
+            batch = notifications[start:start + batch_size]
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) VALUES {', '.join(['%s'] * len(batch))}",
+                [tuple(field.get_db_prep_save(getattr(notification, field.attname), connection) for field in fields)
+                 for notification in batch])
+
+
+def bulk_create_notifications(model, notifications, batch_size=500):
+    """
+    bulk_create for BaseNotification subclasses. Django refuses to bulk create multi-table inherited
+    models, so the BaseNotification rows are bulk created first and the child rows are inserted in
+    batches using their parent pks. No post_save signals are sent. The notifications, inbox entries and
+    deliveries are written in one transaction.
+
+    Raises ValidationError before writing anything when a subject or message does not fit
+    """
+    notifications = list(notifications)
+    for notification in notifications:
+        validate_notification_text(notification)
+    parent_fields = [field.attname for field in BaseNotification._meta.concrete_fields if not field.primary_key]
+    with transaction.atomic():
+        parents = BaseNotification.objects.bulk_create([
+            BaseNotification(**{name: getattr(notification, name) for name in parent_fields})
+            for notification in notifications
+        ], batch_size=batch_size)
+        for notification, parent in zip(notifications, parents):
+            notification.id = notification.pk = parent.pk
+            notification._state.adding = False
+            notification._state.db = parent._state.db
+        insert_child_rows(model, notifications, batch_size)
+        fan_out_notifications(model, notifications)
+    return notifications
+
+
 class UmpCastNotification(BaseNotification):
     """
     UmpCast Level Notification
     """
+    scope = 'ump-cast'
+    preference_field = None
+
+    def get_related_pk(self):
+        return self.pk
+
+    @classmethod
+    def get_recipients(cls, notifications):
+        users = list(User.objects.values_list('pk', flat=True))
+        return {notification.pk: users for notification in notifications}
 
 
 class LeagueNotification(BaseNotification):
@@ -36,6 +125,19 @@ class LeagueNotification(BaseNotification):
     League Level Notifications. External Notifications sent immediately
     """
     league = models.ForeignKey('leagues.League', on_delete=models.CASCADE)
+    scope = 'league'
+    preference_field = 'league_notifications'
+
+    def get_related_pk(self):
+        return self.league_id
+
+    @classmethod
+    def get_recipients(cls, notifications):
+        members = defaultdict(list)
+        for user, league in UserLeagueStatus.objects.filter(
+                league__in={notification.league_id for notification in notifications}).values_list('user', 'league'):
+            members[league].append(user)
+        return {notification.pk: members[notification.league_id] for notification in notifications}
 
 
 class GameNotification(BaseNotification):
@@ -44,6 +146,35 @@ class GameNotification(BaseNotification):
     """
     game = models.ForeignKey('games.Game', on_delete=models.CASCADE)
     was_reminded = models.BooleanField(default=False)
+    # copy of notification_date_time while the reminder is pending, the parent column cannot be in an index
+    # of this table
+    reminder_date_time = models.DateTimeField(null=True, blank=True)
+    scope = 'game'
+    preference_field = 'game_notifications'
+
+    class Meta:
+        indexes = [models.Index(fields=['reminder_date_time'], condition=models.Q(was_reminded=False),
+                                name='gamenotification_due_idx')]
+
+    def save(self, *args, **kwargs):
+        self.reminder_date_time = None if self.was_reminded else self.notification_date_time
+        return super().save(*args, **kwargs)
+
+    def get_related_pk(self):
+        return self.game_id
+
+    def is_due(self):
+        # reminders are delivered when they are due, not when they are created
+        return self.was_reminded
+
+    @classmethod
+    def get_recipients(cls, notifications):
+        applicants = defaultdict(set)
+        for user, game in Application.objects.filter(
+                post__game__in={notification.game_id for notification in notifications}
+        ).values_list('user', 'post__game'):
+            applicants[game].add(user)
+        return {notification.pk: applicants[notification.game_id] for notification in notifications}
 
 
 class ApplicationNotification(BaseNotification):
@@ -52,21 +183,249 @@ class ApplicationNotification(BaseNotification):
     """
     application = models.ForeignKey(
         'games.Application', on_delete=models.CASCADE)
+    scope = 'application'
+    preference_field = 'application_notifications'
+
+    def get_related_pk(self):
+        return self.application_id
+
+    @classmethod
+    def get_recipients(cls, notifications):
+        users = dict(Application.objects.filter(
+            pk__in={notification.application_id for notification in notifications}).values_list('pk', 'user'))
+        return {notification.pk: [users[notification.application_id]] for notification in notifications
+                if notification.application_id in users}
+
+
+class InboxEntry(models.Model):
+    """
+    A notification delivered to a user. Written when the notification is created (fan-out on write), so a user's
+    feed is one range scan of the (user, notification_date_time) index
+    """
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE)
+    notification = models.ForeignKey(BaseNotification, on_delete=models.CASCADE)
+    notification_date_time = models.DateTimeField()
+    scope = models.CharField(max_length=16)
+    related_pk = models.IntegerField()
+    is_read = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('user', 'notification')
+        indexes = [models.Index(fields=['user', 'notification_date_time', 'id'])]
+
+
+class UnreadCount(models.Model):
+    """
+    Number of unread inbox entries of a user, maintained with every inbox write so the badge is a primary key lookup
+    """
+    user = models.OneToOneField('users.User', primary_key=True, on_delete=models.CASCADE)
+    count = models.IntegerField(default=0)
+
+
+def change_unread_counts(counts):
+    """
+    Add {user_pk: amount} to the unread counts, with one update per distinct amount
+    """
+    counts = {user: amount for user, amount in counts.items() if amount}
+    if not counts:
+        return
+    UnreadCount.objects.bulk_create([UnreadCount(user_id=user) for user in counts], ignore_conflicts=True)
+    users_by_amount = defaultdict(list)
+    for user, amount in counts.items():
+        users_by_amount[amount].append(user)
+    for amount, users in users_by_amount.items():
+        UnreadCount.objects.filter(user__in=users).update(count=models.F('count') + amount)
+
+
+def refresh_unread_counts(user_pks=None):
+    """
+    Recount the unread inbox entries of the users (every user when None). The count is read by the same
+    UPDATE that writes it, so it cannot overwrite a concurrent change with an older count
+    """
+    users = User.objects.all() if user_pks is None else User.objects.filter(pk__in=user_pks)
+    unread = InboxEntry.objects.filter(user=models.OuterRef('user'), is_read=False).order_by().values(
+        'user').annotate(unread=models.Count('pk')).values('unread')
+    with transaction.atomic():
+        UnreadCount.objects.bulk_create([UnreadCount(user_id=user) for user in users.values_list('pk', flat=True)],
+                                        ignore_conflicts=True)
+        UnreadCount.objects.filter(user__in=users).update(
+            count=Coalesce(models.Subquery(unread, output_field=models.IntegerField()), 0))
+
+
+def delete_inbox_entries(entries):
+    """
+    Delete the inbox entries, taking their unread entries off the counts. The unread entries are locked
+    while they are counted, so a concurrent mark_inbox_read cannot take them off a second time
+    """
+    with transaction.atomic():
+        counts = Counter(entries.filter(is_read=False).select_for_update().values_list('user', flat=True))
+        entries.delete()
+        change_unread_counts({user: -unread for user, unread in counts.items()})
+
+
+def mark_inbox_read(user_pk, entries):
+    """
+    Mark the user's inbox entries read. Returns the number of entries that were unread
+    """
+    updated = entries.filter(user=user_pk, is_read=False).update(is_read=True)
+    change_unread_counts({user_pk: -updated})
+    return updated
+
+
+def get_unread_count(user_pk):
+    return UnreadCount.objects.filter(user=user_pk).values_list('count', flat=True).first() or 0
+
+
+class Delivery(models.Model):
+    """
+    A notification to send to a user by email or sms (transactional outbox). Rows are written in the transaction
+    of the notification and sent by the delivery worker (notifications/delivery.py). While a worker sends a row it
+    is sending, and next_attempt_at is the end of the worker's lease
+    """
+    EMAIL = 'email'
+    SMS = 'sms'
+    CHANNEL_CHOICES = [(EMAIL, 'Email'), (SMS, 'SMS')]
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    SKIPPED = 'skipped'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (SENDING, 'Sending'), (SENT, 'Sent'), (SKIPPED, 'Skipped'),
+                      (FAILED, 'Failed')]
+
+    notification = models.ForeignKey(BaseNotification, on_delete=models.CASCADE)
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE)
+    channel = models.CharField(max_length=8, choices=CHANNEL_CHOICES)
+    preference_field = models.CharField(max_length=32, blank=True)
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['next_attempt_at'], condition=models.Q(status__in=['pending', 'sending']),
+                                name='delivery_pending_idx')]
+
+
+def wants_delivery(user, channel, preference_field):
+    """
+    Whether the user opted in to the channel and to the notification type, and the channel can be sent
+    """
+    if preference_field and not getattr(user, preference_field):
+        return False
+    if channel == Delivery.EMAIL:
+        return user.email_notifications and bool(user.email)
+    # sms is only sent when a backend is configured
+    return sms.is_configured() and user.phone_notifications and bool(user.phone_number)
+
+
+def enqueue_deliveries(model, notifications, recipients, batch_size=1000):
+    """
+    Write the email and sms deliveries of the notifications for the recipients that opted in
+    """
+    user_pks = {user for notification in notifications for user in recipients.get(notification.pk, ())}
+    if not user_pks:
+        return
+    users = User.objects.filter(pk__in=user_pks).only(
+        'pk', 'email', 'phone_number', 'email_notifications', 'phone_notifications',
+        *filter(None, [model.preference_field])).in_bulk()
+    Delivery.objects.bulk_create([
+        Delivery(notification_id=notification.pk, user_id=user, channel=channel,
+                 preference_field=model.preference_field or '')
+        for notification in notifications for user in recipients.get(notification.pk, ())
+        for channel in (Delivery.EMAIL, Delivery.SMS)
+        if user in users and wants_delivery(users[user], channel, model.preference_field)
+    ], batch_size=batch_size)
+
+
+def build_inbox_entry(user_pk, notification):
+    return InboxEntry(user_id=user_pk, notification_id=notification.pk, scope=notification.scope,
+                      notification_date_time=notification.notification_date_time,
+                      related_pk=notification.get_related_pk())
+
+
+def insert_inbox_entries(entries, batch_size=1000):
+    """
+    Insert inbox entries, skipping the ones already delivered, and add the inserted entries to the unread counts.
+    The inserted rows are read back with RETURNING, so entries written concurrently are counted once
+    """
+    columns = ('user_id', 'notification_id', 'notification_date_time', 'scope', 'related_pk', 'is_read')
+    table = connection.ops.quote_name(InboxEntry._meta.db_table)
+    inserted = Counter()
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(entries), batch_size):
+            batch = entries[start:start + batch_size]
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join(['%s'] * len(batch))} "
+                f"ON CONFLICT (user_id, notification_id) DO NOTHING RETURNING user_id",
+                [tuple(getattr(entry, column) for column in columns) for entry in batch])
+            inserted.update(user for user, in cursor.fetchall())
+        change_unread_counts(inserted)
+    return inserted
+
+
+def fan_out_notifications(model, notifications, batch_size=1000):
+    """
+    Write inbox entries of new notifications for every recipient
+    """
+    recipients = model.get_recipients(notifications)
+    insert_inbox_entries([
+        build_inbox_entry(user, notification)
+        for notification in notifications for user in recipients.get(notification.pk, ())
+    ], batch_size=batch_size)
+    enqueue_deliveries(model, [notification for notification in notifications if notification.is_due()], recipients)
+
+
+def deliver_existing_notifications(notifications, user_pks, batch_size=1000):
+    """
+    Write inbox entries of notifications created before the users became recipients.
+    Returns {user_pk: entries inserted}
+    """
+    user_pks = list(user_pks)
+    return insert_inbox_entries([
+        build_inbox_entry(user, notification) for notification in notifications for user in user_pks
+    ], batch_size=batch_size)
 
 
 ADVANCED_NOTIFICATION_DAYS = 1
 
 
+def get_reminder_date_time(game):
+    return game.date_time - timedelta(days=ADVANCED_NOTIFICATION_DAYS)
+
+
+def build_game_reminder(instance):
+    subject, message = fit_notification_text(
+        f"{instance.title} Game Reminder",
+        f"Reminder for {instance.title}: Date Time {str(instance.date_time)}, Location {instance.location}")
+    return GameNotification(
+        game=instance,
+        was_reminded=False,
+        notification_date_time=get_reminder_date_time(instance),
+        reminder_date_time=get_reminder_date_time(instance),
+        subject=subject,
+        message=message
+    )
+
+
 def game_handle_creation(instance):
     if instance.is_active:
-        GameNotification.objects.create(
-            game=instance,
-            was_reminded=False,
-            notification_date_time=instance.date_time -
-            timedelta(days=ADVANCED_NOTIFICATION_DAYS),
-            subject=f"{instance.title} Game Reminder",
-            message=f"Reminder for {instance.title}: Date Time {str(instance.date_time)}, Location {instance.location}"
-        )
+        build_game_reminder(instance).save()
+
+
+def create_game_reminders(games):
+    """
+    Bulk variant of game_handle_creation for games inserted with bulk_create (no post_save is sent)
+    """
+    return bulk_create_notifications(GameNotification, [
+        build_game_reminder(game) for game in games if game.is_active
+    ])
+
+
+def create_game_notification(game_dict, subject, message):
+    subject, message = fit_notification_text(subject, message)
+    GameNotification.objects.create(**dict(game_dict, subject=subject, message=message))
 
 
 def game_handle_update(instance, **kwargs):
@@ -85,22 +444,30 @@ def game_handle_update(instance, **kwargs):
         print("It doesn't appear that any fields were updated")
         return
 
+    if 'date_time' in kwargs['update_fields']:
+        # pending reminders follow the game
+        updated = build_game_reminder(instance)
+        for reminder in GameNotification.objects.filter(game=instance, was_reminded=False):
+            reminder.notification_date_time = updated.notification_date_time
+            reminder.subject, reminder.message = updated.subject, updated.message
+            reminder.save()
+
     fields = ('title', 'date_time', 'location', 'description')
     for field in fields:
         if field in kwargs['update_fields'] and instance.is_active:
-            GameNotification.objects.create(**dict(game_dict,
-                                                   subject=f"{instance.title} {verbose_dict.get(field)} updated",
-                                                   message=f"{verbose_dict.get(field)} for {instance.title} has been updated to: {str(getattr(instance,field))}"))
+            create_game_notification(game_dict,
+                                     f"{instance.title} {verbose_dict.get(field)} updated",
+                                     f"{verbose_dict.get(field)} for {instance.title} has been updated to: {str(getattr(instance,field))}")
 
     if 'is_active' in kwargs['update_fields']:
         if instance.is_active:
-            GameNotification.objects.create(**dict(game_dict,
-                                                   subject=f"{instance.title} uncancelled",
-                                                   message=f"{instance.title} has been uncancelled. Here are the details: Date Time {str(instance.date_time)}, Location {instance.location}"))
+            create_game_notification(game_dict,
+                                     f"{instance.title} uncancelled",
+                                     f"{instance.title} has been uncancelled. Here are the details: Date Time {str(instance.date_time)}, Location {instance.location}")
         else:
-            GameNotification.objects.create(**dict(game_dict,
-                                                   subject=f"{instance.title} cancelled",
-                                                   message=f"{instance.title} has been cancelled"))
+            create_game_notification(game_dict,
+                                     f"{instance.title} cancelled",
+                                     f"{instance.title} has been cancelled")
 
 # API Create Endpoint, Admin Create/Update, TS Create/Update
 
@@ -117,22 +484,25 @@ post_save.connect(game_notification_receiver, sender=Game)
 
 
 def is_casted(application):
-    return application.post.application_set.get_min_order() == application.order
+    return application.is_casted()
 
 
-def notify_application(application):
+def build_application_notification(application, casted):
     app_dict = {
         'application': application,
         'notification_date_time': timezone.now(),
     }
-    if is_casted(application):
-        ApplicationNotification.objects.create(**dict(app_dict,
-                                                      subject=f"Casted for {application.post.game.title}",
-                                                      message=f"You are currently now casted for {application.post.game.title}"))
+    if casted:
+        subject, message = fit_notification_text(f"Casted for {application.post.game.title}",
+                                                 f"You are currently now casted for {application.post.game.title}")
     else:
-        ApplicationNotification.objects.create(**dict(app_dict,
-                                                      subject=f"Backup for {application.post.game.title}",
-                                                      message=f"You are currently now a backup for {application.post.game.title}"))
+        subject, message = fit_notification_text(f"Backup for {application.post.game.title}",
+                                                 f"You are currently now a backup for {application.post.game.title}")
+    return ApplicationNotification(**dict(app_dict, subject=subject, message=message))
+
+
+def notify_application(application):
+    build_application_notification(application, is_casted(application)).save()
 
 
 def application_notification_receiver(sender, instance, *args, **kwargs):
@@ -153,6 +523,35 @@ def application_notification_receiver(sender, instance, *args, **kwargs):
 post_save.connect(application_notification_receiver, sender=Application)
 
 
+def refresh_vacancy(post):
+    """
+    Reconsider a post left vacant by auto casting after its applications changed. The post stays vacant while
+    it has applications and none of them is eligible. Otherwise the vacancy is cleared and the first eligible
+    application is cast, max_casts is applied again by the next auto casting run
+    """
+    cast = post.get_eligible_applications().first()
+    if cast is None and post.application_set.exists():
+        return
+    Post.objects.filter(pk=post.pk).update(is_vacant=False)
+    post.is_vacant = False
+    if cast is None:
+        return
+    if cast.is_casted():
+        notify_application(cast)
+    else:
+        cast.top()  # notified by application_notification_receiver
+
+
+def vacancy_receiver(sender, instance, *args, **kwargs):
+    if kwargs.get('created', True) and instance.post.is_vacant:
+        refresh_vacancy(instance.post)
+
+
+# after application_notification_receiver, a new applicant is told they are a backup before being cast
+post_save.connect(vacancy_receiver, sender=Application)
+post_delete.connect(vacancy_receiver, sender=Application)
+
+
 def print_game_notification(sender, instance, *args, **kwargs):
     pass
     # print(instance)
@@ -168,3 +567,86 @@ def print_application_notification(sender, instance, *args, **kwargs):
 
 post_save.connect(print_application_notification,
                   sender=ApplicationNotification)
+
+
+def inbox_notification_receiver(sender, instance, created, *args, **kwargs):
+    if created:
+        fan_out_notifications(sender, [instance])
+    else:
+        InboxEntry.objects.filter(notification=instance).exclude(
+            notification_date_time=instance.notification_date_time
+        ).update(notification_date_time=instance.notification_date_time)
+
+
+def inbox_notification_delete_receiver(sender, instance, *args, **kwargs):
+    delete_inbox_entries(InboxEntry.objects.filter(notification=instance.pk))
+
+
+for notification_model in (UmpCastNotification, LeagueNotification, GameNotification, ApplicationNotification):
+    post_save.connect(inbox_notification_receiver, sender=notification_model)
+    pre_delete.connect(inbox_notification_delete_receiver, sender=notification_model)
+
+
+# recipients are resolved when a notification is written, so recipients added later receive the past
+# notifications they would have been sent, and lose them when they stop being recipients
+
+def inbox_user_receiver(sender, instance, created, *args, **kwargs):
+    if created:
+        deliver_existing_notifications(UmpCastNotification.objects.all(), [instance.pk])
+
+
+def add_league_inbox(user_pks, league_pks):
+    for league in league_pks:
+        deliver_existing_notifications(LeagueNotification.objects.filter(league=league), user_pks)
+
+
+def remove_league_inbox(user_pks, league_pks):
+    delete_inbox_entries(InboxEntry.objects.filter(
+        user__in=user_pks, scope=LeagueNotification.scope, related_pk__in=league_pks))
+
+
+def inbox_league_status_receiver(sender, instance, created, *args, **kwargs):
+    if created:
+        add_league_inbox([instance.user_id], [instance.league_id])
+
+
+def inbox_league_status_delete_receiver(sender, instance, *args, **kwargs):
+    remove_league_inbox([instance.user_id], [instance.league_id])
+
+
+def inbox_leagues_receiver(sender, instance, action, reverse, pk_set, *args, **kwargs):
+    # User.leagues writes UserLeagueStatus rows without saving them
+    if action == 'pre_clear':
+        instance._inbox_cleared = list(instance.user_set.values_list('pk', flat=True)) if reverse else list(
+            instance.leagues.values_list('pk', flat=True))
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_inbox_cleared', [])
+    elif action not in ('post_add', 'post_remove'):
+        return
+    users, leagues = (pk_set, [instance.pk]) if reverse else ([instance.pk], pk_set)
+    if action == 'post_add':
+        add_league_inbox(users, leagues)
+    else:
+        remove_league_inbox(users, leagues)
+
+
+def inbox_application_receiver(sender, instance, created, *args, **kwargs):
+    if created:
+        deliver_existing_notifications(
+            GameNotification.objects.filter(game__post__application=instance), [instance.user_id])
+
+
+def inbox_application_delete_receiver(sender, instance, *args, **kwargs):
+    game = Post.objects.filter(pk=instance.post_id).values_list('game', flat=True).first()
+    if game is not None and not Application.objects.filter(user=instance.user_id, post__game=game).exists():
+        delete_inbox_entries(InboxEntry.objects.filter(
+            user=instance.user_id, scope=GameNotification.scope, related_pk=game))
+
+
+post_save.connect(inbox_user_receiver, sender=User)
+post_save.connect(inbox_league_status_receiver, sender=UserLeagueStatus)
+post_delete.connect(inbox_league_status_delete_receiver, sender=UserLeagueStatus)
+m2m_changed.connect(inbox_leagues_receiver, sender=User.leagues.through)
+post_save.connect(inbox_application_receiver, sender=Application)
+post_delete.connect(inbox_application_delete_receiver, sender=Application)
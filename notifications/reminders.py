@@ -0,0 +1,47 @@
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import GameNotification, enqueue_deliveries
+
+REMINDER_BATCH_SIZE = 500
+
+
+def claim_due_reminders(batch_size, now):
+    """
+    Lock a batch of pending reminders that are due, oldest first. The rows are read from the partial
+    gamenotification_due_idx index and locked with SKIP LOCKED, so schedulers running together claim different batches
+    """
+    return list(GameNotification.objects.select_for_update(skip_locked=True, of=('self', )).filter(
+        was_reminded=False, reminder_date_time__lte=now
+    ).select_related('game').order_by('reminder_date_time')[:batch_size])
+
+
+def send_reminder_batch(batch_size=REMINDER_BATCH_SIZE, now=None):
+    """
+    Claim a batch of due reminders, write their deliveries to the outbox and flip was_reminded in bulk, in one
+    transaction. Reminders of cancelled games or of games that already started are flipped without deliveries.
+
+    Returns a Counter of the batch's outcomes (reminded, skipped)
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        reminders = claim_due_reminders(batch_size, now)
+        due = [reminder for reminder in reminders if reminder.game.is_active and reminder.game.date_time > now]
+        enqueue_deliveries(GameNotification, due, GameNotification.get_recipients(due))
+        GameNotification.objects.filter(pk__in=[reminder.pk for reminder in reminders]).update(
+            was_reminded=True, reminder_date_time=None)
+    return +Counter(reminded=len(due), skipped=len(reminders) - len(due))
+
+
+def send_due_reminders(batch_size=REMINDER_BATCH_SIZE, now=None):
+    """
+    Send batches until no reminder is due. Returns a Counter of the outcomes
+    """
+    outcomes = Counter()
+    while True:
+        batch = send_reminder_batch(batch_size, now)
+        if not batch:
+            return outcomes
+        outcomes.update(batch)
@@ -0,0 +1,86 @@
+import sys
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+# messages sent with the locmem backend, like django.core.mail.outbox
+outbox = []
+
+
+class SMSMessage(object):
+    def __init__(self, to, body):
+        self.to = to
+        self.body = body
+
+    def __repr__(self):
+        return f"SMSMessage(to={self.to!r}, body={self.body!r})"
+
+
+class BaseBackend(object):
+    """
+    Sms backends follow the interface of the django.core.mail backends: open() and close() a connection,
+    reused for every message of send_messages(), which returns the number of messages sent
+    """
+
+    def __init__(self, fail_silently=False, **kwargs):
+        self.fail_silently = fail_silently
+
+    def open(self):
+        return False
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def send_messages(self, messages):
+        raise NotImplementedError('subclasses of BaseBackend must override send_messages()')
+
+
+class ConsoleBackend(BaseBackend):
+    """
+    Writes messages to stdout, for development (DEBUG) only: numbers and bodies end up in the logs
+    """
+
+    def __init__(self, *args, stream=None, **kwargs):
+        self.stream = stream or sys.stdout
+        self._lock = threading.RLock()
+        super().__init__(*args, **kwargs)
+
+    def send_messages(self, messages):
+        with self._lock:
+            for message in messages:
+                self.stream.write(f"SMS to {message.to}: {message.body}\n")
+            self.stream.flush()
+        return len(messages)
+
+
+class LocmemBackend(BaseBackend):
+    """
+    Stores messages in notifications.sms.outbox, for tests
+    """
+
+    def send_messages(self, messages):
+        outbox.extend(messages)
+        return len(messages)
+
+
+def is_configured():
+    """
+    Whether SMS_BACKEND is set. Without it no sms deliveries are written or sent
+    """
+    return bool(getattr(settings, 'SMS_BACKEND', None))
+
+
+def get_connection(backend=None, fail_silently=False, **kwargs):
+    backend = backend or getattr(settings, 'SMS_BACKEND', None)
+    if not backend:
+        raise ImproperlyConfigured('SMS_BACKEND is not set')
+    return import_string(backend)(fail_silently=fail_silently, **kwargs)
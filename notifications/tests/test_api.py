@@ -1,11 +1,31 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.shortcuts import reverse
+from django.utils import timezone
 from model_bakery import baker
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from backend import mixins
+from backend.pagination import CountingPaginator
 from users.models import User
 
+from .. import sms
+from ..api.views import NotificationListView
+from ..delivery import (DELIVERY_LEASE, DELIVERY_RETRY_DELAY, MAX_DELIVERY_ATTEMPTS, claim_deliveries, deliver_batch,
+                        drain_deliveries, record_deliveries)
+from ..reminders import send_due_reminders
+from ..models import (Delivery, GameNotification, InboxEntry, LeagueNotification, UnreadCount,
+                      bulk_create_notifications, deliver_existing_notifications, get_unread_count,
+                      refresh_unread_counts)
+
 
 class TestUmpCastNotificationAPI(mixins.TestRetrieveMixin, mixins.TestListMixin,
                                  mixins.TestFilterMixin, mixins.TestSetupMixin, APITestCase):
@@ -96,3 +116,363 @@ class TestNotificationListAPI(mixins.TestSetupMixin, APITestCase):
         list_url = reverse('notification-list', kwargs={'pk': self.user.pk})
         response = self.client.get(list_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_notification_list_cursor(self):
+        game = baker.make('games.Game')
+        app = baker.make('games.Application', post__game=game, user=self.user)
+        date_time = timezone.now()
+        baker.make('notifications.GameNotification', game=game, notification_date_time=date_time, _quantity=3)
+        baker.make('notifications.ApplicationNotification', application=app, notification_date_time=date_time,
+                   _quantity=3)
+        list_url = reverse('notification-list', kwargs={'pk': self.user.pk})
+        expected = [notification['pk'] for notification in self.client.get(list_url, {'page_size': 100}).data['results']]
+        pks, url = [], list_url + '?pagination=cursor&page_size=4'
+        while url is not None:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pks += [notification['pk'] for notification in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(sorted(pks), sorted(expected))
+        self.assertEqual(len(pks), len(set(pks)))
+
+    def test_notification_list_count_strategies(self):
+        cache.clear()
+        baker.make('notifications.UmpCastNotification', _quantity=6)
+        view = NotificationListView(kwargs={'pk': self.user.pk})
+        for strategy in ('exact', 'capped', 'estimate'):
+            paginator = CountingPaginator(view.get_queryset(), 2, count_strategy=strategy, count_cap=10)
+            self.assertEqual((paginator.count, paginator.count_exact), (6, True))
+        paginator = CountingPaginator(view.get_queryset(), 2, count_strategy='capped', count_cap=4)
+        self.assertEqual((paginator.count, paginator.count_exact), (4, False))
+        # pages past a capped count are still served
+        self.assertEqual(len(paginator.page(3).object_list), 2)
+        paginator = CountingPaginator(view.get_queryset(), 2, count_strategy='estimate', count_cap=4)
+        self.assertGreaterEqual(paginator.count, 5)
+        self.assertFalse(paginator.count_exact)
+
+        list_url = reverse('notification-list', kwargs={'pk': self.user.pk})
+        response = self.client.get(list_url)
+        self.assertEqual((response.data['count'], response.data['count_exact']), (6, True))
+        # counts are cached per query for a short time
+        baker.make('notifications.UmpCastNotification')
+        self.assertEqual(self.client.get(list_url).data['count'], 6)
+        cache.clear()
+        self.assertEqual(self.client.get(list_url).data['count'], 7)
+
+    def make_feed(self, size):
+        for _ in range(size):
+            league = baker.make('leagues.League')
+            self.user.leagues.add(league, through_defaults={'request_status': 'accepted'})
+            baker.make('notifications.LeagueNotification', league=league)
+            game = baker.make('games.Game', division__league=league)
+            baker.make('games.Post', game=game)  # posts are created for roles, add one to serialize
+            app = baker.make('games.Application', post__game=game, user=self.user)
+            baker.make('notifications.GameNotification', game=game)
+            baker.make('notifications.ApplicationNotification', application=app)
+
+    def count_feed_queries(self, list_url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(list_url, {'page_size': 100})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response
+
+    def test_notification_list_related_queries(self):
+        list_url = reverse('notification-list', kwargs={'pk': self.user.pk})
+        self.make_feed(2)
+        queries, response = self.count_feed_queries(list_url)
+        self.make_feed(8)
+        self.assertEqual(self.count_feed_queries(list_url)[0], queries)
+        # count, page, then per scope: applications, games with posts and their applications, leagues
+        self.assertEqual(queries, 7)
+        response = self.count_feed_queries(list_url)[1]
+        for notification in response.data['results']:
+            self.assertEqual(notification['related_object']['pk'], notification['related_pk'])
+            if notification['scope'] == 'game':
+                self.assertEqual(len(notification['related_object']['posts']), 2)
+
+
+class TestInbox(mixins.TestSetupMixin, APITestCase):
+
+    def get_inbox(self, user):
+        return set(InboxEntry.objects.filter(user=user).values_list('scope', 'notification', 'related_pk'))
+
+    def get_feed(self, scope, notifications, related):
+        return {(scope, notification.pk, getattr(notification, related + '_id')) for notification in notifications}
+
+    def test_fan_out_on_write(self):
+        league = baker.make('leagues.League')
+        self.user.leagues.add(league, through_defaults={'request_status': 'accepted'})
+        other = baker.make('users.User')
+        umpcast = baker.make('notifications.UmpCastNotification')
+        baker.make('notifications.LeagueNotification', league=league)
+        bulk_create_notifications(LeagueNotification, [LeagueNotification(league=league) for _ in range(2)])
+        app = baker.make('games.Application', user=self.user)
+        baker.make('notifications.GameNotification', game=app.post.game)
+        baker.make('notifications.ApplicationNotification', application=app)
+        baker.make('notifications.LeagueNotification')
+        baker.make('notifications.ApplicationNotification')
+        expected = {('ump-cast', umpcast.pk, umpcast.pk)}
+        expected |= self.get_feed('league', league.leaguenotification_set.all(), 'league')
+        expected |= self.get_feed('game', app.post.game.gamenotification_set.all(), 'game')
+        expected |= self.get_feed('application', app.applicationnotification_set.all(), 'application')
+        self.assertEqual(len(expected), 1 + 3 + 2 + 2)
+        self.assertEqual(self.get_inbox(self.user), expected)
+        self.assertEqual(self.get_inbox(other), {('ump-cast', umpcast.pk, umpcast.pk)})
+
+    def test_notification_text_length(self):
+        league = baker.make('leagues.League')
+        with self.assertRaises(ValidationError):
+            bulk_create_notifications(LeagueNotification, [
+                LeagueNotification(league=league, message='message'),
+                LeagueNotification(league=league, message='m' * 257)
+            ])
+        with self.assertRaises(ValidationError):
+            LeagueNotification.objects.create(league=league, subject='s' * 65, message='message')
+        self.assertFalse(LeagueNotification.objects.filter(league=league).exists())
+        # generated text is shortened with an ellipsis
+        game = baker.make('games.Game', title='t' * 128)
+        reminder = GameNotification.objects.get(game=game)
+        self.assertEqual((len(reminder.subject), reminder.subject[-1]), (64, '…'))
+
+    def test_late_recipients(self):
+        league = baker.make('leagues.League')
+        baker.make('notifications.LeagueNotification', league=league)
+        game = baker.make('games.Game', division__league=league)
+        baker.make('notifications.GameNotification', game=game)
+        self.user.leagues.add(league, through_defaults={'request_status': 'accepted'})
+        app = baker.make('games.Application', post__game=game, user=self.user)
+        late = self.get_feed('league', league.leaguenotification_set.all(), 'league')
+        late |= self.get_feed('game', game.gamenotification_set.all(), 'game')
+        self.assertEqual(len(late), 1 + 2)
+        self.assertEqual({entry for entry in self.get_inbox(self.user) if entry[0] != 'application'}, late)
+        app.delete()
+        self.user.leagues.remove(league)
+        self.assertEqual(self.get_inbox(self.user), set())
+
+    def test_backfill_inbox(self):
+        league = baker.make('leagues.League')
+        self.user.leagues.add(league, through_defaults={'request_status': 'accepted'})
+        baker.make('notifications.UmpCastNotification', _quantity=2)
+        baker.make('notifications.LeagueNotification', league=league, _quantity=2)
+        app = baker.make('games.Application', user=self.user)
+        baker.make('games.Application', post__game=app.post.game, user=self.user)
+        baker.make('notifications.GameNotification', game=app.post.game, _quantity=2)
+        baker.make('notifications.ApplicationNotification', application=app, _quantity=2)
+        expected = set(InboxEntry.objects.values_list('user', 'notification', 'scope', 'related_pk'))
+        self.assertGreaterEqual(len(self.get_inbox(self.user)), 8)
+        call_command('backfill_inbox', '--clear', '--batch-size', '3', stdout=StringIO())
+        self.assertEqual(set(InboxEntry.objects.values_list('user', 'notification', 'scope', 'related_pk')), expected)
+
+    def assertUnreadCount(self, user, count):
+        self.assertEqual(get_unread_count(user.pk), count)
+        self.assertEqual(InboxEntry.objects.filter(user=user, is_read=False).count(), count)
+
+    def test_unread_counts(self):
+        league = baker.make('leagues.League')
+        baker.make('notifications.LeagueNotification', league=league, _quantity=2)
+        self.user.leagues.add(league, through_defaults={'request_status': 'accepted'})
+        self.assertUnreadCount(self.user, 2)
+        notification = baker.make('notifications.LeagueNotification', league=league)
+        bulk_create_notifications(LeagueNotification, [LeagueNotification(league=league) for _ in range(2)])
+        self.assertUnreadCount(self.user, 5)
+        notification.delete()
+        self.assertUnreadCount(self.user, 4)
+        InboxEntry.objects.filter(user=self.user).update(is_read=True)
+        UnreadCount.objects.all().delete()
+        baker.make('notifications.UmpCastNotification')
+        self.assertUnreadCount(self.user, 1)
+        self.user.leagues.remove(league)
+        self.assertUnreadCount(self.user, 1)
+
+    def test_unread_counts_late_delivery(self):
+        league = baker.make('leagues.League')
+        notifications = baker.make('notifications.LeagueNotification', league=league, _quantity=2)
+        self.user.leagues.add(league, through_defaults={'request_status': 'accepted'})
+        self.assertUnreadCount(self.user, 2)
+        # entries already delivered are not counted again
+        inserted = deliver_existing_notifications(LeagueNotification.objects.filter(league=league), [self.user.pk])
+        self.assertEqual(inserted, {})
+        InboxEntry.objects.filter(notification=notifications[0]).delete()
+        self.assertEqual(deliver_existing_notifications(LeagueNotification.objects.filter(league=league),
+                                                        [self.user.pk]), {self.user.pk: 1})
+        self.assertEqual(get_unread_count(self.user.pk), 3)
+        refresh_unread_counts([self.user.pk])
+        self.assertUnreadCount(self.user, 2)
+
+    def test_mark_read(self):
+        baker.make('notifications.UmpCastNotification', notification_date_time=timezone.now() - timedelta(days=2))
+        older = baker.make('notifications.UmpCastNotification', notification_date_time=timezone.now() - timedelta(days=1))
+        newest = baker.make('notifications.UmpCastNotification')
+        read_url = reverse('notification-read', kwargs={'pk': self.user.pk})
+        count_url = reverse('notification-unread-count', kwargs={'pk': self.user.pk})
+        self.assertEqual(self.client.get(count_url).data, {'unread': 3})
+        self.assertEqual(self.client.post(read_url, {}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(read_url, {'notifications': [newest.pk]}, format='json')
+        self.assertEqual(response.data, {'marked': 1, 'unread': 2})
+        response = self.client.post(read_url, {'before': older.notification_date_time}, format='json')
+        self.assertEqual(response.data, {'marked': 2, 'unread': 0})
+        response = self.client.post(read_url, {'before': timezone.now()}, format='json')
+        self.assertEqual(response.data, {'marked': 0, 'unread': 0})
+        list_url = reverse('notification-list', kwargs={'pk': self.user.pk})
+        self.assertTrue(all(notification['is_read'] for notification in self.client.get(list_url).data['results']))
+
+        other = baker.make('users.User')
+        self.assertEqual(get_unread_count(other.pk), 3)
+
+    def test_unread_count_queries(self):
+        baker.make('notifications.UmpCastNotification', _quantity=3)
+        count_url = reverse('notification-unread-count', kwargs={'pk': self.user.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(count_url)
+        self.assertEqual(response.data, {'unread': 3})
+        self.assertFalse([query for query in queries if 'notifications_' in query['sql'].replace(
+            'notifications_unreadcount', '')])
+
+
+class FailingSMSBackend(sms.BaseBackend):
+    def send_messages(self, messages):
+        raise ConnectionError('sms gateway unavailable')
+
+
+@override_settings(SMS_BACKEND='notifications.sms.LocmemBackend')
+class TestDelivery(mixins.TestSetupMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        sms.outbox.clear()
+        self.league = baker.make('leagues.League')
+
+    def make_member(self, **kwargs):
+        user = baker.make('users.User', **dict({'phone_number': '5555555555'}, **kwargs))
+        user.leagues.add(self.league, through_defaults={'request_status': 'accepted'})
+        return user
+
+    def get_deliveries(self, **kwargs):
+        return set(Delivery.objects.filter(**kwargs).values_list('user', 'channel'))
+
+    def test_deliver_notifications(self):
+        member = self.make_member()
+        no_email = self.make_member(email_notifications=False)
+        no_league = self.make_member(league_notifications=False)
+        no_phone = self.make_member(phone_number='')
+        notification = baker.make('notifications.LeagueNotification', league=self.league, subject='Subject',
+                                  message='Message')
+        self.assertEqual(self.get_deliveries(notification=notification), {
+            (member.pk, 'email'), (member.pk, 'sms'), (no_email.pk, 'sms'), (no_phone.pk, 'email')})
+        # reminders are not sent when they are created, game updates are
+        game = baker.make('games.Game', division__league=self.league)
+        baker.make('games.Application', post__game=game, user=member)
+        self.assertFalse(Delivery.objects.filter(notification__gamenotification__game=game).exists())
+        game.title = 'Renamed'
+        game.save(update_fields=['title'])
+        self.assertEqual(self.get_deliveries(notification__gamenotification__game=game),
+                         {(member.pk, 'email'), (member.pk, 'sms')})
+
+        Delivery.objects.exclude(notification__in=[notification]).delete()
+        mail.outbox = []
+        self.assertEqual(drain_deliveries(batch_size=3), {'sent': 4})
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), sorted([member.email, no_phone.email]))
+        self.assertEqual(mail.outbox[0].subject, 'Subject')
+        self.assertEqual([message.body for message in sms.outbox], ['Subject: Message'] * 2)
+        self.assertFalse(Delivery.objects.exclude(status=Delivery.SENT).exists())
+        self.assertEqual(drain_deliveries(), {})
+
+    def test_deliver_opted_out(self):
+        member = self.make_member()
+        baker.make('notifications.LeagueNotification', league=self.league)
+        User.objects.filter(pk=member.pk).update(phone_notifications=False)
+        mail.outbox = []
+        self.assertEqual(deliver_batch(), {'sent': 1, 'skipped': 1})
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(sms.outbox, [])
+
+    def test_deliver_without_sms_backend(self):
+        member = self.make_member()
+        with override_settings(SMS_BACKEND=''):
+            baker.make('notifications.LeagueNotification', league=self.league)
+            self.assertEqual(self.get_deliveries(), {(member.pk, 'email')})
+        # written while a backend was configured
+        baker.make('notifications.LeagueNotification', league=self.league)
+        mail.outbox = []
+        with override_settings(SMS_BACKEND=''):
+            self.assertEqual(drain_deliveries(), {'sent': 2, 'skipped': 1})
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(sms.outbox, [])
+
+    def test_deliver_lease(self):
+        member = self.make_member()
+        baker.make('notifications.LeagueNotification', league=self.league)
+        User.objects.filter(pk=member.pk).update(phone_notifications=False)
+        now = timezone.now()
+        deliveries, lease, skipped = claim_deliveries(now=now)
+        self.assertEqual(([delivery.user_id for delivery in deliveries], lease, skipped),
+                         ([member.pk], now + DELIVERY_LEASE, 1))
+        self.assertEqual(Delivery.objects.get(user=member, channel='email').status, Delivery.SENDING)
+        # leased to the first worker, then taken again when the lease runs out
+        self.assertEqual(deliver_batch(now=now), {})
+        mail.outbox = []
+        self.assertEqual(deliver_batch(now=lease), {'sent': 1})
+        self.assertEqual(len(mail.outbox), 1)
+        # the first worker lost its lease and records nothing
+        self.assertEqual(record_deliveries(deliveries, lease, {deliveries[0].pk: 'timed out'}), {})
+        delivery = Delivery.objects.get(user=member, channel='email')
+        self.assertEqual((delivery.status, delivery.attempts, delivery.last_error), (Delivery.SENT, 2, ''))
+
+    @override_settings(SMS_BACKEND='notifications.tests.test_api.FailingSMSBackend')
+    def test_deliver_retry(self):
+        member = self.make_member(email_notifications=False)
+        baker.make('notifications.LeagueNotification', league=self.league)
+        now = timezone.now()
+        self.assertEqual(deliver_batch(now=now), {'retried': 1})
+        delivery = Delivery.objects.get(user=member)
+        self.assertEqual((delivery.status, delivery.attempts), (Delivery.PENDING, 1))
+        self.assertIn('sms gateway unavailable', delivery.last_error)
+        self.assertEqual(delivery.next_attempt_at, now + timedelta(seconds=DELIVERY_RETRY_DELAY))
+        # not due before the backoff
+        self.assertEqual(deliver_batch(now=now), {})
+        for attempt in range(2, MAX_DELIVERY_ATTEMPTS):
+            now = Delivery.objects.get(pk=delivery.pk).next_attempt_at
+            self.assertEqual(deliver_batch(now=now), {'retried': 1})
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.next_attempt_at - now, timedelta(seconds=DELIVERY_RETRY_DELAY * 2 ** (attempt - 1)))
+        self.assertEqual(deliver_batch(now=delivery.next_attempt_at), {'failed': 1})
+        delivery.refresh_from_db()
+        self.assertEqual((delivery.status, delivery.attempts), (Delivery.FAILED, MAX_DELIVERY_ATTEMPTS))
+
+
+class TestReminders(mixins.TestSetupMixin, APITestCase):
+
+    def make_game(self, days):
+        game = baker.make('games.Game', date_time=timezone.now() + timedelta(days=days), is_active=True)
+        baker.make('games.Application', post__game=game, user=self.user)
+        return game, GameNotification.objects.get(game=game, was_reminded=False)
+
+    def test_send_due_reminders(self):
+        GameNotification.objects.filter(was_reminded=False).update(was_reminded=True)
+        game, reminder = self.make_game(3)
+        cancelled, cancelled_reminder = self.make_game(3)
+        cancelled.is_active = False
+        cancelled.save(update_fields=['is_active'])
+        moved, moved_reminder = self.make_game(3)
+        moved.date_time += timedelta(days=2)
+        moved.save(update_fields=['date_time'])
+        self.assertEqual(reminder.reminder_date_time, game.date_time - timedelta(days=1))
+
+        self.assertEqual(send_due_reminders(now=timezone.now()), {})
+        now = game.date_time - timedelta(hours=12)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(send_due_reminders(batch_size=1, now=now), {'reminded': 1, 'skipped': 1})
+        claim = next(query['sql'] for query in queries if 'FOR UPDATE' in query['sql'])
+        self.assertIn('FOR UPDATE OF "notifications_gamenotification" SKIP LOCKED', claim)
+        reminder.refresh_from_db()
+        self.assertEqual((reminder.was_reminded, reminder.reminder_date_time), (True, None))
+        self.assertEqual(set(Delivery.objects.filter(notification=reminder).values_list('user', 'channel')),
+                         {(self.user.pk, 'email')})
+        self.assertFalse(Delivery.objects.filter(notification=cancelled_reminder).exists())
+        self.assertTrue(GameNotification.objects.get(pk=cancelled_reminder.pk).was_reminded)
+        # the reminder of the moved game follows the game
+        self.assertFalse(GameNotification.objects.get(pk=moved_reminder.pk).was_reminded)
+        self.assertEqual(send_due_reminders(now=moved.date_time - timedelta(hours=12)), {'reminded': 1})
+        self.assertEqual(send_due_reminders(now=moved.date_time), {})
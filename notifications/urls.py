@@ -1,6 +1,8 @@
 from django.urls import path
-from .api.views import NotificationListView
+from .api.views import NotificationListView, NotificationReadView, NotificationUnreadCountView
 
 urlpatterns = [
-    path('<int:pk>/', NotificationListView.as_view(), name='notification-list')
+    path('<int:pk>/', NotificationListView.as_view(), name='notification-list'),
+    path('<int:pk>/unread-count/', NotificationUnreadCountView.as_view(), name='notification-unread-count'),
+    path('<int:pk>/read/', NotificationReadView.as_view(), name='notification-read'),
 ]
@@ -1,5 +1,5 @@
 from rest_framework import permissions
-from leagues.models import League
+from backend.membership import get_membership
 
 
 class TeamSnapNoteFilterPermission(permissions.BasePermission):
@@ -7,9 +7,9 @@ class TeamSnapNoteFilterPermission(permissions.BasePermission):
         league = request.query_params.get('league', None)
         if league is None:
             return False
-        return League.objects.get(pk=league) in request.user.leagues.accepted()
+        return get_membership(request).is_accepted(league)
 
 
 class InLeague(permissions.BasePermission):
     def has_permission(self, request, view):
-        return League.objects.get(pk=view.kwargs['pk']) in request.user.leagues.accepted()
+        return get_membership(request).is_accepted(view.kwargs['pk'])
@@ -1,6 +1,7 @@
 from ..models import User, UserLeagueStatus
 from rest_framework import permissions
-from leagues.models import League
+from backend.membership import get_membership
+from backend.permissions import get_view_object
 
 
 class IsUserOwner(permissions.BasePermission):
@@ -11,8 +12,7 @@ class IsUserOwner(permissions.BasePermission):
     def has_permission(self, request, view):
         if view.kwargs['pk'] == 'me':
             return True
-        user = User.objects.get(pk=view.kwargs['pk'])
-        return user == request.user
+        return view.kwargs['pk'] == str(request.user.pk)
 
 
 class IsLeagueMember(permissions.BasePermission):
@@ -23,9 +23,7 @@ class IsLeagueMember(permissions.BasePermission):
 
     def has_permission(self, request, view):
         league_pk = request.query_params.get('league', None)
-        if league_pk is not None and request.user.leagues.accepted().filter(pk=league_pk).exists():
-            return True
-        return False
+        return get_membership(request).is_accepted(league_pk)
 
 
 class IsUserLeagueStatusOwner(permissions.BasePermission):
@@ -34,7 +32,7 @@ class IsUserLeagueStatusOwner(permissions.BasePermission):
     """
 
     def has_permission(self, request, view):
-        return UserLeagueStatus.objects.filter(pk=view.kwargs['pk'], user=request.user).exists()
+        return get_view_object(view, UserLeagueStatus).user_id == request.user.pk
 
 
 class IsUserLeagueStatusManager(permissions.BasePermission):
@@ -45,7 +43,7 @@ class IsUserLeagueStatusManager(permissions.BasePermission):
     def has_permission(self, request, view):
         if not request.user.is_manager():
             return False
-        if UserLeagueStatus.objects.get(pk=view.kwargs['pk']).league not in request.user.leagues.accepted():
+        if not get_membership(request).is_accepted(get_view_object(view, UserLeagueStatus).league_id):
             return False
         return True
 
@@ -76,10 +74,10 @@ class UserLeagueStatusFilterPermission(permissions.BasePermission):
                 if User.objects.get(pk=user_pk) == request.user:
                     return True
                 else:
-                    return League.objects.get(pk=league_pk) in request.user.leagues.accepted()
+                    return get_membership(request).is_accepted(league_pk)
             if user_pk is None and league_pk is None:  # no unrestricted access
                 return False
             if user_pk is None and league_pk is not None:  # manager retrieving all ULS in league
-                return League.objects.get(pk=league_pk) in request.user.leagues.accepted()
+                return get_membership(request).is_accepted(league_pk)
 
         return False
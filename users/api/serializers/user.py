@@ -5,7 +5,7 @@ from rest_framework import serializers
 from rest_framework.serializers import ValidationError
 from leagues.api.serializers.league import LeaguePublicSerializer, LeaguePrivateSerializer
 
-from users.models import User
+from users.models import User, UserLeagueStatus
 
 
 class UserProfilePrivateBaseSerializer(serializers.ModelSerializer):
@@ -44,17 +44,26 @@ class UserProfilePrivateBaseSerializer(serializers.ModelSerializer):
                 'phone numbers can only contain numeric values')
         return phone_number
 
+    def get_leagues(self, instance):
+        """
+        The user's leagues grouped by request status, from one UserLeagueStatus query.
+        LeaguePrivateSerializer reads the trees of the accepted leagues from the structure cache
+        """
+        if getattr(self, '_leagues', (None, ))[0] != instance.pk:
+            leagues = {'accepted': [], 'pending': [], 'rejected': []}
+            for status in UserLeagueStatus.objects.filter(user=instance).select_related('league').order_by('-league_id'):
+                leagues[status.request_status].append(status.league)
+            self._leagues = (instance.pk, leagues)
+        return self._leagues[1]
+
     def get_accepted_leagues(self, instance):
-        accepted_leagues = instance.leagues.accepted()
-        return LeaguePrivateSerializer(accepted_leagues, many=True).data
+        return LeaguePrivateSerializer(self.get_leagues(instance)['accepted'], many=True).data
 
     def get_pending_leagues(self, instance):
-        pending_leagues = instance.leagues.pending()
-        return LeaguePublicSerializer(pending_leagues, many=True).data
+        return LeaguePublicSerializer(self.get_leagues(instance)['pending'], many=True).data
 
     def get_rejected_leagues(self, instance):
-        rejected_leagues = instance.leagues.rejected()
-        return LeaguePublicSerializer(rejected_leagues, many=True).data
+        return LeaguePublicSerializer(self.get_leagues(instance)['rejected'], many=True).data
 
 
 class UserProfilePublicSerializer(serializers.ModelSerializer):
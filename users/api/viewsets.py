@@ -1,4 +1,4 @@
-from ..models import User, UserLeagueStatus
+from ..models import User, UserLeagueStatus, apply_level_to_statuses
 
 from .serializers.user import (
     UserProfilePublicSerializer, UserProfilePrivateCreateSerializer,
@@ -22,11 +22,17 @@ from rest_framework import viewsets, mixins, permissions, status
 from drf_multiple_serializer import ActionBaseSerializerMixin
 from backend.permissions import (
     ActionBasedPermission,
+    IsManager,
     IsSuperUser
 )
 from rest_framework.decorators import action
 from leagues.models import Level
 from rest_framework.response import Response
+from backend.membership import get_membership
+from backend.mixins import SharedObjectMixin
+from backend.pagination import KeysetPagination
+from games.api.serializers.post import OpenPostSerializer
+from games.eligibility import get_open_posts
 
 
 class UserViewSet(ActionBaseSerializerMixin, mixins.CreateModelMixin, mixins.RetrieveModelMixin,
@@ -56,6 +62,15 @@ class UserViewSet(ActionBaseSerializerMixin, mixins.CreateModelMixin, mixins.Ret
     list: List User \n
     * Permissions: IsUserOwner (if using user query param)
     * Query Params: Leagues, Account_type
+
+    open_posts: List Posts the User can Apply to \n
+    * Permissions: IsUserOwner
+    * Query Params: Cursor, Page_size
+    * Extra Notes:
+        * Get current user's feed using pk='me', /users/me/open-posts/
+        * Unfilled posts of upcoming active games within the league advanced scheduling limit, visible to the user
+          and in games the user has not applied to
+        * Ordered by game date_time, paginated by cursor. Follow "next" for the following page
     """
 
     queryset = User.objects.all()
@@ -73,7 +88,7 @@ class UserViewSet(ActionBaseSerializerMixin, mixins.CreateModelMixin, mixins.Ret
     action_permissions = {
         permissions.AllowAny: ['create'],
         permissions.IsAuthenticated & IsLeagueMember: ['list'],
-        permissions.IsAuthenticated & IsUserOwner: ['update', 'partial_update', 'retrieve'],
+        permissions.IsAuthenticated & IsUserOwner: ['update', 'partial_update', 'retrieve', 'open_posts'],
     }
 
     def get_object(self):  # custom get object for /me endpoint
@@ -82,8 +97,13 @@ class UserViewSet(ActionBaseSerializerMixin, mixins.CreateModelMixin, mixins.Ret
             return self.request.user
         return super().get_object()
 
+    @action(detail=True, methods=['get'], url_path='open-posts', pagination_class=KeysetPagination)
+    def open_posts(self, request, pk):
+        page = self.paginate_queryset(get_open_posts(self.get_object()))
+        return self.get_paginated_response(OpenPostSerializer(page, many=True).data)
 
-class UserLeagueStatusViewSet(ActionBaseSerializerMixin, viewsets.ModelViewSet):
+
+class UserLeagueStatusViewSet(ActionBaseSerializerMixin, SharedObjectMixin, viewsets.ModelViewSet):
     """
     Provide CRUD, List, List-Filter functionality for UserLeagueStatus
 
@@ -118,6 +138,16 @@ class UserLeagueStatusViewSet(ActionBaseSerializerMixin, viewsets.ModelViewSet):
     * Permissions: Owner of Applied Level
     * Extra Notes:
         * Ignore below. The only required post field is "level", the pk of the level object
+
+    bulk_apply_level: Apply a Level to many UserLeagueStatus \n
+    * Permissions: IsManager
+    * Extra Validations:
+        * Must be a manager of the level's league
+        * Every UserLeagueStatus must belong to the level's league
+    * Extra Notes:
+        * Ignore below. Post fields are "level", the pk of the level object, and either "user_league_statuses",
+          a list of UserLeagueStatus pks, or "all_members": true for every accepted member of the level's league
+        * Visibilities are replaced in one transaction, with one delete and one bulk insert
     """
     queryset = UserLeagueStatus.objects.all()
     filterset_class = UserLeagueStatusFilter
@@ -135,20 +165,49 @@ class UserLeagueStatusViewSet(ActionBaseSerializerMixin, viewsets.ModelViewSet):
         UserLeagueStatusFilterPermission: ['list'],
         IsUserLeagueStatusOwner | IsUserLeagueStatusManager: ['retrieve', 'destroy'],
         IsUserLeagueStatusManager: ['apply_level', 'update', 'partial_update'],
+        IsManager: ['bulk_apply_level'],  # league validated on view level
     }
 
     @action(detail=True, methods=['post'])
     def apply_level(self, request, pk):
         uls = self.get_object()
-        uls.visibilities.clear()
         level_pk = request.data.get('level', None)
         if level_pk is None:
             return Response({"error": "missing parameters"}, status=status.HTTP_400_BAD_REQUEST)
-        if not Level.objects.filter(pk=level_pk).exists():
+        level_obj = Level.objects.filter(pk=level_pk).first()
+        if level_obj is None:
             return Response({"level": ["invalid level pk"]}, status=status.HTTP_400_BAD_REQUEST)
-        level_obj = Level.objects.get(pk=level_pk)
-        if level_obj.league != uls.league:  # permissions inherently checks if manager owns level
+        if level_obj.league_id != uls.league_id:  # permissions inherently checks if manager owns level
             return Response({"level": ["level from one league cannot be applied to uls of another league"]}, status=status.HTTP_400_BAD_REQUEST)
-        for role in level_obj.visibilities.all():
-            uls.visibilities.add(role)
+        apply_level_to_statuses(level_obj, [uls])
         return Response(status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'])
+    def bulk_apply_level(self, request):
+        level_pk = request.data.get('level', None)
+        if hasattr(request.data, 'getlist'):
+            uls_pks = request.data.getlist('user_league_statuses')
+        else:
+            uls_pks = request.data.get('user_league_statuses', [])
+        all_members = str(request.data.get('all_members', False)).lower() == 'true'
+        if level_pk is None or not (uls_pks or all_members):
+            return Response({"error": "missing parameters"}, status=status.HTTP_400_BAD_REQUEST)
+        level_obj = Level.objects.filter(pk=level_pk).first()
+        if level_obj is None:
+            return Response({"level": ["invalid level pk"]}, status=status.HTTP_400_BAD_REQUEST)
+        if not (request.user.is_superuser or get_membership(request).is_accepted(level_obj.league_id)):
+            return Response({"level": ["can only apply levels of a league you manage"]}, status=status.HTTP_400_BAD_REQUEST)
+
+        statuses = UserLeagueStatus.objects.filter(league=level_obj.league_id)
+        if all_members:
+            statuses = list(statuses.filter(request_status='accepted'))
+        else:
+            try:
+                uls_pks = {int(uls_pk) for uls_pk in uls_pks}
+            except (TypeError, ValueError):
+                return Response({"user_league_statuses": ["must be a list of pks"]}, status=status.HTTP_400_BAD_REQUEST)
+            statuses = list(statuses.filter(pk__in=uls_pks))
+            if len(statuses) != len(uls_pks):
+                return Response({"user_league_statuses": ["every user league status must be in the level's league"]}, status=status.HTTP_400_BAD_REQUEST)
+        apply_level_to_statuses(level_obj, statuses)
+        return Response({"applied": len(statuses)}, status=status.HTTP_200_OK)
@@ -0,0 +1,45 @@
+# Generated by Django 3.0.7 on 2026-10-18 11:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_visibility_index(apps, schema_editor):
+    UserLeagueStatus = apps.get_model('users', 'UserLeagueStatus')
+    UserRoleVisibility = apps.get_model('users', 'UserRoleVisibility')
+    through = UserLeagueStatus.visibilities.through.objects.filter(
+        userleaguestatus__request_status='accepted'
+    ).values_list('userleaguestatus__user', 'userleaguestatus__league', 'role')
+    UserRoleVisibility.objects.bulk_create([
+        UserRoleVisibility(user_id=user, league_id=league, role_id=role) for user, league, role in through
+    ], batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leagues', '0015_auto_20201010_0518'),
+        ('users', '0006_auto_20200822_0017'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserRoleVisibility',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('league', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='leagues.League')),
+                ('role', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='leagues.Role')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='userrolevisibility',
+            index=models.Index(fields=['user', 'league'], name='users_userr_user_id_91b9d0_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='userrolevisibility',
+            unique_together={('user', 'role')},
+        ),
+        migrations.RunPython(build_visibility_index, migrations.RunPython.noop),
+    ]
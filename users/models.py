@@ -1,7 +1,9 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils.timezone import now
 from leagues.models import League, Role
+from backend.membership import invalidate_memberships
 
 
 class UserModelManager(BaseUserManager):
@@ -55,6 +57,9 @@ class User(AbstractBaseUser, PermissionsMixin):
     account_type = models.CharField(
         max_length=10, choices=ACCOUNT_TYPE_CHOICES, default='inactive')
 
+    # bumped when the user's league statuses or visibilities change, cached memberships of older versions are stale
+    membership_version = models.PositiveIntegerField(default=0)
+
     objects = UserModelManager()
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name']
@@ -101,3 +106,120 @@ class UserLeagueStatus(models.Model):
 
     class Meta:
         ordering = ['-pk']
+
+
+class UserRoleVisibility(models.Model):
+    """
+    Precomputed index of the roles a user can see in the leagues they are accepted in.
+    Maintained from UserLeagueStatus visibilities, read by the open posts feed
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    league = models.ForeignKey(League, on_delete=models.CASCADE)
+    role = models.ForeignKey(Role, on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ('user', 'role')
+        indexes = [models.Index(fields=['user', 'league'])]
+
+
+def sync_visibility_index(statuses):
+    """
+    Replace the indexed roles of every (user, league) pair of the given UserLeagueStatus objects
+    with their current visibilities. Only accepted statuses keep visibility
+    """
+    statuses = list(statuses)
+    if not statuses:
+        return
+    pairs = models.Q()
+    for uls in statuses:
+        pairs |= models.Q(user=uls.user_id, league=uls.league_id)
+    UserRoleVisibility.objects.filter(pairs).delete()
+
+    accepted = [uls.pk for uls in statuses if uls.request_status == 'accepted']
+    through = UserLeagueStatus.visibilities.through.objects.filter(userleaguestatus__in=accepted).values_list(
+        'userleaguestatus__user', 'userleaguestatus__league', 'role')
+    UserRoleVisibility.objects.bulk_create([
+        UserRoleVisibility(user_id=user, league_id=league, role_id=role) for user, league, role in through
+    ], batch_size=500, ignore_conflicts=True)
+
+
+def visibility_index_receiver(sender, instance, *args, **kwargs):
+    sync_visibility_index([instance])
+
+
+def visibility_index_m2m_receiver(sender, instance, action, reverse, pk_set, *args, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if not reverse:
+        if action != 'pre_clear':
+            sync_visibility_index([instance])
+    elif action == 'pre_clear':  # statuses of a cleared role are unknown after the clear
+        instance._cleared_statuses = list(instance.userleaguestatus_set.all())
+    elif action == 'post_clear':
+        sync_visibility_index(getattr(instance, '_cleared_statuses', []))
+    else:
+        sync_visibility_index(UserLeagueStatus.objects.filter(pk__in=pk_set))
+
+
+post_save.connect(visibility_index_receiver, sender=UserLeagueStatus)
+post_delete.connect(visibility_index_receiver, sender=UserLeagueStatus)
+m2m_changed.connect(visibility_index_m2m_receiver, sender=UserLeagueStatus.visibilities.through)
+
+
+def membership_receiver(sender, instance, *args, **kwargs):
+    invalidate_memberships([instance.user_id])
+
+
+def membership_leagues_receiver(sender, instance, action, reverse, pk_set, *args, **kwargs):
+    # User.leagues writes UserLeagueStatus rows without saving them
+    if action == 'pre_clear' and reverse:
+        instance._cleared_users = list(instance.user_set.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_memberships([instance.pk])
+    elif action == 'post_clear':
+        invalidate_memberships(getattr(instance, '_cleared_users', []))
+    else:
+        invalidate_memberships(pk_set)
+
+
+def membership_visibilities_receiver(sender, instance, action, reverse, pk_set, *args, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_memberships([instance.user_id])
+    elif action == 'post_clear':  # collected by the visibility index on pre_clear
+        invalidate_memberships([uls.user_id for uls in getattr(instance, '_cleared_statuses', [])])
+    else:
+        invalidate_memberships(UserLeagueStatus.objects.filter(pk__in=pk_set).values_list('user', flat=True))
+
+
+def membership_role_receiver(sender, instance, *args, **kwargs):
+    # cascaded visibility rows are deleted without m2m_changed
+    invalidate_memberships(UserLeagueStatus.objects.filter(visibilities=instance).values_list('user', flat=True))
+
+
+post_save.connect(membership_receiver, sender=UserLeagueStatus)
+post_delete.connect(membership_receiver, sender=UserLeagueStatus)
+m2m_changed.connect(membership_leagues_receiver, sender=User.leagues.through)
+m2m_changed.connect(membership_visibilities_receiver, sender=UserLeagueStatus.visibilities.through)
+pre_delete.connect(membership_role_receiver, sender=Role)
+
+
+def apply_level_to_statuses(level, statuses):
+    """
+    Replace the visibilities of every given UserLeagueStatus with the roles of the level, with one delete and one
+    bulk insert into the visibilities through table. The through table sends no m2m_changed for these writes,
+    so the visibility index and cached memberships are refreshed here
+    """
+    statuses = list(statuses)
+    through = UserLeagueStatus.visibilities.through
+    roles = list(level.visibilities.values_list('pk', flat=True))
+    with transaction.atomic():
+        through.objects.filter(userleaguestatus__in=[uls.pk for uls in statuses]).delete()
+        through.objects.bulk_create([
+            through(userleaguestatus_id=uls.pk, role_id=role) for uls in statuses for role in roles
+        ], batch_size=1000)
+        sync_visibility_index(statuses)
+        invalidate_memberships([uls.user_id for uls in statuses])
@@ -1,12 +1,21 @@
+from datetime import timedelta
+
+from django.core.cache import cache
 from django.urls import reverse
+from django.utils import timezone
 from model_bakery import baker
-from rest_framework import status
+from rest_framework import permissions, status
 from rest_framework.test import APITestCase
 
 from backend import mixins
+from backend.membership import Membership, get_membership_cache_key, get_membership_stats, reset_membership_stats
+from backend.permissions import check_action_permissions, get_action_permission_table
+from backend.router import router
+from games.models import Application, Post
 from leagues.models import League
 
-from ..models import User
+from ..api.viewsets import UserLeagueStatusViewSet, UserViewSet
+from ..models import User, UserLeagueStatus, UserRoleVisibility
 
 
 class TestUserAPI(mixins.TestCreateMixin, mixins.TestRetrieveMixin, mixins.TestUpdateMixin,
@@ -66,6 +75,39 @@ class TestUserAPI(mixins.TestCreateMixin, mixins.TestRetrieveMixin, mixins.TestU
         response = self.client.get(retrieve_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def add_league(self, request_status, divisions=2):
+        league = baker.make('leagues.League')
+        for _ in range(divisions):
+            division = baker.make('leagues.Division', league=league)
+            roles = baker.make('leagues.Role', division=division, _quantity=2)
+            baker.make('leagues.Level', league=league, visibilities=roles)
+        self.user.leagues.add(league, through_defaults={'request_status': request_status})
+        return league
+
+    def test_me_endpoint_query_count(self):
+        self.user.is_superuser = False
+        self.user.save()
+        retrieve_url = reverse('user-detail', kwargs={'pk': 'me'})
+        accepted = self.add_league('accepted', divisions=1)
+        pending = self.add_league('pending')
+        self.client.get(retrieve_url)  # warm the membership and structure caches
+        with self.assertNumQueries(1):  # statuses with leagues, league trees are read from the structure cache
+            response = self.client.get(retrieve_url)
+        leagues = [self.add_league('accepted', divisions=3) for _ in range(3)] + [self.add_league('rejected')]
+        cache.clear()
+        # statuses with leagues, then divisions, roles, levels and level visibilities of every league together
+        with self.assertNumQueries(5):
+            response = self.client.get(retrieve_url)
+        with self.assertNumQueries(1):
+            response = self.client.get(retrieve_url)
+        self.assertEqual([league['pk'] for league in response.data['accepted_leagues']],
+                         [league.pk for league in reversed(leagues[:3])] + [accepted.pk])
+        self.assertEqual([league['pk'] for league in response.data['pending_leagues']], [pending.pk])
+        self.assertEqual([league['pk'] for league in response.data['rejected_leagues']], [leagues[3].pk])
+        self.assertEqual(len(response.data['accepted_leagues'][0]['divisions']), 3)
+        self.assertEqual(len(response.data['accepted_leagues'][0]['divisions'][0]['roles']), 2)
+        self.assertEqual(len(response.data['accepted_leagues'][0]['levels'][0]['visibilities']), 2)
+
 
 class TestUserLeagueStatusAPI(mixins.TestModelMixin, APITestCase):
     """
@@ -103,3 +145,170 @@ class TestUserLeagueStatusAPI(mixins.TestModelMixin, APITestCase):
         url = reverse('user-league-status-apply-level', kwargs={'pk': uls.pk})
         response = self.client.post(url, data={"level": level.pk})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_bulk_apply_level(self):
+        self.user.is_superuser = False
+        self.user.account_type = 'manager'
+        self.user.save()
+        league = baker.make('leagues.League')
+        self.user.leagues.add(league, through_defaults={'request_status': 'accepted'})
+        roles = baker.make('leagues.Role', division__league=league, _quantity=3)
+        level = baker.make('leagues.Level', league=league, visibilities=roles[:2])
+        statuses = baker.make('users.UserLeagueStatus', league=league, request_status='accepted', _quantity=20)
+        for uls in statuses:
+            uls.visibilities.add(roles[2])
+        url = reverse('user-league-status-bulk-apply-level')
+        data = {'level': level.pk, 'user_league_statuses': [uls.pk for uls in statuses]}
+        # level, membership, statuses, level roles, then in a savepoint: through delete and insert,
+        # visibility index delete, select and insert, membership version bump
+        with self.assertNumQueries(12):
+            response = self.client.post(url, data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['applied'], 20)
+        for uls in statuses:
+            self.assertEqual(set(uls.visibilities.all()), set(roles[:2]))
+        self.assertEqual(UserRoleVisibility.objects.filter(user=statuses[0].user).count(), 2)
+
+        response = self.client.post(url, data={'level': level.pk, 'all_members': True}, format='json')
+        self.assertEqual(response.data['applied'], 21)  # every accepted member, including the manager
+
+        other = baker.make('users.UserLeagueStatus')
+        data = {'level': level.pk, 'user_league_statuses': [statuses[0].pk, other.pk]}
+        response = self.client.post(url, data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        other_level = baker.make('leagues.Level')
+        response = self.client.post(url, data={'level': other_level.pk, 'all_members': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestOpenPostsAPI(mixins.TestSetupMixin, APITestCase):
+    """
+    Test the open posts feed and the visibility index backing it
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.league = baker.make('leagues.League', adv_scheduling_limit=10)
+        division = baker.make('leagues.Division', league=self.league)
+        self.visible, self.hidden = baker.make('leagues.Role', division=division, _quantity=2)
+        self.uls = baker.make('users.UserLeagueStatus', user=self.user, league=self.league,
+                              request_status='accepted')
+        self.uls.visibilities.add(self.visible)
+        self.games = [baker.make('games.Game', division=division, is_active=True,
+                                 date_time=timezone.now() + timedelta(days=days)) for days in (1, 2, 3, 30)]
+        self.url = reverse('user-open-posts', kwargs={'pk': 'me'})
+
+    def get_post(self, game, role):
+        return Post.objects.get(game=game, role=role)
+
+    def test_visibility_index(self):
+        self.assertEqual(list(UserRoleVisibility.objects.filter(user=self.user).values_list('role', flat=True)),
+                         [self.visible.pk])
+        self.uls.request_status = 'pending'
+        self.uls.save()
+        self.assertFalse(UserRoleVisibility.objects.filter(user=self.user).exists())
+        self.uls.request_status = 'accepted'
+        self.uls.save()
+        self.uls.visibilities.clear()
+        self.assertFalse(UserRoleVisibility.objects.filter(user=self.user).exists())
+
+    def test_open_posts(self):
+        # filled post and a game the user already applied to are not open, the last game is past the limit
+        Application.objects.create(post=self.get_post(self.games[1], self.visible), user=baker.make('users.User'))
+        Application.objects.create(post=self.get_post(self.games[2], self.hidden), user=self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([post['pk'] for post in response.data['results']],
+                         [self.get_post(self.games[0], self.visible).pk])
+
+    def test_open_posts_pagination(self):
+        self.uls.visibilities.add(self.hidden)
+        expected = list(Post.objects.filter(game__in=self.games[:3]).order_by('game__date_time', 'pk')
+                        .values_list('pk', flat=True))
+        pks, url = [], self.url + '?page_size=4'
+        while url is not None:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pks += [post['pk'] for post in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(pks, expected)
+        response = self.client.get(self.url + '?cursor=invalid')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestMembershipCache(mixins.TestSetupMixin, APITestCase):
+    """
+    Test cached memberships are invalidated by league status and visibility changes
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.league = baker.make('leagues.League')
+        self.role = baker.make('leagues.Role', division__league=self.league)
+
+    def test_hits_and_misses(self):
+        reset_membership_stats()
+        Membership.get(self.user)
+        with self.assertNumQueries(0):
+            Membership.get(self.user)
+        stats = get_membership_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_ratio']), (1, 1, 0.5))
+        response = self.client.get(reverse('membership-cache-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['misses'], 1)
+
+    def test_invalidation(self):
+        self.user.leagues.add(self.league)
+        self.assertTrue(Membership.get(self.user).is_pending(self.league))
+        uls = UserLeagueStatus.objects.get(user=self.user, league=self.league)
+        uls.request_status = 'accepted'
+        uls.save()
+        self.assertTrue(Membership.get(self.user).is_accepted(self.league))
+        uls.visibilities.add(self.role)
+        self.assertEqual(Membership.get(self.user).divisions, {self.role.division_id})
+        self.role.delete()
+        self.assertEqual(Membership.get(self.user).roles, set())
+        uls.delete()
+        self.assertFalse(Membership.get(self.user).is_accepted(self.league))
+
+    def test_invalidation_across_processes(self):
+        self.user.leagues.add(self.league, through_defaults={'request_status': 'accepted'})
+        self.user.refresh_from_db()
+        self.assertTrue(Membership.get(self.user).is_accepted(self.league))
+        # another process removes the user: its cache is cleared, this one still holds the accepted league
+        stale = cache.get(get_membership_cache_key(self.user.pk))
+        UserLeagueStatus.objects.get(user=self.user, league=self.league).delete()
+        cache.set(get_membership_cache_key(self.user.pk), stale)
+        # the user is loaded again by the next request, with the bumped version
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.membership_version, stale[0] + 1)
+        self.assertFalse(Membership.get(self.user).is_accepted(self.league))
+
+
+class TestActionPermissions(APITestCase):
+    """
+    Test the compiled action permission tables of the registered viewsets
+    """
+
+    def test_router_viewsets_are_valid(self):
+        for prefix, viewset, basename in router.registry:
+            self.assertEqual(check_action_permissions(viewset), [])
+
+    def test_table_is_compiled_once(self):
+        table = get_action_permission_table(UserLeagueStatusViewSet)
+        self.assertIs(get_action_permission_table(UserLeagueStatusViewSet), table)
+        self.assertIs(table['retrieve'], table['destroy'])
+        self.assertNotIn('metadata', table)
+
+    def test_invalid_mapping(self):
+        class InvalidUserViewSet(UserViewSet):
+            action_permissions = {
+                permissions.AllowAny: ['create', 'list', 'unknown'],
+                permissions.IsAuthenticated: ['list', 'update', 'partial_update', 'retrieve'],
+            }
+        self.assertEqual(check_action_permissions(InvalidUserViewSet), [
+            "InvalidUserViewSet: unknown action 'unknown' in action_permissions",
+            "InvalidUserViewSet: action 'list' is mapped more than once",
+            "InvalidUserViewSet: action 'open_posts' has no mapping in action_permissions",
+        ])